@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import re
+from collections import deque
+
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# GETs that write: the match list creates the next round when it is due
+WRITING_READ_PATHS = re.compile(r'^/tournament/[^/]+/match/?$')
+EXEMPT_PATHS = ('/metrics',)
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most limit requests run at once and queues up to max_queue
+    more, each for at most queue_timeout seconds. Requests beyond that
+    are rejected at once instead of waiting on the connection pool.
+
+    Only used from the event loop, so it needs no lock; the waiters are
+    futures of the loop that is running when they wait.
+    """
+
+    def __init__(self, limit, max_queue, queue_timeout):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.peak_queue_depth = 0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        Returns True once the request may run, False when it is shed.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done() or waiter.cancelled():
+                self.rejected += 1
+                return False
+        except asyncio.CancelledError:
+            # the client went away after being handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # release handed its slot over, active is already counted
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self):
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'queue_depth': self.queue_depth,
+            'peak_queue_depth': self.peak_queue_depth,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware that runs every request under the limiter of its
+    route class, reads or writes, and answers 503 with Retry-After when
+    the limiter sheds it.
+    """
+
+    def __init__(self, app, limiters, retry_after=1):
+        self.app = app
+        self.limiters = limiters
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[route_class(scope['method'], scope['path'])]
+        if not await limiter.acquire():
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _reject(self, send):
+        body = json.dumps({'detail': 'Server is busy, retry later.'})
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': 503,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                    (b'retry-after', str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({'type': 'http.response.body', 'body': body.encode()})
+
+
+def route_class(method, path=''):
+    if method in READ_METHODS and not WRITING_READ_PATHS.match(path):
+        return 'read'
+    return 'write'
+
+
+def create_limiters():
+    return {
+        'read': ConcurrencyLimiter(
+            settings.ADMISSION_READ_LIMIT,
+            settings.ADMISSION_MAX_QUEUE,
+            settings.ADMISSION_QUEUE_TIMEOUT,
+        ),
+        'write': ConcurrencyLimiter(
+            settings.ADMISSION_WRITE_LIMIT,
+            settings.ADMISSION_MAX_QUEUE,
+            settings.ADMISSION_QUEUE_TIMEOUT,
+        ),
+    }
+
+
+admission_limiters = create_limiters()
+
+
+def thread_tokens():
+    """
+    Worker threads for the sync routes: one per request that may hold a
+    connection, so requests wait in the limiter instead of on the pool.
+    """
+    return sum(limiter.limit for limiter in admission_limiters.values())
@@ -0,0 +1,315 @@
+"""
+Tournament-affinity dispatcher.
+
+Runs several uvicorn workers of the app, each on its own port, behind a
+small ASGI proxy that sends every request of a tournament to the same
+worker, so its caches and locks stay in one process. Tournaments are
+placed on a consistent hash ring: when a worker leaves (it stops
+answering) or joins (it answers again) only the tournaments of that
+worker move.
+
+Usage:
+    python -m app.affinity --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TOURNAMENT_PATH = re.compile(r'^/tournament/(\d+)(?:/|$)')
+DEFAULT_VIRTUAL_NODES = 100
+DEFAULT_HEALTH_CHECK_INTERVAL = 2.0
+# hop-by-hop headers are not forwarded by a proxy
+HOP_HEADERS = {b'connection', b'keep-alive', b'transfer-encoding', b'host'}
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """
+    Consistent hash ring: every node owns virtual_nodes points of the
+    ring and a key belongs to the node of the first point after it.
+    """
+
+    def __init__(self, nodes=(), virtual_nodes=DEFAULT_VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return sorted(set(self._owners.values()))
+
+    def add(self, node):
+        for replica in range(self.virtual_nodes):
+            point = _hash(f'{node}#{replica}')
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node):
+        self._points = [
+            point for point in self._points if self._owners[point] != node
+        ]
+        self._owners = {
+            point: owner
+            for point, owner in self._owners.items()
+            if owner != node
+        }
+
+    def node_for(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(str(key)))
+        return self._owners[self._points[index % len(self._points)]]
+
+
+def tournament_key(path):
+    """
+    Tournament id of a /tournament/{id}/... path, None for other paths.
+    """
+    match = TOURNAMENT_PATH.match(path)
+    return int(match.group(1)) if match else None
+
+
+class AffinityDispatcher:
+    """
+    ASGI app that proxies every request to a worker: the owner of its
+    tournament on the ring, or the next worker in turn for requests of
+    no tournament. A worker that refuses a connection leaves the ring
+    and the request is retried on the new owner; the health checks let
+    it join again once it answers.
+    """
+
+    def __init__(
+        self,
+        workers,
+        virtual_nodes=DEFAULT_VIRTUAL_NODES,
+        health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+        client=None,
+    ):
+        self.workers = list(workers)
+        self.health_check_interval = health_check_interval
+        self.ring = HashRing(self.workers, virtual_nodes)
+        self.requests = {worker: 0 for worker in self.workers}
+        self.client = client or httpx.AsyncClient(
+            timeout=None, limits=httpx.Limits(max_connections=None)
+        )
+        self._next = itertools.cycle(self.workers)
+        self._health_task = None
+
+    def worker_for(self, path):
+        key = tournament_key(path)
+        if key is not None:
+            return self.ring.node_for(key)
+        live = set(self.ring.nodes)
+        for worker in itertools.islice(self._next, len(self.workers)):
+            if worker in live:
+                return worker
+        return None
+
+    def leave(self, worker):
+        if worker in self.ring.nodes:
+            logger.warning('Worker %s left the ring.', worker)
+            self.ring.remove(worker)
+
+    def join(self, worker):
+        if worker not in self.ring.nodes:
+            logger.info('Worker %s joined the ring.', worker)
+            self.ring.add(worker)
+
+    async def check_workers(self):
+        """
+        Any answer, even an error status, means the worker is up.
+        """
+        for worker in self.workers:
+            try:
+                await self.client.get(f'{worker}/metrics/admission')
+                self.join(worker)
+            except httpx.TransportError:
+                self.leave(worker)
+
+    def metrics(self):
+        return {
+            'workers': self.workers,
+            'ring': self.ring.nodes,
+            'requests': self.requests,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._proxy(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._health_task = asyncio.create_task(self._health_loop())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._health_task.cancel()
+                await self.client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_workers()
+
+    async def _proxy(self, scope, receive, send):
+        if scope['path'] == '/metrics/affinity':
+            await self._respond(send, 200, self.metrics())
+            return
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        headers = [
+            (name, value)
+            for name, value in scope['headers']
+            if name not in HOP_HEADERS
+        ]
+        path = (scope.get('raw_path') or scope['path'].encode()).decode()
+        if scope['query_string']:
+            path = f'{path}?{scope["query_string"].decode()}'
+
+        # at most one try per worker: each failure removes one from the ring
+        for _ in range(len(self.workers)):
+            worker = self.worker_for(scope['path'])
+            if worker is None:
+                break
+            request = self.client.build_request(
+                scope['method'],
+                f'{worker}{path}',
+                headers=headers,
+                content=body,
+            )
+            try:
+                response = await self.client.send(request, stream=True)
+            except httpx.TransportError:
+                self.leave(worker)
+                continue
+            self.requests[worker] += 1
+            try:
+                await self._forward(response, send)
+            finally:
+                await response.aclose()
+            return
+
+        await self._respond(send, 503, {'detail': 'No worker available.'})
+
+    @staticmethod
+    async def _forward(response, send):
+        """
+        Sends the response body as the worker encoded it, so its
+        content-encoding and content-length still hold.
+        """
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [
+                    (name, value)
+                    for name, value in response.headers.raw
+                    if name.lower() not in HOP_HEADERS
+                ],
+            }
+        )
+        async for chunk in response.aiter_raw():
+            await send(
+                {
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                }
+            )
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    async def _respond(send, status, payload):
+        body = json.dumps(payload).encode()
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def _start_worker(host, port):
+    return subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            'app.app:app',
+            '--host',
+            host,
+            '--port',
+            str(port),
+        ],
+        env=os.environ.copy(),
+    )
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument(
+        '--worker-base-port',
+        type=int,
+        default=8100,
+        help='The workers listen on consecutive ports from this one.',
+    )
+    args = parser.parse_args(argv)
+
+    ports = [args.worker_base_port + index for index in range(args.workers)]
+    processes = [_start_worker('127.0.0.1', port) for port in ports]
+    dispatcher = AffinityDispatcher(
+        [f'http://127.0.0.1:{port}' for port in ports]
+    )
+    try:
+        uvicorn.run(dispatcher, host=args.host, port=args.port)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 
+from app.admission import (
+    AdmissionControlMiddleware,
+    admission_limiters,
+    thread_tokens,
+)
+from app.database import settings
+from app.group_commit import group_committer
+from app.jobs import job_queue
+from app.logs import configure_logging
+from app.models import (
+    Competitor,
+    Match,
+    MatchEvent,
+    OutboxMessage,
+    Tournament,
+    TournamentArchive,
+)
+from app.outbox import create_dispatcher
 from app.routes import routes
+from app.tracing import (
+    TracingMiddleware,
+    instrument_class,
+    instrument_engines,
+    tracer,
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    configure_logging(
+        settings.LOG_LEVEL, settings.LOG_JSON, settings.LOG_DEBUG_SAMPLE_RATE
+    )
+    to_thread.current_default_thread_limiter().total_tokens = thread_tokens()
+    job_queue.start()
+    dispatcher = None
+    if settings.WEBHOOK_URLS:
+        dispatcher = create_dispatcher()
+        dispatch = asyncio.create_task(dispatcher.run())
+    yield
+    if dispatcher is not None:
+        await dispatcher.stop()
+        await dispatch
+    if group_committer is not None:
+        group_committer.stop()
+    job_queue.stop()
 
-app = FastAPI()
 
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limiters=admission_limiters,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
+app.add_middleware(TracingMiddleware, tracer=tracer)
 app.include_router(routes.router)
+
+for model in (
+    Tournament,
+    Competitor,
+    Match,
+    TournamentArchive,
+    MatchEvent,
+    OutboxMessage,
+):
+    instrument_class(model)
+instrument_engines()
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+from app.database import settings
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs
+    the function and the callers that arrive while it runs wait for it
+    and share its result, or its error. Nothing is cached once the call
+    is over.
+
+    The routes are sync and run in the thread pool, so the waiters block
+    on a threading.Event.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'in_flight': in_flight,
+        }
+
+
+class VersionedCache:
+    """
+    Keeps the last value computed for each key with the version it was
+    computed at. A lookup at another version computes it again and
+    replaces it, so writes never need to invalidate anything: they move
+    the version. At most max_entries keys are kept, dropping the least
+    recently used; 0 keeps nothing.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, function):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = function()
+        if self.max_entries < 1:
+            return value
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+
+match_list_flight = SingleFlight()
+tournament_stats_cache = VersionedCache(settings.STATS_CACHE_SIZE)
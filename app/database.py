@@ -1,11 +1,178 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 
 from app.settings import Settings
 
-engine = create_engine(Settings().DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+engine = create_engine(settings.DATABASE_URL)
+# the job workers, the group committer and the webhook dispatcher have
+# their own connections, so they never take the ones of the pool the
+# admission limits of the requests are sized to
+BACKGROUND_CONNECTIONS = settings.JOB_WORKERS + 2
+background_engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=QueuePool,
+    pool_size=BACKGROUND_CONNECTIONS,
+    max_overflow=0,
+)
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only requests: the replicas in turn,
+    skipping the ones that failed their last health check, or the
+    primary when there is no healthy replica.
+
+    A tournament written in the last read_your_writes_seconds is read
+    from the primary, so a client never misses its own write because of
+    replication lag.
+    """
+
+    def __init__(
+        self,
+        primary,
+        replicas=(),
+        health_check_interval=5.0,
+        read_your_writes_seconds=5.0,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.health_check_interval = health_check_interval
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._cycle = itertools.cycle(self.replicas)
+        self._health = {}
+        # tournament id -> time of its last write, oldest write first
+        self._written = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark_written(self, tournament_id):
+        now = time.monotonic()
+        with self._lock:
+            self._written[tournament_id] = now
+            self._written.move_to_end(tournament_id)
+            # the oldest writes come first, so only expired ones are popped
+            expired_before = now - self.read_your_writes_seconds
+            while (
+                self._written
+                and next(iter(self._written.values())) <= expired_before
+            ):
+                self._written.popitem(last=False)
+
+    def engine_for_read(self, tournament_id=None):
+        if not self.replicas or self._recently_written(tournament_id):
+            return self.primary
+
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+            if self._is_healthy(replica):
+                return replica
+
+        logger.warning('No healthy replica, reading from the primary.')
+        return self.primary
+
+    def _recently_written(self, tournament_id):
+        with self._lock:
+            written_at = self._written.get(tournament_id)
+            if written_at is None:
+                return False
+            if time.monotonic() - written_at < self.read_your_writes_seconds:
+                return True
+            del self._written[tournament_id]
+            return False
+
+    def _is_healthy(self, replica):
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(replica, (True, None))
+        if (
+            checked_at is not None
+            and now - checked_at < self.health_check_interval
+        ):
+            return healthy
+
+        try:
+            with replica.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            healthy = True
+        except SQLAlchemyError as e:
+            logger.warning('Replica %s is unhealthy: %s', replica.url, e)
+            healthy = False
+        self._health[replica] = (healthy, now)
+        return healthy
+
+
+class ReadSession(Session):
+    """
+    Session of the read-only endpoints. The engine is picked on the first
+    statement, so a write committed earlier in the same request is
+    already known to the router.
+    """
 
+    def __init__(self, router, tournament_id=None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self.tournament_id = tournament_id
+        self._read_bind = None
 
-def get_session():
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._read_bind is None:
+            self._read_bind = self.router.engine_for_read(self.tournament_id)
+        return self._read_bind
+
+
+replica_router = ReplicaRouter(
+    engine,
+    [create_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    health_check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL,
+    read_your_writes_seconds=settings.REPLICA_READ_YOUR_WRITES_SECONDS,
+)
+
+
+def get_replica_router():
+    return replica_router
+
+
+def _tournament_id(request):
+    tournament_id = request.path_params.get('tournament_id')
+    return int(tournament_id) if tournament_id is not None else None
+
+
+def get_session(
+    request: Request, router: ReplicaRouter = Depends(get_replica_router)
+):
     with Session(engine) as session:
+        tournament_id = _tournament_id(request)
+
+        @event.listens_for(session, 'after_commit')
+        def mark_written(session):
+            router.mark_written(tournament_id)
+
+        yield session
+
+
+def get_read_session(
+    request: Request,
+    primary: Session = Depends(get_session),
+    router: ReplicaRouter = Depends(get_replica_router),
+):
+    """
+    Session of the read-only endpoints: a replica when there is one,
+    otherwise the primary session of the request.
+    """
+    if not router.replicas:
+        yield primary
+        return
+
+    with ReadSession(router, _tournament_id(request)) as session:
         yield session
@@ -0,0 +1,118 @@
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:   # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK = 'application/msgpack'
+MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack')
+LAYOUT_ROWS = 'rows'
+LAYOUT_COLUMNAR = 'columnar'
+
+
+def to_columns(value):
+    """
+    Turns every list of dicts with the same keys into a dict of parallel
+    lists, so the keys of a match are sent once per round instead of
+    once per match.
+    """
+    if isinstance(value, dict):
+        return {key: to_columns(item) for key, item in value.items()}
+    if (
+        isinstance(value, list)
+        and value
+        and all(isinstance(item, dict) for item in value)
+        and all(item.keys() == value[0].keys() for item in value)
+    ):
+        return {key: [item[key] for item in value] for key in value[0]}
+    return value
+
+
+def _media_ranges(accept):
+    """
+    Parses an Accept header into (media range, quality) pairs. A range
+    with an unreadable q is skipped.
+    """
+    ranges = []
+    for part in accept.split(','):
+        media_range, *params = [item.strip() for item in part.split(';')]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = None
+        if quality is not None:
+            ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def _quality(ranges, media_type):
+    """
+    Quality of a media type: the one of its most specific range, 0 when
+    no range matches it.
+    """
+    type_range = media_type.split('/')[0] + '/*'
+    for candidate in (media_type, type_range, '*/*'):
+        qualities = [
+            q for media_range, q in ranges if media_range == candidate
+        ]
+        if qualities:
+            return max(qualities)
+    return 0.0
+
+
+def wants_msgpack(request):
+    """
+    MessagePack when the Accept header names it with a quality above 0
+    and not below the one of JSON, which stays the default for wildcards.
+    """
+    accept = request.headers.get('accept')
+    if msgpack is None or not accept:
+        return False
+    ranges = _media_ranges(accept)
+    msgpack_quality = max(
+        (q for media_range, q in ranges if media_range in MSGPACK_TYPES),
+        default=0.0,
+    )
+    return msgpack_quality > 0 and msgpack_quality >= _quality(
+        ranges, 'application/json'
+    )
+
+
+def negotiate(
+    request, payload, layout=LAYOUT_ROWS, schema=None, status_code=200
+):
+    """
+    Encodes a response as MessagePack when the Accept header asks for it,
+    as JSON otherwise, in rows or in columns. Row JSON is returned as is,
+    for FastAPI to encode with the response model of the route; schema
+    is that model, used for the other encodings.
+    """
+    msgpack_requested = wants_msgpack(request)
+    if layout == LAYOUT_ROWS and not msgpack_requested:
+        return payload
+
+    if schema is not None:
+        payload = schema.model_validate(
+            payload, from_attributes=True
+        ).model_dump()
+    payload = jsonable_encoder(payload)
+    if layout == LAYOUT_COLUMNAR:
+        payload = to_columns(payload)
+
+    headers = {'vary': 'Accept'}
+    if msgpack_requested:
+        return Response(
+            msgpack.packb(payload),
+            status_code=status_code,
+            media_type=MSGPACK,
+            headers=headers,
+        )
+    return JSONResponse(payload, status_code=status_code, headers=headers)
@@ -0,0 +1,135 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy.orm import Session
+
+from app.database import background_engine, replica_router, settings
+from app.models import Match
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    """
+    Writes the results reported within max_delay seconds of each other
+    in one transaction, at most max_batch per transaction, so they share
+    one commit (and one fsync) instead of paying one each. Every caller
+    is answered once the commit of its result is over.
+
+    A committer thread is started on the first result.
+    """
+
+    def __init__(self, session_factory, max_delay=0.005, max_batch=64):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.batches = 0
+        self.results = 0
+        self._pending = []
+        self._ready = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def set_winner(self, match_id, tournament_id, winner):
+        """
+        Sets the winner of a match like Match.set_winner and waits until
+        the result is committed. Raises the error of the result.
+        """
+        future = Future()
+        with self._ready:
+            if self._thread is None:
+                self._start()
+            self._pending.append((match_id, tournament_id, winner, future))
+            self._ready.notify()
+        return future.result()
+
+    def stop(self):
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def metrics(self):
+        return {
+            'batches': self.batches,
+            'results': self.results,
+            'average_batch': self.results / self.batches
+            if self.batches
+            else 0,
+        }
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._work, name='group-commit', daemon=True
+        )
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._ready:
+                self._ready.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending:
+                    return
+                # the first result waits up to max_delay for company
+                self._ready.wait_for(
+                    lambda: len(self._pending) >= self.max_batch
+                    or self._stopping,
+                    timeout=self.max_delay,
+                )
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+            self._commit(batch)
+
+    def _commit(self, batch):
+        outcomes = []
+        with self.session_factory() as session:
+            try:
+                for match_id, tournament_id, winner, future in batch:
+                    try:
+                        match = Match.set_winner(
+                            match_id, tournament_id, winner, session, False
+                        )
+                        outcomes.append((future, tournament_id, match, None))
+                    except ValueError as e:
+                        # set_winner leaves nothing to undo when it raises
+                        outcomes.append((future, tournament_id, None, e))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error('Group commit of %s results failed.', len(batch))
+                for future in (item[-1] for item in batch):
+                    future.set_exception(e)
+                return
+
+        self.batches += 1
+        self.results += len(batch)
+        for future, tournament_id, match, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+                continue
+            replica_router.mark_written(tournament_id)
+            future.set_result(match)
+
+
+def create_group_committer():
+    def session_factory():
+        return Session(background_engine, expire_on_commit=False)
+
+    return GroupCommitter(
+        session_factory,
+        max_delay=settings.GROUP_COMMIT_MAX_DELAY,
+        max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+    )
+
+
+group_committer = (
+    create_group_committer() if settings.GROUP_COMMIT_ENABLED else None
+)
+
+
+def get_group_committer():
+    return group_committer
@@ -0,0 +1,77 @@
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+logger = logging.getLogger(__name__)
+
+STRICT_RELATIONSHIPS = ('competitor_1', 'competitor_2', 'winner')
+
+
+class QueryCounter:
+    """
+    Counts the SQL statements sent to the database by an engine.
+
+    Usage:
+        with QueryCounter(engine) as counter:
+            client.get('/tournament/1/match')
+        assert counter.count <= 10
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def reset(self):
+        self.statements = []
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(
+            self.engine, 'before_cursor_execute', self._before_cursor_execute
+        )
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(
+            self.engine, 'before_cursor_execute', self._before_cursor_execute
+        )
+        return False
+
+
+@contextmanager
+def strict_relationship_loading(session):
+    """
+    Makes lazy loads of Match.competitor_1, Match.competitor_2 and
+    Match.winner that reach the database raise, so N+1 patterns fail fast.
+    Loads served from the identity map are still allowed.
+    """
+    from app.models import Match
+
+    def _do_orm_execute(orm_execute_state):
+        if not orm_execute_state.is_relationship_load:
+            return
+        parent = orm_execute_state.lazy_loaded_from
+        if parent is None or not isinstance(parent.obj(), Match):
+            return
+        attribute = orm_execute_state.loader_strategy_path[-1].key
+        if attribute in STRICT_RELATIONSHIPS:
+            raise InvalidRequestError(
+                f"'Match.{attribute}' is not available due to strict "
+                'relationship loading.'
+            )
+
+    event.listen(session, 'do_orm_execute', _do_orm_execute)
+    try:
+        yield session
+    finally:
+        event.remove(session, 'do_orm_execute', _do_orm_execute)
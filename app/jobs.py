@@ -0,0 +1,330 @@
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import background_engine, replica_router, settings
+from app.models import Competitor, Job, Match, TournamentArchive
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_FINISHED = 'finished'
+JOB_FAILED = 'failed'
+
+BACKEND_MEMORY = 'memory'
+BACKEND_DATABASE = 'database'
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+def _generate_round(session, tournament_id):
+    Match.create_match(tournament_id, session)
+
+
+def _archive_tournament(session, tournament_id):
+    TournamentArchive.archive_tournament(tournament_id, session)
+
+
+def _register_competitors(session, tournament_id, names):
+    Competitor.create_competitors(
+        names=names, tournament_id=tournament_id, session=session
+    )
+
+
+JOB_HANDLERS = {
+    'generate_round': _generate_round,
+    'archive_tournament': _archive_tournament,
+    'register_competitors': _register_competitors,
+}
+
+
+class InMemoryJobBackend:
+    """
+    Keeps the jobs in a dict; they are lost when the process stops.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._queued = deque()
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        now = datetime.now()
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'payload': payload,
+                'status': JOB_QUEUED,
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now,
+            }
+            self._queued.append(job_id)
+        return job_id
+
+    def claim(self):
+        with self._lock:
+            if not self._queued:
+                return None
+            job = self._jobs[self._queued.popleft()]
+            job['status'] = JOB_RUNNING
+            job['updated_at'] = datetime.now()
+            return dict(job)
+
+    def finish(self, job_id, result=None):
+        self._update(job_id, status=JOB_FINISHED, result=result)
+
+    def fail(self, job_id, error):
+        self._update(job_id, status=JOB_FAILED, error=error)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id, **values):
+        with self._lock:
+            self._jobs[job_id].update(values, updated_at=datetime.now())
+
+
+class DatabaseJobBackend:
+    """
+    Keeps the jobs in the jobs table, so they survive restarts and can be
+    claimed by the workers of every process sharing the database.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def enqueue(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        with self.session_factory() as session:
+            session.add(
+                Job(
+                    id=job_id,
+                    kind=kind,
+                    payload=json.dumps(payload),
+                    status=JOB_QUEUED,
+                )
+            )
+            session.commit()
+        return job_id
+
+    def claim(self):
+        """
+        Takes the oldest queued job. The status check in the UPDATE makes
+        the claim atomic when several workers pick the same row.
+        """
+        with self.session_factory() as session:
+            while True:
+                job_id = session.scalar(
+                    select(Job.id)
+                    .where(Job.status == JOB_QUEUED)
+                    .order_by(Job.created_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                if job_id is None:
+                    return None
+
+                claimed = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_QUEUED)
+                    .values(status=JOB_RUNNING, updated_at=datetime.now())
+                ).rowcount
+                session.commit()
+                if claimed:
+                    return self._as_dict(session.get(Job, job_id))
+
+    def finish(self, job_id, result=None):
+        self._update(job_id, status=JOB_FINISHED, result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._update(job_id, status=JOB_FAILED, error=error)
+
+    def get(self, job_id):
+        with self.session_factory() as session:
+            job = session.get(Job, job_id)
+            return self._as_dict(job) if job is not None else None
+
+    def _update(self, job_id, **values):
+        with self.session_factory() as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(updated_at=datetime.now(), **values)
+            )
+            session.commit()
+
+    @staticmethod
+    def _as_dict(job):
+        return {
+            'id': job.id,
+            'kind': job.kind,
+            'payload': json.loads(job.payload),
+            'status': job.status,
+            'result': json.loads(job.result) if job.result else None,
+            'error': job.error,
+            'created_at': job.created_at,
+            'updated_at': job.updated_at,
+        }
+
+
+class JobQueue:
+    """
+    Runs the jobs of a backend in a pool of worker threads, each job with
+    its own session. Jobs of the same tournament never run at the same
+    time, so two round generations cannot create the same round twice.
+    """
+
+    def __init__(
+        self,
+        backend,
+        session_factory,
+        workers=2,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+    ):
+        self.backend = backend
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._unfinished = 0
+        self._idle = threading.Condition()
+        # tournament id -> [lock, number of workers holding or awaiting it]
+        self._tournament_locks = {}
+        self._locks_guard = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'job-worker-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info('Job queue started with %s workers.', self.workers)
+
+    def stop(self):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def enqueue(self, kind, **payload):
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f'Unknown job kind {kind}.')
+        # counted first, so a worker cannot finish the job before it is
+        # counted, and given back if the backend does not take it
+        with self._idle:
+            self._unfinished += 1
+        try:
+            job_id = self.backend.enqueue(kind, payload)
+        except Exception:
+            with self._idle:
+                self._unfinished -= 1
+                self._idle.notify_all()
+            raise
+        with self._wakeup:
+            self._wakeup.notify()
+        logger.info('Job %s (%s) enqueued.', job_id, kind)
+        return job_id
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def join(self, timeout=None):
+        """
+        Waits until every job enqueued by this queue has run.
+        """
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: self._unfinished == 0, timeout=timeout
+            )
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.backend.claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        handler = JOB_HANDLERS[job['kind']]
+        tournament_id = job['payload'].get('tournament_id')
+        with self._tournament_lock(tournament_id):
+            with self.session_factory() as session:
+                try:
+                    result = handler(session, **job['payload'])
+                    replica_router.mark_written(tournament_id)
+                    self.backend.finish(job['id'], result)
+                    logger.info('Job %s finished.', job['id'])
+                except Exception as e:
+                    session.rollback()
+                    self.backend.fail(job['id'], str(e))
+                    logger.error('Job %s failed: %s', job['id'], e)
+        with self._idle:
+            # jobs enqueued by other processes were never counted here
+            self._unfinished = max(self._unfinished - 1, 0)
+            self._idle.notify_all()
+
+    @contextmanager
+    def _tournament_lock(self, tournament_id):
+        """
+        Runs the jobs of a tournament one at a time. The lock is dropped
+        once no worker holds or awaits it, so finished tournaments leave
+        nothing behind.
+        """
+        with self._locks_guard:
+            entry = self._tournament_locks.setdefault(
+                tournament_id, [threading.Lock(), 0]
+            )
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._tournament_locks[tournament_id]
+
+
+def create_job_queue(engine, backend=BACKEND_MEMORY, workers=2):
+    def session_factory():
+        return Session(engine)
+
+    if backend == BACKEND_DATABASE:
+        job_backend = DatabaseJobBackend(session_factory)
+    elif backend == BACKEND_MEMORY:
+        job_backend = InMemoryJobBackend()
+    else:
+        raise ValueError(f'Unknown job backend {backend}.')
+    return JobQueue(job_backend, session_factory, workers=workers)
+
+
+job_queue = create_job_queue(
+    background_engine, settings.JOB_BACKEND, settings.JOB_WORKERS
+)
+
+
+def get_job_queue():
+    return job_queue
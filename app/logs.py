@@ -0,0 +1,104 @@
+import atexit
+import json
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    'message',
+    'asctime',
+    'taskName',
+}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the fields passed in extra={...}.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps every record above DEBUG and only a sample of the DEBUG ones,
+    which are the high-frequency lines of the hot paths.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues the record as it is. The stdlib handler formats the message
+    in the calling thread to make it picklable; with an in-process queue
+    that work can be left to the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level='INFO', json_output=True, debug_sample_rate=1.0):
+    """
+    Routes the root logger through a queue: request threads only append
+    records, and a listener thread formats and writes them.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(
+        JsonFormatter()
+        if json_output
+        else logging.Formatter('%(asctime)s %(levelname)s: %(message)s')
+    )
+    records = queue.SimpleQueue()
+    handler = LazyQueueHandler(records)
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    for existing in [
+        h for h in root.handlers if isinstance(h, LazyQueueHandler)
+    ]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _flush():
+    if _listener is not None:
+        _listener.stop()
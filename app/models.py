@@ -1,6 +1,10 @@
+import base64
+import json
 import logging
 import math
 import random
+import zlib
+from datetime import datetime
 from typing import Annotated
 
 from fastapi import Depends
@@ -10,25 +14,79 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
+    Text,
     and_,
+    case,
+    cast,
     desc,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Session,
+    aliased,
+    joinedload,
+    relationship,
 )
-from sqlalchemy.orm import DeclarativeBase, Session, relationship
 from sqlalchemy.orm.exc import NoResultFound
 
-from app.database import get_session
+from app.database import get_session, settings
 
 GROUP_1 = 'group_1'
 GROUP_2 = 'group_2'
+DEFAULT_NUMBER_PODS = 2
 STATUS_FINISHED = 'finished'
 STATUS_PENDING = 'pending'
+MIN_NAME_SUFFIXES = 100
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_EVENTS_LIMIT = 500
+EVENT_MATCH_CREATED = 'match_created'
+EVENT_WINNER_SET = 'winner_set'
+OUTBOX_PENDING = 'pending'
+OUTBOX_DELIVERED = 'delivered'
+OUTBOX_FAILED = 'failed'
+STATS_ROUND = 'round'
+STATS_POD = 'pod'
+MATCH_FIELDS = (
+    'id',
+    'round',
+    'state',
+    'competitor_1_id',
+    'competitor_2_id',
+    'winner_id',
+    'competitor_1',
+    'competitor_2',
+    'winner',
+)
+# the name fields and the column of the competitor they are read from
+MATCH_NAME_FIELDS = {
+    'competitor_1': 'competitor_1_id',
+    'competitor_2': 'competitor_2_id',
+    'winner': 'winner_id',
+}
 
 Session = Annotated[Session, Depends(get_session)]
 logger = logging.getLogger(__name__)
 
 
+def pod_name(index):
+    """
+    Name of the pod (group) at the given zero-based index: group_1,
+    group_2, ...
+    """
+    return f'group_{index + 1}'
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -52,6 +110,28 @@ class Tournament(Base):
         Boolean,
         default=False,
     )
+    is_archived = Column(
+        Boolean,
+        default=False,
+    )
+    number_pods = Column(Integer, default=DEFAULT_NUMBER_PODS)
+    # progress counters, kept up to date by the writes instead of counted
+    number_competitors = Column(Integer, default=0, nullable=False)
+    active_competitors = Column(Integer, default=0, nullable=False)
+    current_round = Column(Integer, default=0, nullable=False)
+    pending_matches = Column(Integer, default=0, nullable=False)
+    # last change sequence given to a match write, see Match.change_seq
+    change_seq = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index('ix_tournaments_date_start_id', 'date_start', 'id'),
+        Index(
+            'ix_tournaments_is_active_date_start_id',
+            'is_active',
+            'date_start',
+            'id',
+        ),
+    )
 
     @classmethod
     def create_tournament(cls, session: Session, **kwargs):
@@ -73,10 +153,111 @@ class Tournament(Base):
             return new_tournament
         except Exception as e:
 
-            logger.error(f'Error creating tournament: {str(e)}')
+            logger.error('Error creating tournament: %s', e)
             session.rollback()
             raise ValueError('Error creating tournament.')
 
+    @staticmethod
+    def _record_new_matches(session, tournament, round, pending):
+        """
+        Moves the progress counters to a newly created round with the
+        given number of pending matches, and takes the change sequence the
+        matches of the round are stamped with. The UPDATE only matches
+        while the round read by the caller is still the current one, so
+        when two requests create the same round only the first one is
+        recorded. Returns None for the other one, which must roll back.
+        The caller commits.
+        """
+        change_seq = session.execute(
+            update(Tournament)
+            .where(
+                Tournament.id == tournament.id,
+                Tournament.current_round == tournament.current_round,
+            )
+            .values(
+                current_round=round,
+                pending_matches=Tournament.pending_matches + pending,
+                change_seq=Tournament.change_seq + 1,
+            )
+            .returning(Tournament.change_seq)
+        ).scalar_one_or_none()
+        if change_seq is None:
+            logger.info('Round %s was already created.', round)
+            session.rollback()
+        return change_seq
+
+    @staticmethod
+    def _encode_cursor(values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor, order_by):
+        """
+        Returns the (date_start, id) or (id,) keys of a page cursor.
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if order_by == 'date_start':
+                date_start, last_id = values
+                return datetime.fromisoformat(date_start), int(last_id)
+            (last_id,) = values
+            return (int(last_id),)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor.')
+
+    @classmethod
+    def list_tournaments(
+        cls,
+        session: Session,
+        order_by: str = 'id',
+        cursor: str = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        is_active: bool = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+    ):
+        """
+        Lists tournaments one page at a time with keyset pagination on id or
+        on (date_start, id), so every page costs the same however deep it
+        is. Returns the page and the cursor of the next one, or None.
+        """
+        query = select(cls)
+        if is_active is not None:
+            query = query.where(cls.is_active == is_active)
+        if date_from is not None:
+            query = query.where(cls.date_start >= date_from)
+        if date_to is not None:
+            query = query.where(cls.date_start <= date_to)
+
+        if order_by == 'date_start':
+            if cursor is not None:
+                date_start, last_id = cls._decode_cursor(cursor, order_by)
+                query = query.where(
+                    or_(
+                        cls.date_start > date_start,
+                        and_(cls.date_start == date_start, cls.id > last_id),
+                    )
+                )
+            query = query.order_by(cls.date_start, cls.id)
+        else:
+            if cursor is not None:
+                (last_id,) = cls._decode_cursor(cursor, order_by)
+                query = query.where(cls.id > last_id)
+            query = query.order_by(cls.id)
+
+        # one extra row tells whether there is a next page
+        tournaments = session.scalars(query.limit(limit + 1)).all()
+        next_cursor = None
+        if len(tournaments) > limit:
+            tournaments = tournaments[:limit]
+            last = tournaments[-1]
+            next_cursor = cls._encode_cursor(
+                [last.date_start.isoformat(), last.id]
+                if order_by == 'date_start'
+                else [last.id]
+            )
+        return tournaments, next_cursor
+
 
 class Competitor(Base):
     __tablename__ = 'competitors'
@@ -89,21 +270,40 @@ class Competitor(Base):
         nullable=False,
     )
     name = Column(String(255), nullable=False)
-    group = Column(
-        Enum('group_1', 'group_2', name='competitor_group'), nullable=True
-    )
+    group = Column(String(32), nullable=True)
     tournament_id = Column(
         Integer, ForeignKey('tournaments.id'), nullable=False
     )
     tournament = relationship('Tournament', back_populates='competitors')
     status = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index(
+            'ix_competitors_tournament_id_name',
+            'tournament_id',
+            'name',
+            unique=True,
+        ),
+    )
+
     @classmethod
-    def _number_of_matches(cls, number_competitors):
+    def _number_of_matches(
+        cls, number_competitors, number_pods=DEFAULT_NUMBER_PODS
+    ):
+        """
+        This function calculates the number of matches for a tournament:
+        the rounds inside the pods plus the rounds between pod winners.
+        With two pods it is the same as ceil(log2(number_competitors)).
+        """
+        pod_size = math.ceil(number_competitors / number_pods)
+        return cls._pod_rounds(pod_size) + math.ceil(math.log2(number_pods))
+
+    @staticmethod
+    def _pod_rounds(pod_size):
         """
-        This function calculates the number of matches for a tournament.
+        Number of rounds a pod of the given size needs to find its winner.
         """
-        return math.ceil(math.log2(number_competitors))
+        return math.ceil(math.log2(pod_size))
 
     @classmethod
     def create_competitors(cls, names, tournament_id, session):
@@ -127,21 +327,35 @@ class Competitor(Base):
 
         random.shuffle(names)
         competitors = []
+        # distinct suffixes keep the names unique within the tournament
+        # even when the same name is registered twice, without retries
+        suffixes = random.sample(
+            range(1, max(len(names), MIN_NAME_SUFFIXES) + 1), len(names)
+        )
 
-        for ind, name in enumerate(names):
-            group = GROUP_1 if ind % 2 == 0 else GROUP_2
-            competitor_name = f'{name} -{random.randint(1, 100)}'
-            new_competitor = cls(
-                name=competitor_name,
-                tournament_id=tournament_id,
-                group=group,
+        number_pods = min(
+            existing_tournament.number_pods or DEFAULT_NUMBER_PODS, len(names)
+        )
+
+        for ind, (name, suffix) in enumerate(zip(names, suffixes)):
+            group = pod_name(ind % number_pods)
+            competitor_name = f'{name} -{suffix}'
+            competitors.append(
+                {
+                    'name': competitor_name,
+                    'tournament_id': tournament_id,
+                    'group': group,
+                }
             )
-            competitors.append(new_competitor)
 
-        number_matches = cls._number_of_matches(len(names))
+        number_matches = cls._number_of_matches(len(names), number_pods)
         existing_tournament.number_matches = number_matches
+        existing_tournament.number_pods = number_pods
         existing_tournament.is_active = True
-        session.add_all(competitors)
+        existing_tournament.number_competitors = len(names)
+        existing_tournament.active_competitors = len(names)
+        # a single executemany instead of one INSERT per competitor
+        session.execute(insert(cls), competitors)
         session.add(existing_tournament)
         session.commit()
         logger.info('Competitors inserted in the bank.')
@@ -175,6 +389,30 @@ class Match(Base):
     state = Column(
         Enum('pending', 'finished', name='match_state'), nullable=False
     )
+    # Tournament.change_seq of the last write of the match. The writes
+    # take it with an UPDATE of the tournament row, which stays locked
+    # until they commit, so the sequences of a tournament commit in order
+    change_seq = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index(
+            'ix_matches_tournament_id_change_seq',
+            'tournament_id',
+            'change_seq',
+        ),
+    )
+
+    @staticmethod
+    def _competitor_loads():
+        """
+        Loader options that fetch the competitors of a match in the same
+        query, avoiding one lazy load per match.
+        """
+        return [
+            joinedload(Match.competitor_1),
+            joinedload(Match.competitor_2),
+            joinedload(Match.winner),
+        ]
 
     @staticmethod
     def _set_pair(names):
@@ -203,50 +441,31 @@ class Match(Base):
         and adds the competitors to their respective matches.
         """
 
-        logging.info('Start creating matches.')
+        logger.debug('Start creating matches.')
         existing_tournament = session.get(Tournament, tournament_id)
-        existing_competitor = (
-            session.query(Competitor)
-            .filter(
-                Competitor.tournament_id == tournament_id,
-            )
-            .first()
-        )
 
-        if existing_tournament is None or existing_competitor is None:
+        # rows written outside create_competitors have no counters yet
+        if existing_tournament is None or (
+            not existing_tournament.number_competitors
+            and session.query(Competitor.id)
+            .filter(Competitor.tournament_id == tournament_id)
+            .first()
+            is None
+        ):
             raise ValueError(f'Tournament with ID {tournament_id} not found.')
 
-        matches = (
-            session.query(Match)
-            .filter_by(tournament_id=tournament_id)
-            .order_by(desc(Match.round))
-            .all()
-        )
-
-        competitors_group_1 = cls._get_competitors_by_group(
-            session, tournament_id, GROUP_1
-        )
-        competitors_group_2 = cls._get_competitors_by_group(
-            session, tournament_id, GROUP_2
-        )
-        is_consolation_match = cls._should_create_consolation(
-            existing_tournament.number_matches, matches
-        )
-
-        logging.info('Verifying if the consolation match should be created.')
-        if is_consolation_match:
+        # every decision below reads the progress counters of the
+        # tournament row instead of scanning its matches and competitors
+        logger.debug('Verifying if the consolation match should be created.')
+        if cls._should_create_consolation(existing_tournament):
 
             cls._create_consolation_match(
                 tournament_id, existing_tournament.number_matches, session
             )
             return
 
-        logging.info('Verifying if the final match should be created.')
-        is_final_match = cls._should_create_final_match(
-            session, existing_tournament, matches
-        )
-
-        if is_final_match:
+        logger.debug('Verifying if the final match should be created.')
+        if cls._should_create_final_match(existing_tournament):
 
             cls._create_final_match(
                 session, tournament_id, existing_tournament.number_matches
@@ -254,79 +473,201 @@ class Match(Base):
             return
 
         if (
-            matches
-            and matches[0].round == existing_tournament.number_matches + 1
+            existing_tournament.current_round
+            >= existing_tournament.number_matches + 1
         ):
-            logging.info('Its not necessary create the match')
+            logger.debug('Its not necessary create the match')
             return
 
-        if matches and matches[0].state == STATUS_PENDING:
-            logging.info('Its not necessary create the match')
+        # pods advance in lockstep: a round starts in every pod once the
+        # previous one is over everywhere, and a pod left with its winner
+        # gets a bye until the cross-pod stage
+        if existing_tournament.pending_matches:
+            logger.debug('Its not necessary create the match')
 
             return
-        if matches:
-            round = matches[0].round + 1
-        else:
-            round = 1
-        logging.info('Start creating matches for group 1 and 2.')
+        round = existing_tournament.current_round + 1
+        logger.debug('Start creating matches for the pods.')
 
-        pairs_group_1 = cls._set_pair(competitors_group_1)
-        pairs_group_2 = cls._set_pair(competitors_group_2)
-        cls._create_matches_for_group(
-            session, tournament_id, pairs_group_1, round
+        number_pods = existing_tournament.number_pods or DEFAULT_NUMBER_PODS
+        pod_rounds = existing_tournament.number_matches - math.ceil(
+            math.log2(number_pods)
         )
-        cls._create_matches_for_group(
-            session, tournament_id, pairs_group_2, round
+        # cross-pod stage: the pod winners play among themselves
+        cross_pod = round > pod_rounds
+
+        if cls._pair_in_database(existing_tournament):
+            pending = cls._count_new_pairs(session, tournament_id, cross_pod)
+            pairs_per_pod = None
+        else:
+            pods = cls._get_active_competitors_by_pod(session, tournament_id)
+            if cross_pod:
+                pods = [[competitor for pod in pods for competitor in pod]]
+            pairs_per_pod = cls._set_pairs_for_pods(pods)
+            pending = sum(
+                len(pair) == 2 for pairs in pairs_per_pod for pair in pairs
+            )
+        # the counters move first: a concurrent request creating the same
+        # round rolls back before inserting its matches
+        change_seq = Tournament._record_new_matches(
+            session, existing_tournament, round, pending
+        )
+        if change_seq is None:
+            return
+        if pairs_per_pod is None:
+            cls._create_round_in_database(
+                session, tournament_id, round, cross_pod, change_seq
+            )
+        else:
+            for pairs in pairs_per_pod:
+                cls._create_matches_for_group(
+                    session, tournament_id, pairs, round, change_seq
+                )
+        MatchEvent.record_round(session, tournament_id, round)
+        OutboxMessage.enqueue(
+            session,
+            'round_created',
+            tournament_id,
+            {'round': round, 'pending_matches': pending},
         )
+        session.commit()
 
     @staticmethod
-    def _get_competitors_by_group(
-        session: Session, tournament_id: int, group: str
-    ):
+    def _get_active_competitors_by_pod(session: Session, tournament_id: int):
         """
-        This method gets the competitors by group.
+        This method gets the ids of the active competitors of each pod,
+        in a single query.
         """
-        return (
-            session.query(Competitor)
-            .filter(
-                and_(
-                    Competitor.tournament_id == tournament_id,
-                    Competitor.group == group,
-                    Competitor.status == True,  # noqa
-                )
+        rows = session.execute(
+            select(Competitor.id, Competitor.group)
+            .where(
+                Competitor.tournament_id == tournament_id,
+                Competitor.status == True,  # noqa
             )
-            .all()
+            .order_by(Competitor.group, Competitor.id)
         )
+        pods = {}
+        for competitor_id, group in rows:
+            pods.setdefault(group, []).append(competitor_id)
+        return list(pods.values())
 
     @staticmethod
-    def _should_create_final_match(session, tournament, matches):
+    def _pair_in_database(tournament):
         """
-        This method verifies if the final match should be created.
+        Rounds with at least ROUND_GENERATION_DATABASE_THRESHOLD active
+        competitors are paired by the database; 0 never does.
         """
-        participantes = (
-            session.query(Competitor)
-            .filter(Competitor.tournament_id == tournament.id)
-            .all()
-        )
-        total_atual = matches[0].round if matches else 0
-
-        if len(participantes) == 2:
-            return True
+        threshold = settings.ROUND_GENERATION_DATABASE_THRESHOLD
+        return 0 < threshold <= tournament.active_competitors
 
-        if len(participantes) == 3 and total_atual == 0:
-            return False
+    @staticmethod
+    def _count_new_pairs(session: Session, tournament_id: int, cross_pod):
+        """
+        Number of matches the next round will have, from the number of
+        active competitors of each pod.
+        """
+        sizes = session.scalars(
+            select(func.count())
+            .where(
+                Competitor.tournament_id == tournament_id,
+                Competitor.status == True,  # noqa
+            )
+            .group_by(Competitor.group)
+        ).all()
+        if cross_pod:
+            return sum(sizes) // 2
+        return sum(size // 2 for size in sizes)
 
-        total_atual = matches[0].round if matches else 0  # 0
+    @staticmethod
+    def _create_round_in_database(
+        session: Session,
+        tournament_id: int,
+        round: int,
+        cross_pod: bool,
+        change_seq: int,
+    ):
+        """
+        Creates the matches of a round with a single INSERT ... SELECT,
+        without reading the competitors: they are numbered in a random
+        order inside their pod with row_number(), every odd position plays
+        the next one, found with lead(), and an odd position with no next
+        one gets a bye, i.e. a finished match won by its competitor.
+        The caller commits.
+        """
+        ranked = (
+            select(
+                Competitor.id,
+                Competitor.group,
+                func.row_number()
+                .over(
+                    partition_by=None if cross_pod else Competitor.group,
+                    order_by=func.random(),
+                )
+                .label('position'),
+            )
+            .where(
+                Competitor.tournament_id == tournament_id,
+                Competitor.status == True,  # noqa
+            )
+            .subquery()
+        )
+        paired = select(
+            ranked.c.id,
+            ranked.c.position,
+            func.lead(ranked.c.id)
+            .over(
+                partition_by=None if cross_pod else ranked.c.group,
+                order_by=ranked.c.position,
+            )
+            .label('opponent'),
+        ).subquery()
+        bye = paired.c.opponent.is_(None)
+        session.execute(
+            insert(Match).from_select(
+                [
+                    'competitor_1_id',
+                    'competitor_2_id',
+                    'winner_id',
+                    'tournament_id',
+                    'round',
+                    'state',
+                    'change_seq',
+                ],
+                select(
+                    paired.c.id,
+                    paired.c.opponent,
+                    case((bye, paired.c.id)),
+                    literal(tournament_id),
+                    literal(round),
+                    cast(
+                        case((bye, STATUS_FINISHED), else_=STATUS_PENDING),
+                        Match.__table__.c.state.type,
+                    ),
+                    literal(change_seq),
+                ).where(paired.c.position % 2 == 1),
+            )
+        )
 
-        if tournament.number_matches and tournament.number_matches > 1:
-            quantidade_total_experado = tournament.number_matches + 1   # 3
+    @staticmethod
+    def _set_pairs_for_pods(pods):
+        """
+        This method sets the pairs of every pod.
+        """
+        return [Match._set_pair(pod) for pod in pods]
 
-        total = quantidade_total_experado - total_atual
+    @staticmethod
+    def _should_create_final_match(tournament):
+        """
+        This method verifies if the final match should be created, from
+        the counters of the tournament.
+        """
+        if tournament.number_competitors == 2:
+            return tournament.current_round == 0
 
-        if total == 1:
-            return True
+        if tournament.number_competitors == 3 and not tournament.current_round:
+            return False
 
-        return False
+        return tournament.number_matches + 1 - tournament.current_round == 1
 
     @staticmethod
     def _create_final_match(
@@ -336,7 +677,7 @@ class Match(Base):
         This method creates the final match.
         """
 
-        logging.info('Is need create final match.')
+        logger.debug('Is need create final match.')
         finalists = (
             session.query(Competitor)
             .filter(
@@ -356,52 +697,89 @@ class Match(Base):
                 state=STATUS_PENDING,
             )
 
+            tournament = session.get(Tournament, tournament_id)
+            finalists.change_seq = Tournament._record_new_matches(
+                session, tournament, finalists.round, 1
+            )
+            if finalists.change_seq is None:
+                return
             session.add(finalists)
+            session.flush()
+            MatchEvent.record(session, EVENT_MATCH_CREATED, [finalists])
+            OutboxMessage.enqueue(
+                session,
+                'round_created',
+                tournament_id,
+                {'round': finalists.round, 'pending_matches': 1},
+            )
             session.commit()
-            logging.info('Final match created.')
+            logger.info('Final match created.')
 
     def _create_matches_for_group(
         session: Session,
         tournament_id: int,
-        pairs: list[Competitor],
+        pairs: list[tuple[int]],
         round: int,
+        change_seq: int,
     ):
         """
-        This method creates the matches for a group.
+        This method creates the matches for a group, stamped with the
+        change sequence of the round.
+        The caller commits once every group is written.
         """
+        new_matches = []
         for pair in pairs:
             if len(pair) == 2:
-                new_match = Match(
-                    competitor_1_id=pair[0].id,
-                    competitor_2_id=pair[1].id,
-                    tournament_id=tournament_id,
-                    round=round,
-                    state=STATUS_PENDING,
+                new_matches.append(
+                    {
+                        'competitor_1_id': pair[0],
+                        'competitor_2_id': pair[1],
+                        'tournament_id': tournament_id,
+                        'round': round,
+                        'state': STATUS_PENDING,
+                        'winner_id': None,
+                        'change_seq': change_seq,
+                    }
                 )
-                session.add(new_match)
             else:
-                new_match = Match(
-                    competitor_1_id=pair[0].id,
-                    competitor_2_id=None,
-                    tournament_id=tournament_id,
-                    round=round,
-                    state=STATUS_FINISHED,
-                    winner_id=pair[0].id,
+                new_matches.append(
+                    {
+                        'competitor_1_id': pair[0],
+                        'competitor_2_id': None,
+                        'tournament_id': tournament_id,
+                        'round': round,
+                        'state': STATUS_FINISHED,
+                        'winner_id': pair[0],
+                        'change_seq': change_seq,
+                    }
                 )
-                session.add(new_match)
 
-        session.commit()
+        if new_matches:
+            session.execute(insert(Match), new_matches)
+
+    @staticmethod
+    def _check_fields(fields):
+        unknown = sorted(set(fields) - set(MATCH_FIELDS))
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}.')
 
     @classmethod
-    def list_matches(cls, tournament_id: int, session: Session):
+    def list_matches(
+        cls, tournament_id: int, session: Session, fields: list = None
+    ):
         """
         This method lists all matches from a tournament.
+        With fields, only those fields of each match are selected.
         """
-        logging.info('Finding matches.')
+        if fields is not None:
+            return cls._list_match_fields(tournament_id, session, fields)
+
+        logger.debug('Finding matches.')
 
         try:
             matches = (
                 session.query(Match)
+                .options(*cls._competitor_loads())
                 .filter_by(tournament_id=tournament_id)
                 .order_by(desc(Match.round))
                 .all()
@@ -419,6 +797,9 @@ class Match(Base):
                     dic[f'Round {match.round}'] = []
                 dic[f'Round {match.round}'].append(
                     {
+                        'competitor_1_id': match.competitor_1_id,
+                        'competitor_2_id': match.competitor_2_id,
+                        'winner_id': match.winner_id,
                         'competitor_1': match.competitor_1.name,
                         'competitor_2': match.competitor_2.name
                         if match.competitor_2
@@ -430,69 +811,246 @@ class Match(Base):
                     }
                 )
 
-            logging.info('Matches found.')
+            logger.debug('Matches found.')
             return dic
 
         except NoResultFound as e:
-            logging.warning(
-                f'No matches found for tournament with ID {tournament_id}.'
+            logger.warning(
+                'No matches found for tournament with ID %s.', tournament_id
             )
             raise ValueError(str(e))
 
+    @classmethod
+    def _list_match_fields(
+        cls, tournament_id: int, session: Session, fields: list
+    ):
+        """
+        Lists the given fields of every match of a tournament, in the
+        format of list_matches. Only the requested columns are selected,
+        and competitors are joined only for the requested names.
+        """
+        cls._check_fields(fields)
+        query = (
+            cls._select_match_fields(fields, Match.round.label('round_key'))
+            .where(Match.tournament_id == tournament_id)
+            .order_by(desc(Match.round), Match.id)
+        )
+        dic = {}
+        for row in session.execute(query):
+            dic.setdefault(f'Round {row.round_key}', []).append(
+                {field: row._mapping[field] for field in fields}
+            )
+        return dic
+
+    @staticmethod
+    def _select_match_fields(fields, *extra_columns):
+        """
+        SELECT of the given fields of the matches, labelled with their
+        names, joining one aliased competitor per requested name.
+        """
+        columns = []
+        joins = []
+        for field in fields:
+            if field in MATCH_NAME_FIELDS:
+                competitor = aliased(Competitor)
+                joins.append(
+                    (
+                        competitor,
+                        competitor.id
+                        == getattr(Match, MATCH_NAME_FIELDS[field]),
+                    )
+                )
+                columns.append(competitor.name.label(field))
+            else:
+                columns.append(getattr(Match, field).label(field))
+
+        query = select(*extra_columns, *columns)
+        for competitor, condition in joins:
+            query = query.outerjoin(competitor, condition)
+        return query
+
+    @classmethod
+    def list_changes(cls, tournament_id: int, session: Session, since: int):
+        """
+        Lists the matches of a tournament written after the change
+        sequence since, in the order they were written, through the
+        (tournament_id, change_seq) index.
+
+        Returns the matches, each with its change_seq, and the version to
+        pass as since on the next call.
+        """
+        tournament = session.get(Tournament, tournament_id)
+        if tournament is None:
+            raise ValueError(f'Tournament with ID {tournament_id} not found.')
+
+        # the version is read before the matches: every sequence up to it
+        # is committed, and a match written in between is sent again on
+        # the next call at worst
+        version = tournament.change_seq
+        rows = session.execute(
+            cls._select_match_fields(MATCH_FIELDS, Match.change_seq)
+            .where(
+                Match.tournament_id == tournament_id,
+                Match.change_seq > since,
+            )
+            .order_by(Match.change_seq, Match.id)
+        )
+        matches = [dict(row._mapping) for row in rows]
+        if matches:
+            version = max(version, matches[-1]['change_seq'])
+        return {'version': version, 'matches': matches}
+
     @classmethod
     def set_winner(
-        cls, match_id: int, tournament_id: int, name: str, session: Session
-    ):   # noqa
+        cls,
+        match_id: int,
+        tournament_id: int,
+        winner: dict,
+        session: Session,
+        commit: bool = True,
+    ):
         """
         This method sets the winner of a match and updates the state of the
         competitors.
+        The winner is identified by competitor_id; a name is only resolved
+        to an id, through the (tournament_id, name) unique index.
+        Every check runs before the first write, so an invalid result
+        leaves the session untouched. With commit=False the caller commits,
+        e.g. a group commit of many results.
         """
 
-        logging.info('Setting the winner of the match.')
-        name = name.get('name', '')
+        logger.debug('Setting the winner of the match.')
 
         match = session.get(Match, match_id)
 
-        if match is None:
-            logging.error(f'Match with ID {match_id} not found.')
+        if match is None or match.tournament_id != tournament_id:
+            logger.error('Match with ID %s not found.', match_id)
             raise ValueError(f'Match with ID {match_id} not found.')
 
-        competitor_winner = (
-            session.query(Competitor)
-            .filter(
-                Competitor.name == name,
-                Match.id == match_id,
-                Competitor.tournament_id == tournament_id,
+        winner_id = winner.get('competitor_id')
+        if winner_id is None:
+            name = winner.get('name', '')
+            winner_id = session.scalar(
+                select(Competitor.id).where(
+                    Competitor.tournament_id == tournament_id,
+                    Competitor.name == name,
+                )
             )
-            .all()
-        )
+            if winner_id is None:
+                logger.error('Competitor with name %s not found.', name)
+                raise ValueError(f'Competitor with name {name} not found.')
+
+        if match.competitor_2_id is None or winner_id not in (
+            match.competitor_1_id,
+            match.competitor_2_id,
+        ):
+            logger.error('Competitor not found or match is not valid.')
+            raise ValueError('Competitor not found or match is not valid')
 
-        if competitor_winner is None:
-            logging.error(f'Competitor with name {name} not found.')
-            raise ValueError(f'Competitor with name {name} not found.')
+        loser_id = (
+            match.competitor_2_id
+            if winner_id == match.competitor_1_id
+            else match.competitor_1_id
+        )
 
-        if match.competitor_1.name == name:
-            competitor_winner = match.competitor_1
-            competitor_loser = match.competitor_2
+        # the tournament row is updated first: it stays locked until the
+        # commit, so two reports of the same match run one after the other
+        was_pending = match.state == STATUS_PENDING
+        counters = {'change_seq': Tournament.change_seq + 1}
+        if was_pending:
+            counters.update(
+                pending_matches=Tournament.pending_matches - 1,
+                active_competitors=Tournament.active_competitors
+                - cls._eliminates(match),
+            )
+        change_seq = session.execute(
+            update(Tournament)
+            .where(Tournament.id == tournament_id)
+            .values(**counters)
+            .returning(Tournament.change_seq)
+        ).scalar_one()
+        finish = (
+            update(Match)
+            .where(Match.id == match.id)
+            .values(
+                winner_id=winner_id,
+                state=STATUS_FINISHED,
+                change_seq=change_seq,
+            )
+        )
+        if was_pending:
+            # the match may have been finished by another report since it
+            # was read; that report's winner and loser stand
+            finished = session.execute(
+                finish.where(Match.state == STATUS_PENDING)
+            ).rowcount
+            if finished != 1:
+                return cls._lost_winner_race(
+                    match, tournament_id, winner_id, session, commit
+                )
         else:
-            competitor_winner = match.competitor_2
-            competitor_loser = match.competitor_1
-
-        loser = session.get(Competitor, competitor_loser.id)
-        if competitor_loser is None:
-            session.rollback()
-            logging.error('Competitor not found or match is not valid.')
-            raise ValueError('Competitor not found or match is not valid')
+            session.execute(finish)
+        session.execute(
+            update(Competitor)
+            .where(Competitor.id == loser_id)
+            .values(status=False)
+        )
+        MatchEvent.record(session, EVENT_WINNER_SET, [match])
+        OutboxMessage.enqueue(
+            session,
+            'match_finished',
+            tournament_id,
+            {
+                'match_id': match.id,
+                'round': match.round,
+                'winner_id': winner_id,
+                'loser_id': loser_id,
+            },
+        )
+        if commit:
+            session.commit()
+        else:
+            session.flush()
 
-        loser.status = False
-        match.winner_id = competitor_winner.id
-        match.state = STATUS_FINISHED
-        session.add(match)
-        session.add(loser)
-        session.commit()
+        return match
 
+    @classmethod
+    def _lost_winner_race(
+        cls, match, tournament_id, winner_id, session, commit
+    ):
+        """
+        Undoes the counters of a report that found its match finished by
+        a concurrent one. The same winner is a retry and gets the match;
+        another winner is refused.
+        """
+        logger.info('Match %s was already finished.', match.id)
+        if commit:
+            session.rollback()
+        else:
+            # the rest of the group commit stays: only the counters moved
+            session.execute(
+                update(Tournament)
+                .where(Tournament.id == tournament_id)
+                .values(
+                    pending_matches=Tournament.pending_matches + 1,
+                    active_competitors=Tournament.active_competitors
+                    + cls._eliminates(match),
+                )
+            )
+        session.refresh(match)
+        if match.winner_id != winner_id:
+            raise ValueError(f'Match with ID {match.id} was already finished.')
         return match
 
+    @staticmethod
+    def _eliminates(match):
+        """
+        1 when the result of the match eliminates a competitor, else 0.
+        The consolation match, in round number_matches, is played by
+        competitors already eliminated in the semi-finals.
+        """
+        return case((Tournament.number_matches == match.round, 0), else_=1)
+
     @classmethod
     def get_topfour(cls, tournament: int, session: Session):
         """
@@ -508,62 +1066,35 @@ class Match(Base):
         if not total_rounds:
             return 'The championship has not had any matches and has not concluded yet.'   # noqa
 
-        competitors = (
-            session.query(Competitor)
-            .filter(Competitor.tournament_id == tournament)
-            .all()
-        )
-
         finalists = (
             session.query(Match)
+            .options(*cls._competitor_loads())
             .filter(
                 Match.tournament_id == tournament,
                 Match.round == championship.number_matches + 1,
             )
             .order_by(desc(Match.round))
+            .all()
         )
-        if total_rounds != finalists[0].round:
+        if (
+            not finalists
+            or total_rounds != finalists[0].round
+            or finalists[0].winner_id is None
+        ):
             return 'The championship is not over yet.'
 
-        # if the championship has only two competitors and one match
-        if len(competitors) == 2 and championship.number_matches == 1:
-            result = {}
-            for competitor in competitors:
-                if competitor.status:
-                    result['first'] = competitor.name.split(' ')[0]
-                else:
-                    result['second'] = competitor.name.split(' ')[0]
-            return result
-        if len(competitors) == 3 and championship.number_matches == 2:
-
-            winner = finalists[0].winner.name
-            second = finalists[0].winner.name
-
-            # taking third place
-            competitor_1_th_round = finalists[0].competitor_1
-            competitor_2_th_round = finalists[0].competitor_2
-
-            if competitor_1_th_round == finalists[0].winner:
-                third = competitor_2_th_round
-            else:
-                third = competitor_1_th_round
-
-            result = {
-                'first': winner,
-                'second': second,
-                'third': third.name,
-            }
-            return result
+        winner, second = cls._winner_and_loser(finalists[0])
 
-        winner = finalists[0].winner.name.split()
-        second_place = (
-            finalists[0].competitor_2.name
-            if finalists[0].competitor_1.name == winner
-            else finalists[0].competitor_1.name
-        )
+        # if the championship has only two competitors and one match
+        if (
+            championship.number_competitors == 2
+            and championship.number_matches == 1
+        ):
+            return {'first': winner.name, 'second': second.name}
 
         semi_finalists = (
             session.query(Match)
+            .options(*cls._competitor_loads())
             .filter(
                 Match.tournament_id == tournament,
                 Match.round == championship.number_matches,
@@ -571,21 +1102,125 @@ class Match(Base):
             .all()
         )
 
-        third_place_winner = semi_finalists[0].winner.name
-        fourth_place = (
-            semi_finalists[0].competitor_2.name
-            if semi_finalists[0].competitor_1.name == third_place_winner
-            else semi_finalists[0].competitor_1.name
-        )
+        third_place, fourth_place = cls._winner_and_loser(semi_finalists[0])
+
+        if (
+            championship.number_competitors == 3
+            and championship.number_matches == 2
+        ):
+            # the consolation round has a single competitor
+            return {
+                'first': winner.name,
+                'second': second.name,
+                'third': third_place.name,
+            }
 
         result = {
-            'winner': winner,
-            'second_place': second_place,
-            'third_place': third_place_winner,
-            'fourth_place': fourth_place,
+            'winner': winner.name,
+            'second_place': second.name,
+            'third_place': third_place.name,
+            'fourth_place': fourth_place.name if fourth_place else None,
         }
         return result
 
+    @classmethod
+    def get_stats(cls, tournament_id: int, session: Session):
+        """
+        Aggregates the progress of a tournament in a single statement: the
+        matches grouped by round and the competitors grouped by pod, in
+        one UNION ALL of the two grouped counts.
+        """
+        finished = func.sum(case((Match.state == STATUS_FINISHED, 1), else_=0))
+        byes = func.sum(case((Match.competitor_2_id.is_(None), 1), else_=0))
+        active = Competitor.status == True  # noqa
+        rounds = (
+            select(
+                literal(STATS_ROUND).label('kind'),
+                cast(Match.round, String).label('key'),
+                func.count().label('total'),
+                finished.label('done'),
+                byes.label('byes'),
+            )
+            .where(Match.tournament_id == tournament_id)
+            .group_by(Match.round)
+        )
+        pods = (
+            select(
+                literal(STATS_POD),
+                Competitor.group,
+                func.count(),
+                func.sum(case((active, 1), else_=0)),
+                literal(0),
+            )
+            .where(Competitor.tournament_id == tournament_id)
+            .group_by(Competitor.group)
+        )
+        rows = session.execute(union_all(rounds, pods)).all()
+        return cls._stats_from_rows(rows)
+
+    @staticmethod
+    def _stats_from_rows(rows):
+        """
+        Builds the stats from (kind, key, total, done, byes) rows: for a
+        round the matches, the finished ones and the byes among them; for
+        a pod its competitors and the ones still active.
+        """
+        rounds = []
+        pods = {}
+        for kind, key, total, done, byes in rows:
+            if kind == STATS_ROUND:
+                rounds.append(
+                    {
+                        'round': int(key),
+                        'matches': total,
+                        'finished': done,
+                        'pending': total - done,
+                        'byes': byes,
+                        'completion_rate': done / total,
+                    }
+                )
+            else:
+                pods[key] = {'competitors': total, 'survivors': done}
+        rounds.sort(key=lambda round: round['round'])
+        return {
+            'rounds': rounds,
+            'pending_matches': sum(round['pending'] for round in rounds),
+            'byes': sum(round['byes'] for round in rounds),
+            'pods': dict(sorted(pods.items())),
+        }
+
+    @classmethod
+    def get_snapshot_stats(cls, snapshot: dict):
+        """
+        The stats of an archived tournament, from its snapshot.
+        """
+        rows = {}
+        for matches in snapshot['bracket'].values():
+            for match in matches:
+                row = rows.setdefault(
+                    (STATS_ROUND, str(match['round'])), [0, 0, 0]
+                )
+                row[0] += 1
+                row[1] += match['state'] == STATUS_FINISHED
+                row[2] += match['competitor_2_id'] is None
+        for competitor in snapshot['competitors']:
+            row = rows.setdefault((STATS_POD, competitor['group']), [0, 0, 0])
+            row[0] += 1
+            row[1] += bool(competitor['status'])
+        return cls._stats_from_rows(
+            (kind, key, *counts) for (kind, key), counts in rows.items()
+        )
+
+    @staticmethod
+    def _winner_and_loser(match):
+        """
+        Returns the winner and the loser of a finished match, comparing
+        competitor ids.
+        """
+        if match.winner_id == match.competitor_1_id:
+            return match.competitor_1, match.competitor_2
+        return match.competitor_2, match.competitor_1
+
     def _create_consolation_match(
         tournament_id: int, last_round: int, session: Session
     ):
@@ -598,23 +1233,15 @@ class Match(Base):
             session (Session): The SQLAlchemy session.
 
         """
-        logging.info('Creating consolation match.')
+        logger.info('Creating consolation match.')
         penultimate_round = last_round - 1
+        tournament = session.get(Tournament, tournament_id)
 
         # Verify if a consolation match should be created
-        is_consolation = (
-            session.query(Match)
-            .filter(
-                Match.tournament_id == tournament_id,
-                Match.round == last_round,
-            )
-            .all()
-        )
-        for match in is_consolation:
-            if match.state == STATUS_PENDING:
-                return
+        if tournament.current_round >= last_round:
+            return
 
-        if penultimate_round >= 1 and not is_consolation:
+        if penultimate_round >= 1:
             # Query matches from the last completed round
             semi_finalists_matches = (
                 session.query(Match)
@@ -646,7 +1273,24 @@ class Match(Base):
                     round=last_round,
                     state=STATUS_PENDING,
                 )
+                new_semi_final_match.change_seq = (
+                    Tournament._record_new_matches(
+                        session, tournament, last_round, 1
+                    )
+                )
+                if new_semi_final_match.change_seq is None:
+                    return
                 session.add(new_semi_final_match)
+                session.flush()
+                MatchEvent.record(
+                    session, EVENT_MATCH_CREATED, [new_semi_final_match]
+                )
+                OutboxMessage.enqueue(
+                    session,
+                    'round_created',
+                    tournament_id,
+                    {'round': last_round, 'pending_matches': 1},
+                )
                 session.commit()
                 return
 
@@ -658,27 +1302,456 @@ class Match(Base):
                     state=STATUS_FINISHED,
                     winner_id=losers[0],
                 )
+                new_match.change_seq = Tournament._record_new_matches(
+                    session, tournament, last_round, 0
+                )
+                if new_match.change_seq is None:
+                    return
                 session.add(new_match)
+                session.flush()
+                MatchEvent.record(session, EVENT_MATCH_CREATED, [new_match])
                 session.commit()
-            logging.info('Consolation match created.')
+            logger.info('Consolation match created.')
 
     @staticmethod
-    def _should_create_consolation(total, matches):
+    def _should_create_consolation(tournament):
         """
-        This method verifies if a consolation match should be created.
+        This method verifies if a consolation match should be created:
+        the round before the last one is over and nothing is pending.
         """
-        # Verify if has a any match pending
-        logging.info('Verifying if a consolation match should be created.')
-        for match in matches:
-            if match.state == STATUS_PENDING:
-                logging.info('its not necessy create the consolation match')
-                return False
+        logger.debug('Verifying if a consolation match should be created.')
+        if tournament.pending_matches:
+            logger.debug('its not necessy create the consolation match')
+            return False
 
-        if matches:
-            total_atual = matches[0].round
-            sub = total - total_atual
-            if sub == 1:
-                logging.info('its not necessy create the consolation match')
-                return True
-        logging.info('its not necessy create the match')
+        if (
+            tournament.current_round
+            and tournament.number_matches - tournament.current_round == 1
+        ):
+            return True
+        logger.debug('its not necessy create the match')
         return False
+
+
+class TournamentArchive(Base):
+    __tablename__ = 'tournament_archives'
+
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        unique=True,
+        nullable=False,
+    )
+    tournament_id = Column(
+        Integer,
+        ForeignKey('tournaments.id'),
+        nullable=False,
+        unique=True,
+        index=True,
+    )
+    snapshot = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    @staticmethod
+    def _compress(data):
+        return zlib.compress(json.dumps(data).encode('utf-8'))
+
+    @staticmethod
+    def _decompress(snapshot):
+        return json.loads(zlib.decompress(snapshot).decode('utf-8'))
+
+    @classmethod
+    def archive_tournament(cls, tournament_id: int, session: Session):
+        """
+        Turns a finished tournament into a single compressed snapshot with
+        its bracket, competitors and podium, and deletes its match and
+        competitor rows from the hot tables.
+        """
+        tournament = session.get(Tournament, tournament_id)
+        if tournament is None:
+            raise ValueError(f'Tournament with ID {tournament_id} not found.')
+
+        if tournament.is_archived:
+            raise ValueError(
+                f'Tournament with ID {tournament_id} is already archived.'
+            )
+
+        pending = (
+            session.query(Match.id)
+            .filter(
+                Match.tournament_id == tournament_id,
+                Match.state == STATUS_PENDING,
+            )
+            .first()
+        )
+        try:
+            podium = Match.get_topfour(tournament_id, session)
+        except IndexError:
+            podium = None
+        if pending is not None or not isinstance(podium, dict):
+            raise ValueError('The championship is not over yet.')
+
+        competitors = (
+            session.query(Competitor)
+            .filter(Competitor.tournament_id == tournament_id)
+            .all()
+        )
+        snapshot = {
+            'tournament': {
+                'id': tournament.id,
+                'name': tournament.name,
+                'date_start': tournament.date_start.isoformat(),
+                'date_end': tournament.date_end.isoformat(),
+                'number_matches': tournament.number_matches,
+            },
+            'competitors': [
+                {
+                    'id': competitor.id,
+                    'name': competitor.name,
+                    'group': competitor.group,
+                    'status': competitor.status,
+                }
+                for competitor in competitors
+            ],
+            'bracket': Match.list_matches(tournament_id, session),
+            'podium': podium,
+        }
+
+        session.add(
+            cls(tournament_id=tournament_id, snapshot=cls._compress(snapshot))
+        )
+        session.query(Match).filter(
+            Match.tournament_id == tournament_id
+        ).delete(synchronize_session=False)
+        session.query(Competitor).filter(
+            Competitor.tournament_id == tournament_id
+        ).delete(synchronize_session=False)
+        tournament.is_archived = True
+        session.commit()
+        logger.info('Tournament %s archived.', tournament_id)
+
+    @classmethod
+    def archive_finished_tournaments(cls, session: Session):
+        """
+        Archives every finished tournament that is still in the hot tables.
+        Returns the IDs of the archived tournaments.
+        """
+        candidates = (
+            session.query(Tournament.id)
+            .filter(
+                Tournament.is_active == True,  # noqa
+                Tournament.is_archived.isnot(True),
+            )
+            .all()
+        )
+        archived = []
+        for (tournament_id,) in candidates:
+            try:
+                cls.archive_tournament(tournament_id, session)
+                archived.append(tournament_id)
+            except ValueError:
+                session.rollback()
+        return archived
+
+    @classmethod
+    def get_snapshot(cls, tournament_id: int, session: Session):
+        """
+        Returns the decompressed snapshot of an archived tournament.
+        """
+        archive = (
+            session.query(cls)
+            .filter(cls.tournament_id == tournament_id)
+            .one_or_none()
+        )
+        if archive is None:
+            raise ValueError(
+                f'Tournament with ID {tournament_id} is not archived.'
+            )
+        return cls._decompress(archive.snapshot)
+
+
+class MatchEvent(Base):
+    """
+    Append-only log of what happened in the matches of a tournament. The
+    id is the sequence consumers resume from.
+    """
+
+    __tablename__ = 'match_events'
+
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        unique=True,
+        nullable=False,
+    )
+    tournament_id = Column(
+        Integer, ForeignKey('tournaments.id'), nullable=False
+    )
+    kind = Column(String(32), nullable=False)
+    # no foreign keys: events outlive the matches deleted by archival
+    match_id = Column(Integer, nullable=False)
+    round = Column(Integer, nullable=False)
+    competitor_1_id = Column(Integer, nullable=True)
+    competitor_2_id = Column(Integer, nullable=True)
+    winner_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index('ix_match_events_tournament_id_id', 'tournament_id', 'id'),
+    )
+
+    @classmethod
+    def record(cls, session: Session, kind: str, matches):
+        """
+        Appends one event per match in a single executemany. The caller
+        commits, so the events are written in the same transaction as the
+        matches.
+        """
+        events = [
+            {
+                'tournament_id': match.tournament_id,
+                'kind': kind,
+                'match_id': match.id,
+                'round': match.round,
+                'competitor_1_id': match.competitor_1_id,
+                'competitor_2_id': match.competitor_2_id,
+                'winner_id': match.winner_id,
+            }
+            for match in matches
+        ]
+        if events:
+            session.execute(insert(cls), events)
+
+    @classmethod
+    def record_round(cls, session: Session, tournament_id: int, round: int):
+        """
+        Appends the creation events of every match of a round with a
+        single INSERT ... SELECT, without reading the new match ids back.
+        """
+        session.execute(
+            insert(cls).from_select(
+                [
+                    'tournament_id',
+                    'kind',
+                    'match_id',
+                    'round',
+                    'competitor_1_id',
+                    'competitor_2_id',
+                    'winner_id',
+                    'created_at',
+                ],
+                select(
+                    Match.tournament_id,
+                    literal(EVENT_MATCH_CREATED),
+                    Match.id,
+                    Match.round,
+                    Match.competitor_1_id,
+                    Match.competitor_2_id,
+                    Match.winner_id,
+                    literal(datetime.now()),
+                )
+                .where(
+                    Match.tournament_id == tournament_id, Match.round == round
+                )
+                .order_by(Match.id),
+            )
+        )
+
+    @classmethod
+    def list_since(
+        cls,
+        tournament_id: int,
+        session: Session,
+        since: int = 0,
+        limit: int = DEFAULT_EVENTS_LIMIT,
+    ):
+        """
+        Returns the events of a tournament after the given sequence, in
+        order, as dicts.
+        """
+        events = session.scalars(
+            select(cls)
+            .where(cls.tournament_id == tournament_id, cls.id > since)
+            .order_by(cls.id)
+            .limit(limit)
+        ).all()
+        return [event._as_dict() for event in events]
+
+    def _as_dict(self):
+        return {
+            'sequence': self.id,
+            'kind': self.kind,
+            'match_id': self.match_id,
+            'round': self.round,
+            'competitor_1_id': self.competitor_1_id,
+            'competitor_2_id': self.competitor_2_id,
+            'winner_id': self.winner_id,
+            'created_at': self.created_at,
+        }
+
+    @staticmethod
+    def replay(events):
+        """
+        Rebuilds the matches, progress and standings of a tournament from
+        its events alone, applied in sequence order.
+        """
+        matches = {}
+        last_sequence = 0
+        for event in events:
+            last_sequence = event['sequence']
+            match = matches.setdefault(event['match_id'], {})
+            match.update(
+                id=event['match_id'],
+                round=event['round'],
+                competitor_1_id=event['competitor_1_id'],
+                competitor_2_id=event['competitor_2_id'],
+                winner_id=event['winner_id'],
+                state=STATUS_FINISHED
+                if event['winner_id'] is not None
+                else STATUS_PENDING,
+            )
+
+        standings = {}
+        for match in matches.values():
+            for competitor_id in (
+                match['competitor_1_id'],
+                match['competitor_2_id'],
+            ):
+                if competitor_id is not None:
+                    standing = standings.setdefault(
+                        competitor_id,
+                        {
+                            'competitor_id': competitor_id,
+                            'wins': 0,
+                            'byes': 0,
+                            'losses': 0,
+                            'last_round': 0,
+                        },
+                    )
+                    standing['last_round'] = max(
+                        standing['last_round'], match['round']
+                    )
+            if match['winner_id'] is None:
+                continue
+            if match['competitor_2_id'] is None:
+                standings[match['winner_id']]['byes'] += 1
+                continue
+            loser_id = (
+                match['competitor_2_id']
+                if match['winner_id'] == match['competitor_1_id']
+                else match['competitor_1_id']
+            )
+            standings[match['winner_id']]['wins'] += 1
+            standings[loser_id]['losses'] += 1
+
+        ordered = sorted(matches.values(), key=lambda m: (m['round'], m['id']))
+        return {
+            'last_sequence': last_sequence,
+            'current_round': max((m['round'] for m in ordered), default=0),
+            'pending_matches': sum(
+                m['state'] == STATUS_PENDING for m in ordered
+            ),
+            'matches': ordered,
+            'standings': sorted(
+                standings.values(),
+                key=lambda s: (
+                    s['losses'] > 0,
+                    -s['wins'],
+                    s['competitor_id'],
+                ),
+            ),
+        }
+
+    @classmethod
+    def rebuild(cls, tournament_id: int, session: Session):
+        """
+        Replays every event of a tournament.
+        """
+        events = session.scalars(
+            select(cls)
+            .where(cls.tournament_id == tournament_id)
+            .order_by(cls.id)
+        ).all()
+        return cls.replay([event._as_dict() for event in events])
+
+
+class OutboxMessage(Base):
+    """
+    Notifications for the webhooks, written in the same transaction as
+    the change they announce and delivered later by the dispatcher.
+    """
+
+    __tablename__ = 'outbox_messages'
+
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        unique=True,
+        nullable=False,
+    )
+    tournament_id = Column(Integer, nullable=False)
+    event_type = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default=OUTBOX_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    delivered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            'ix_outbox_messages_status_next_attempt_at',
+            'status',
+            'next_attempt_at',
+        ),
+    )
+
+    @classmethod
+    def enqueue(
+        cls,
+        session: Session,
+        event_type: str,
+        tournament_id: int,
+        payload: dict,
+    ):
+        """
+        Adds a notification to the transaction of the caller, who commits.
+        Nothing is written when no webhook is configured.
+        """
+        if not settings.WEBHOOK_URLS:
+            return
+        session.execute(
+            insert(cls).values(
+                tournament_id=tournament_id,
+                event_type=event_type,
+                payload=json.dumps(payload),
+            )
+        )
+
+    def _as_dict(self):
+        return {
+            'id': self.id,
+            'event_type': self.event_type,
+            'tournament_id': self.tournament_id,
+            'payload': json.loads(self.payload),
+            'created_at': self.created_at.isoformat(),
+        }
+
+
+class Job(Base):
+    __tablename__ = 'jobs'
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, index=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.now, onupdate=datetime.now
+    )
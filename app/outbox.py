@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import background_engine, settings
+from app.models import (
+    OUTBOX_DELIVERED,
+    OUTBOX_FAILED,
+    OUTBOX_PENDING,
+    OutboxMessage,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDispatcher:
+    """
+    Delivers the outbox messages to every webhook URL in batches, outside
+    the requests that wrote them.
+
+    A batch is POSTed as {"messages": [...]} to all URLs at once over one
+    pooled client. When any URL fails, the whole batch is retried later
+    with exponential backoff and jitter, so delivery is at least once:
+    receivers must ignore message ids they have already seen. A message
+    is marked failed after max_attempts.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        urls,
+        batch_size=100,
+        max_attempts=8,
+        backoff_seconds=1.0,
+        max_backoff_seconds=300.0,
+        timeout_seconds=5.0,
+        poll_interval=1.0,
+    ):
+        self.session_factory = session_factory
+        self.urls = list(urls)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.poll_interval = poll_interval
+        self._client = None
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        """
+        Delivers batches until stop is called; sleeps for poll_interval
+        whenever there is nothing due.
+        """
+        self._stopping.clear()
+        logger.info('Outbox dispatcher started for %s URLs.', len(self.urls))
+        try:
+            while not self._stopping.is_set():
+                try:
+                    delivered = await self.dispatch_once()
+                except Exception as e:
+                    logger.error('Outbox dispatch failed: %s', e)
+                    delivered = 0
+                if not delivered:
+                    try:
+                        await asyncio.wait_for(
+                            self._stopping.wait(), self.poll_interval
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await self.close()
+
+    async def stop(self):
+        self._stopping.set()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def dispatch_once(self):
+        """
+        Claims one batch of due messages and delivers it. Returns the
+        number of messages delivered.
+        """
+        messages = await asyncio.to_thread(self._claim)
+        if not messages:
+            return 0
+
+        body = {'messages': messages}
+        errors = [
+            error
+            for error in await asyncio.gather(
+                *[self._post(url, body) for url in self.urls]
+            )
+            if error is not None
+        ]
+        ids = [message['id'] for message in messages]
+        await asyncio.to_thread(self._settle, ids, '; '.join(errors) or None)
+        if errors:
+            logger.warning('Outbox batch of %s failed: %s', len(ids), errors)
+            return 0
+        return len(ids)
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=max(len(self.urls), 1) * 4,
+                    max_keepalive_connections=max(len(self.urls), 1) * 4,
+                ),
+            )
+        return self._client
+
+    async def _post(self, url, body):
+        try:
+            response = await self._get_client().post(url, json=body)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return f'{url}: {e}'
+        return None
+
+    def _claim(self):
+        """
+        Reads the next due messages and leases them until the delivery
+        times out, so another dispatcher does not send them meanwhile.
+        """
+        now = datetime.now()
+        with self.session_factory() as session:
+            messages = session.scalars(
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.status == OUTBOX_PENDING,
+                    OutboxMessage.next_attempt_at <= now,
+                )
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not messages:
+                return []
+            claimed = [message._as_dict() for message in messages]
+            session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_([m['id'] for m in claimed]))
+                .values(
+                    next_attempt_at=now
+                    + timedelta(seconds=self.timeout_seconds * 2)
+                )
+            )
+            session.commit()
+            return claimed
+
+    def _settle(self, ids, error):
+        now = datetime.now()
+        with self.session_factory() as session:
+            if error is None:
+                session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids))
+                    .values(
+                        status=OUTBOX_DELIVERED,
+                        attempts=OutboxMessage.attempts + 1,
+                        delivered_at=now,
+                        last_error=None,
+                    )
+                )
+            else:
+                messages = session.scalars(
+                    select(OutboxMessage).where(OutboxMessage.id.in_(ids))
+                ).all()
+                for message in messages:
+                    message.attempts += 1
+                    message.last_error = error
+                    if message.attempts >= self.max_attempts:
+                        message.status = OUTBOX_FAILED
+                    else:
+                        message.next_attempt_at = now + timedelta(
+                            seconds=self._backoff(message.attempts)
+                        )
+            session.commit()
+
+    def _backoff(self, attempts):
+        """
+        Exponential backoff with jitter between half and all of the delay.
+        """
+        delay = min(
+            self.backoff_seconds * 2 ** (attempts - 1),
+            self.max_backoff_seconds,
+        )
+        return random.uniform(delay / 2, delay)
+
+
+def create_dispatcher():
+    return OutboxDispatcher(
+        lambda: Session(background_engine),
+        settings.WEBHOOK_URLS,
+        batch_size=settings.WEBHOOK_BATCH_SIZE,
+        max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+        backoff_seconds=settings.WEBHOOK_BACKOFF_SECONDS,
+        max_backoff_seconds=settings.WEBHOOK_MAX_BACKOFF_SECONDS,
+        timeout_seconds=settings.WEBHOOK_TIMEOUT_SECONDS,
+        poll_interval=settings.WEBHOOK_POLL_INTERVAL,
+    )
@@ -0,0 +1,71 @@
+"""
+Match event replay.
+
+Rebuilds the matches, progress and standings of a tournament from its
+append-only event log and prints them as JSON. With --verify it also
+compares the rebuilt matches with the matches table and exits with 1 on
+any difference.
+
+Usage:
+    python -m app.replay 42
+    python -m app.replay 42 --verify
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models import Match, MatchEvent
+
+
+def verify(tournament_id, session, state):
+    """
+    Returns the ids of the matches whose live row differs from the
+    replayed one.
+    """
+    live = {
+        match.id: {
+            'id': match.id,
+            'round': match.round,
+            'competitor_1_id': match.competitor_1_id,
+            'competitor_2_id': match.competitor_2_id,
+            'winner_id': match.winner_id,
+            'state': match.state,
+        }
+        for match in session.query(Match).filter_by(
+            tournament_id=tournament_id
+        )
+    }
+    replayed = {match['id']: match for match in state['matches']}
+    return sorted(
+        match_id
+        for match_id in live.keys() | replayed.keys()
+        if live.get(match_id) != replayed.get(match_id)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('tournament_id', type=int)
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Compare the rebuilt matches with the matches table.',
+    )
+    args = parser.parse_args(argv)
+
+    with Session(engine) as session:
+        state = MatchEvent.rebuild(args.tournament_id, session)
+        print(json.dumps(state, indent=2))
+        if args.verify:
+            mismatches = verify(args.tournament_id, session, state)
+            for match_id in mismatches:
+                print(f'MISMATCH match {match_id}', file=sys.stderr)
+            return 1 if mismatches else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,44 +1,93 @@
 import logging
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Annotated, Literal, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session
 
-from app.database import get_session
-from app.models import Competitor, Match, Tournament
+from app.admission import admission_limiters
+from app.coalescing import match_list_flight, tournament_stats_cache
+from app.database import get_read_session, get_session
+from app.encoding import LAYOUT_ROWS, negotiate
+from app.group_commit import GroupCommitter, get_group_committer
+from app.jobs import JobQueue, get_job_queue
+from app.models import (
+    Match,
+    MatchEvent,
+    Tournament,
+    TournamentArchive,
+)
 from app.schemas import (
     CompetitorSchema,
+    SimulationSchema,
+    TournamentPageSchema,
     TournamentSchema,
     TournamentSchemaResponse,
     WinnerRegistrationSchema,
 )
+from app.simulation import simulate_tournament
+from app.storage import TournamentStorage, get_storage
+from app.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix='', tags=['/'])
+router = APIRouter(prefix='', tags=['/'], route_class=TracedRoute)
 
+ReadSession = Annotated[Session, Depends(get_read_session)]
 Session = Annotated[Session, Depends(get_session)]
+JobQueue = Annotated[JobQueue, Depends(get_job_queue)]
+Storage = Annotated[TournamentStorage, Depends(get_storage)]
+# rows: a list of objects; columnar: one list per field
+Layout = Literal['rows', 'columnar']
+GroupCommitter = Annotated[
+    Optional[GroupCommitter], Depends(get_group_committer)
+]
+
+
+def _parse_fields(fields):
+    """
+    The fields of a ?fields= parameter, without repetitions, or None
+    when it is missing.
+    """
+    if fields is None:
+        return None
+    field_list = list(
+        dict.fromkeys(field.strip() for field in fields.split(','))
+    )
+    field_list = [field for field in field_list if field]
+    Match._check_fields(field_list)
+    return field_list
+
+
+def _job_accepted(response, job_id):
+    response.status_code = 202
+    return {'job_id': job_id, 'status': 'queued'}
 
 
 @router.post(
     '/tournament', status_code=201, response_model=TournamentSchemaResponse
 )
-def create_tournament(tournament: TournamentSchema, session: Session):
+def create_tournament(tournament: TournamentSchema, storage: Storage):
     """
     Creates a new tournament.
 
     Parameters:
         - tournament: Tournament data (TournamentSchema).
-        - session: SQLAlchemy session.
+        - storage: Where the tournaments are kept.
 
     Returns:
         The created tournament.
     """
     try:
 
-        new_tournament = Tournament.create_tournament(
-            session=session, **tournament.model_dump()
-        )
+        new_tournament = storage.create_tournament(**tournament.model_dump())
 
         return new_tournament
 
@@ -47,9 +96,65 @@ def create_tournament(tournament: TournamentSchema, session: Session):
         return HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    '/tournaments', status_code=201, response_model=TournamentPageSchema
+)
+def list_tournaments(
+    request: Request,
+    session: ReadSession,
+    layout: Layout = LAYOUT_ROWS,
+    order_by: Literal['id', 'date_start'] = 'id',
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    is_active: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Lists tournaments with their progress, one page at a time.
+
+    Parameters:
+        - order_by: id or date_start.
+        - cursor: next_cursor of the previous page.
+        - limit: Tournaments per page (1 to 200).
+        - is_active: Only started (true) or not started (false) ones.
+        - date_from, date_to: Range of date_start.
+        - layout: rows or columnar.
+        - session: SQLAlchemy session, of a replica when there is one.
+
+    Returns:
+        The tournaments and the cursor of the next page, null on the last.
+        As MessagePack when the Accept header asks for application/msgpack.
+    """
+    try:
+        tournaments, next_cursor = Tournament.list_tournaments(
+            session,
+            order_by=order_by,
+            cursor=cursor,
+            limit=limit,
+            is_active=is_active,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        return negotiate(
+            request,
+            {'tournaments': tournaments, 'next_cursor': next_cursor},
+            layout,
+            schema=TournamentPageSchema,
+            status_code=201,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post('/tournament/{tournament_id}/competitor', status_code=201)
 def register_competitors(
-    tournament_id: int, competitor: CompetitorSchema, session: Session
+    tournament_id: int,
+    competitor: CompetitorSchema,
+    storage: Storage,
+    job_queue: JobQueue,
+    response: Response,
+    background: bool = False,
 ):
     """
     Registers competitors in a tournament.
@@ -57,36 +162,136 @@ def register_competitors(
     Parameters:
         - tournament_id: The ID of the tournament.
         - names: List of competitor names.
+        - storage: Where the tournaments are kept.
+        - background: Enqueues the import and answers 202 with a job id.
     """
-    try:
-        Competitor.create_competitors(
-            names=competitor.names,
+    if background:
+        job_id = job_queue.enqueue(
+            'register_competitors',
             tournament_id=tournament_id,
-            session=session,
+            names=competitor.names,
         )
+        return _job_accepted(response, job_id)
+    try:
+        storage.register_competitors(tournament_id, competitor.names)
         return None
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get('/tournament/{tournament_id}/match', status_code=201)
-def get_match_list(tournament_id: int, session: Session):
+def get_match_list(
+    tournament_id: int,
+    request: Request,
+    session: Session,
+    storage: Storage,
+    layout: Layout = LAYOUT_ROWS,
+    fields: Optional[str] = None,
+):
     """
     Gets the list of matches for a specific tournament.
 
     Parameters:
         - tournament_id: The ID of the tournament.
-        - session: SQLAlchemy session.
+        - session: SQLAlchemy session, for the archived tournaments.
+        - storage: Where the tournaments are kept; the matches are listed
+          from a replica, or the primary right after a new round is
+          created.
+        - layout: rows or columnar, one list per field in every round.
+        - fields: Comma-separated fields of each match, e.g.
+          id,round,state. The competitors are only joined when a name
+          (competitor_1, competitor_2, winner) is asked for.
+
+    Concurrent requests for the same tournament at the same version,
+    its change sequence and number of competitors, share one round
+    creation and one listing.
 
     Returns:
-        A dictionary containing information about the matches.
+        A dictionary containing information about the matches. As
+        MessagePack when the Accept header asks for application/msgpack.
     """
     try:
-        Match.create_match(tournament_id, session)
+        field_list = _parse_fields(fields)
+        tournament = storage.get_tournament(tournament_id)
+        if tournament is not None and tournament.is_archived:
+            snapshot = TournamentArchive.get_snapshot(tournament_id, session)
+            bracket = snapshot['bracket']
+            if field_list is not None:
+                bracket = {
+                    round: [
+                        {field: match[field] for field in field_list}
+                        for match in matches
+                    ]
+                    for round, matches in bracket.items()
+                }
+            return negotiate(request, bracket, layout, status_code=201)
+
+        def create_and_list():
+            storage.create_match(tournament_id)
+            return storage.list_matches(tournament_id, field_list)
+
+        version = (
+            (tournament.change_seq, tournament.number_competitors)
+            if tournament is not None
+            else None
+        )
+        matches_info = match_list_flight.do(
+            (
+                tournament_id,
+                version,
+                tuple(field_list) if field_list is not None else None,
+            ),
+            create_and_list,
+        )
+        return negotiate(request, matches_info, layout, status_code=201)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get('/tournament/{tournament_id}/match/changes', status_code=201)
+def get_match_changes(
+    tournament_id: int,
+    request: Request,
+    session: ReadSession,
+    storage: Storage,
+    since: int = Query(default=0, ge=0),
+):
+    """
+    Gets the matches of a tournament changed after a version, so a
+    client holding the bracket only downloads what was written since its
+    last poll.
 
-        matches_info = Match.list_matches(tournament_id, session)
+    Parameters:
+        - tournament_id: The ID of the tournament.
+        - since: version of the previous call; 0 for every match.
+        - session: SQLAlchemy session, of a replica when there is one,
+          for the archived tournaments.
+        - storage: Where the tournaments are kept.
 
-        return matches_info
+    Unlike the match list, it never creates the next round.
+
+    Returns:
+        The changed matches, in the order they were written, and the
+        version to pass as since next time. An archived tournament sends
+        its whole bracket once, to clients behind its last version.
+    """
+    try:
+        tournament = storage.get_tournament(tournament_id)
+        if tournament is not None and tournament.is_archived:
+            matches = []
+            if since < tournament.change_seq:
+                snapshot = TournamentArchive.get_snapshot(
+                    tournament_id, session
+                )
+                matches = [
+                    {**match, 'change_seq': tournament.change_seq}
+                    for round_matches in snapshot['bracket'].values()
+                    for match in round_matches
+                ]
+            changes = {'version': tournament.change_seq, 'matches': matches}
+        else:
+            changes = storage.list_changes(tournament_id, since)
+        return negotiate(request, changes, status_code=201)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -96,7 +301,8 @@ def put_winner_for_match(
     tournament_id: int,
     match_id: int,
     winner: WinnerRegistrationSchema,
-    session: Session,
+    storage: Storage,
+    committer: GroupCommitter,
 ):
     """
     Sets the winner of a match in a specific tournament.
@@ -105,7 +311,10 @@ def put_winner_for_match(
         - tournament_id: The ID of the tournament.
         - match_id: The ID of the match.
         - winner: Winner data (WinnerRegistrationSchema).
-        - session: SQLAlchemy session.
+        - storage: Where the tournaments are kept.
+        - committer: Group committer when GROUP_COMMIT_ENABLED is set; the
+          result then shares its commit with the results reported at the
+          same time.
 
     Returns:
         A dictionary containing information about the matches.
@@ -113,9 +322,10 @@ def put_winner_for_match(
     try:
         winner_data = winner.model_dump()
         match_instance = Match()
-        match_instance.set_winner(
-            match_id, tournament_id, winner_data, session
-        )
+        if committer is not None:
+            committer.set_winner(match_id, tournament_id, winner_data)
+        else:
+            storage.set_winner(tournament_id, match_id, winner_data)
 
         success_message = f'Winner successfully updated for match {match_id}'
         return {'message': success_message, 'matches_info': match_instance}
@@ -124,20 +334,223 @@ def put_winner_for_match(
 
 
 @router.get('/tournament/{tournament_id}/result', status_code=201)
-def get_topfour(tournament_id: int, session: Session):
+def get_topfour(
+    tournament_id: int,
+    request: Request,
+    session: ReadSession,
+    storage: Storage,
+):
     """
     Gets the top 4 competitors in a specific tournament.
 
     Parameters:
         - tournament_id: The ID of the tournament.
-        - session: SQLAlchemy session.
+        - session: SQLAlchemy session, of a replica when there is one,
+          for the archived tournaments.
+        - storage: Where the tournaments are kept; the podium is read
+          from a replica when there is one.
 
     Returns:
         A dictionary containing information about the top 4 competitors.
+        As MessagePack when the Accept header asks for application/msgpack.
     """
     try:
-        top4 = Match.get_topfour(tournament_id, session)
+        tournament = storage.get_tournament(tournament_id)
+        if tournament is not None and tournament.is_archived:
+            snapshot = TournamentArchive.get_snapshot(tournament_id, session)
+            return negotiate(request, snapshot['podium'], status_code=201)
+
+        top4 = storage.get_topfour(tournament_id)
 
-        return top4
+        return negotiate(request, top4, status_code=201)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get('/tournament/{tournament_id}/stats', status_code=201)
+def get_stats(tournament_id: int, request: Request, session: ReadSession):
+    """
+    Gets the progress statistics of a tournament.
+
+    Parameters:
+        - tournament_id: The ID of the tournament.
+        - session: SQLAlchemy session, of a replica when there is one.
+
+    The stats are computed with one grouped aggregate and kept per
+    tournament version (STATS_CACHE_SIZE), so until the next write they
+    cost one read of the tournament row.
+
+    Returns:
+        The matches, finished, pending and byes of every round with its
+        completion rate, the totals of pending matches and byes, and the
+        competitors and survivors of every pod.
+    """
+    tournament = session.get(Tournament, tournament_id)
+    if tournament is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Tournament with ID {tournament_id} not found.',
+        )
+
+    def compute():
+        if tournament.is_archived:
+            snapshot = TournamentArchive.get_snapshot(tournament_id, session)
+            return Match.get_snapshot_stats(snapshot)
+        return Match.get_stats(tournament_id, session)
+
+    version = (
+        tournament.change_seq,
+        tournament.number_competitors,
+        tournament.is_archived,
+    )
+    stats = tournament_stats_cache.get(tournament_id, version, compute)
+    return negotiate(
+        request, {'version': tournament.change_seq, **stats}, status_code=201
+    )
+
+
+@router.get('/tournament/{tournament_id}/events', status_code=201)
+def get_events(
+    tournament_id: int,
+    session: ReadSession,
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=5000),
+):
+    """
+    Gets the match events of a tournament after a sequence number.
+
+    Parameters:
+        - tournament_id: The ID of the tournament.
+        - since: last_sequence of the previous call; 0 for every event.
+        - limit: Maximum number of events returned.
+        - session: SQLAlchemy session, of a replica when there is one.
+
+    Returns:
+        The events in order and the sequence to resume from.
+    """
+    events = MatchEvent.list_since(tournament_id, session, since, limit)
+    last_sequence = events[-1]['sequence'] if events else since
+    return {'events': events, 'last_sequence': last_sequence}
+
+
+@router.post('/tournament/{tournament_id}/round', status_code=202)
+def generate_round(tournament_id: int, job_queue: JobQueue):
+    """
+    Enqueues the generation of the next round of a tournament.
+
+    Parameters:
+        - tournament_id: The ID of the tournament.
+
+    Returns:
+        The job id, to be followed on GET /job/{job_id}.
+    """
+    job_id = job_queue.enqueue('generate_round', tournament_id=tournament_id)
+    return {'job_id': job_id, 'status': 'queued'}
+
+
+@router.post('/tournament/{tournament_id}/archive', status_code=201)
+def archive_tournament(
+    tournament_id: int,
+    session: Session,
+    job_queue: JobQueue,
+    response: Response,
+    background: bool = False,
+):
+    """
+    Archives a finished tournament into a compressed snapshot.
+
+    Parameters:
+        - tournament_id: The ID of the tournament.
+        - session: SQLAlchemy session.
+        - background: Enqueues the archival and answers 202 with a job id.
+
+    Returns:
+        A confirmation message.
+    """
+    if background:
+        job_id = job_queue.enqueue(
+            'archive_tournament', tournament_id=tournament_id
+        )
+        return _job_accepted(response, job_id)
+    try:
+        TournamentArchive.archive_tournament(tournament_id, session)
+
+        return {'message': f'Tournament {tournament_id} archived.'}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get('/job/{job_id}', status_code=201)
+def get_job(job_id: str, job_queue: JobQueue):
+    """
+    Gets the status of a background job.
+
+    Parameters:
+        - job_id: The ID returned when the job was enqueued.
+
+    Returns:
+        The job kind, status, result and error, if any.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'Job {job_id} not found.')
+    return job
+
+
+@router.get('/metrics/admission', status_code=201)
+def get_admission_metrics():
+    """
+    Gets the state of the admission limiters.
+
+    Returns:
+        Per route class (read, write): the limit, the running and queued
+        requests, the peak queue depth and the admitted and rejected
+        counts.
+    """
+    return {
+        name: limiter.metrics() for name, limiter in admission_limiters.items()
+    }
+
+
+@router.get('/metrics/coalescing', status_code=201)
+def get_coalescing_metrics():
+    """
+    Gets the state of the match list coalescing.
+
+    Returns:
+        The requests that ran the match list (leaders), the requests that
+        shared the result of a running one (coalesced) and the lists
+        running now (in_flight).
+    """
+    return match_list_flight.metrics()
+
+
+@router.get('/metrics/stats_cache', status_code=201)
+def get_stats_cache_metrics():
+    """
+    Gets the state of the tournament stats cache.
+
+    Returns:
+        The stats served from the cache (hits), the ones computed
+        (misses) and the tournaments kept (entries).
+    """
+    return tournament_stats_cache.metrics()
+
+
+@router.post('/simulation', status_code=201)
+def simulate(simulation: SimulationSchema):
+    """
+    Simulates a tournament many times from the strength of each competitor.
+
+    Parameters:
+        - simulation: Strengths, number of simulations and an optional
+          seed (SimulationSchema).
+
+    Returns:
+        The placement probabilities per competitor and the number of
+        rounds and matches of the tournament.
+    """
+    try:
+        return simulate_tournament(**simulation.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
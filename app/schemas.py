@@ -1,13 +1,24 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+# a simulation holds about 15 bytes per competitor and simulation
+SIMULATION_MAX_COMPETITORS = 4096
+SIMULATION_MAX_DRAWS = 10_000_000
 
 
 class TournamentSchema(BaseModel):
     name: str
     date_start: datetime
     date_end: datetime
+    number_pods: int = 2
+
+    @field_validator('number_pods')
+    def validate_number_pods(cls, v):
+        if v < 2:
+            raise ValueError('number_pods must be at least 2')
+        return v
 
     @field_validator('date_end')
     def validate_date_end(cls, v, values):
@@ -25,6 +36,27 @@ class TournamentSchemaResponse(TournamentSchema):
     name: str
     date_start: datetime
     date_end: datetime
+    number_pods: Optional[int] = None
+
+
+class TournamentProgressSchema(BaseModel):
+    id: int
+    name: str
+    date_start: datetime
+    date_end: datetime
+    is_active: Optional[bool] = None
+    is_archived: Optional[bool] = None
+    number_pods: Optional[int] = None
+    number_competitors: int
+    active_competitors: int
+    number_matches: Optional[int] = None
+    current_round: int
+    pending_matches: int
+
+
+class TournamentPageSchema(BaseModel):
+    tournaments: List[TournamentProgressSchema]
+    next_cursor: Optional[str] = None
 
 
 class CompetitorSchema(BaseModel):
@@ -49,4 +81,41 @@ class MatchTournamentSchema(BaseModel):
 
 
 class WinnerRegistrationSchema(BaseModel):
-    name: str
+    competitor_id: Optional[int] = None
+    name: Optional[str] = None
+
+    @model_validator(mode='after')
+    def validate_winner(self):
+        if self.competitor_id is None and self.name is None:
+            raise ValueError('competitor_id or name is required')
+        return self
+
+
+class SimulationSchema(BaseModel):
+    strengths: List[float] = Field(
+        min_length=2, max_length=SIMULATION_MAX_COMPETITORS
+    )
+    simulations: int = 100_000
+    seed: Optional[int] = None
+    number_pods: int = 2
+
+    @field_validator('simulations')
+    def validate_simulations(cls, v):
+        if v < 1 or v > 1_000_000:
+            raise ValueError('simulations must be between 1 and 1000000')
+        return v
+
+    @field_validator('number_pods')
+    def validate_number_pods(cls, v):
+        if v < 2:
+            raise ValueError('number_pods must be at least 2')
+        return v
+
+    @model_validator(mode='after')
+    def validate_draws(self):
+        if len(self.strengths) * self.simulations > SIMULATION_MAX_DRAWS:
+            raise ValueError(
+                'simulations times competitors must be at most '
+                f'{SIMULATION_MAX_DRAWS}'
+            )
+        return self
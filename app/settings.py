@@ -1,5 +1,3 @@
-from logging import INFO, StreamHandler, basicConfig
-
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,13 +7,44 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
-
-
-logger_config = {
-    'level': INFO,
-    'encoding': 'utf-8',
-    'format': '%(asctime)s %(levelname)s: %(message)s',
-    'handlers': [StreamHandler()],
-}
-
-basicConfig(**logger_config)
+    # read-only endpoints go to these replicas, e.g. '["postgresql://..."]'
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 5.0
+    # reads of a tournament stay on the primary this long after a write
+    REPLICA_READ_YOUR_WRITES_SECONDS: float = 5.0
+    # rounds this large are paired by the database itself; 0 disables
+    ROUND_GENERATION_DATABASE_THRESHOLD: int = 0
+    # background jobs: 'memory' or 'database' (the jobs table)
+    JOB_BACKEND: str = 'memory'
+    JOB_WORKERS: int = 2
+    # result notifications, e.g. '["https://scoreboard.example/hook"]'
+    WEBHOOK_URLS: list[str] = []
+    WEBHOOK_BATCH_SIZE: int = 100
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    WEBHOOK_BACKOFF_SECONDS: float = 1.0
+    WEBHOOK_MAX_BACKOFF_SECONDS: float = 300.0
+    WEBHOOK_TIMEOUT_SECONDS: float = 5.0
+    WEBHOOK_POLL_INTERVAL: float = 1.0
+    # concurrent requests per route class; together they should not
+    # exceed the engine pool (5 connections + 10 overflow by default);
+    # background work has a pool of its own
+    ADMISSION_READ_LIMIT: int = 10
+    ADMISSION_WRITE_LIMIT: int = 5
+    ADMISSION_MAX_QUEUE: int = 50
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_RETRY_AFTER: int = 1
+    # results reported within GROUP_COMMIT_MAX_DELAY seconds share a commit
+    GROUP_COMMIT_ENABLED: bool = False
+    GROUP_COMMIT_MAX_DELAY: float = 0.005
+    GROUP_COMMIT_MAX_BATCH: int = 64
+    # tournaments whose stats are kept for their current version; 0 disables
+    STATS_CACHE_SIZE: int = 1024
+    LOG_LEVEL: str = 'INFO'
+    LOG_JSON: bool = True
+    # share of DEBUG lines kept; they are the high-frequency ones
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
+    # share of requests traced when no traceparent header decides it
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_EXPORTER: str = 'memory'
+    TRACE_FILE: str = 'traces.jsonl'
+    TRACE_MAX_SPANS: int = 10_000
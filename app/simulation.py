@@ -0,0 +1,164 @@
+import logging
+import math
+
+import numpy as np
+
+from app.models import DEFAULT_NUMBER_PODS, Competitor
+
+logger = logging.getLogger(__name__)
+
+PLACES = ('first', 'second', 'third', 'fourth')
+
+
+def _shuffle(group, rng):
+    """
+    Shuffles every row independently; sorting random keys is faster than
+    Generator.permuted for wide arrays.
+    """
+    order = rng.random(group.shape, dtype=np.float32).argsort(axis=1)
+    return np.take_along_axis(group, order, axis=1)
+
+
+def _play(strengths, rng, competitor_a, competitor_b):
+    """
+    Plays the matches between two arrays of competitors at once. A
+    competitor wins with its strength over the sum of both strengths.
+    """
+    strength_a = strengths[competitor_a]
+    strength_b = strengths[competitor_b]
+    draws = rng.random(competitor_a.shape, dtype=np.float32)
+    wins = draws * (strength_a + strength_b) < strength_a
+    winners = np.where(wins, competitor_a, competitor_b)
+    losers = np.where(wins, competitor_b, competitor_a)
+    return winners, losers
+
+
+def _play_round(group, strengths, rng, wins):
+    """
+    Vectorized Match._set_pair for every simulation: pairs the competitors
+    of the group and gives a bye to a random one when the group is odd.
+    Returns the survivors and the losers of the round.
+
+    Survivors are kept in the order of their matches with the bye at the
+    end, so pairing neighbours in the next round is already a uniformly
+    random pairing; the group is only reshuffled when a bye is drawn.
+    """
+    size = group.shape[1]
+    if size % 2 != 0:
+        group = _shuffle(group, rng)
+    pairs, bye = group[:, : size - size % 2], group[:, size - size % 2 :]
+
+    winners, losers = _play(strengths, rng, pairs[:, 0::2], pairs[:, 1::2])
+    wins += np.bincount(winners.ravel(), minlength=len(wins))
+
+    return np.concatenate([winners, bye], axis=1), losers
+
+
+def simulate_tournament(
+    strengths, simulations=100_000, seed=None, number_pods=DEFAULT_NUMBER_PODS
+):
+    """
+    Simulates many brackets of the same tournament at once.
+
+    The competitors are split in pods like Competitor.create_competitors,
+    each round pairs the competitors of a pod like Match._set_pair, the pod
+    winners then play among themselves, the losers of the penultimate round
+    play the consolation match for third place and the last two play the
+    final.
+
+    Returns the probability of each placement and of reaching the final
+    per competitor, their expected number of wins and the number of rounds
+    and matches of the tournament.
+    """
+    values = [float(strength) for strength in strengths]
+    strengths = np.asarray(values, dtype=np.float32)
+    number_competitors = len(strengths)
+    if number_competitors < 2:
+        raise ValueError('A tournament must have at least 2 competitors.')
+    if np.any(strengths <= 0):
+        raise ValueError('Strengths must be greater than zero.')
+
+    rng = np.random.default_rng(seed)
+    number_pods = min(number_pods, number_competitors)
+    number_matches = Competitor._number_of_matches(
+        number_competitors, number_pods
+    )
+    pod_rounds = number_matches - math.ceil(math.log2(number_pods))
+    wins = np.zeros(number_competitors, dtype=np.int64)
+
+    # pod split of create_competitors: shuffled, then dealt in turn
+    draw = _shuffle(
+        np.tile(
+            np.arange(number_competitors, dtype=np.int32), (simulations, 1)
+        ),
+        rng,
+    )
+    groups = [draw[:, pod::number_pods] for pod in range(number_pods)]
+    semi_final_losers = []
+    played_matches = 0
+
+    for round in range(1, number_matches):
+        if round == pod_rounds + 1:
+            # cross-pod stage, paired at random like any other round
+            groups = [_shuffle(np.concatenate(groups, axis=1), rng)]
+        for position, group in enumerate(groups):
+            groups[position], losers = _play_round(group, strengths, rng, wins)
+            played_matches += losers.shape[1]
+            if round == number_matches - 1:
+                semi_final_losers.extend(losers.T)
+
+    placements = np.full((simulations, len(PLACES)), -1, dtype=np.int32)
+
+    finalists = np.concatenate(groups, axis=1)
+    placements[:, 0], placements[:, 1] = _play(
+        strengths, rng, finalists[:, 0], finalists[:, 1]
+    )
+    wins += np.bincount(placements[:, 0], minlength=number_competitors)
+    played_matches += 1
+
+    # consolation: the losers of the penultimate round play for third
+    # place, a single loser takes it without playing
+    if len(semi_final_losers) == 2:
+        placements[:, 2], placements[:, 3] = _play(
+            strengths, rng, *semi_final_losers
+        )
+        wins += np.bincount(placements[:, 2], minlength=number_competitors)
+        played_matches += 1
+    elif len(semi_final_losers) == 1:
+        placements[:, 2] = semi_final_losers[0]
+
+    # placement counts per competitor; -1 (nobody) is shifted to column 0
+    counts = (
+        np.stack(
+            [
+                np.bincount(
+                    placements[:, column] + 1, minlength=number_competitors + 1
+                )[1:]
+                for column in range(len(PLACES))
+            ],
+            axis=1,
+        )
+        / simulations
+    )
+
+    result = []
+    for competitor in range(number_competitors):
+        probabilities = dict(zip(PLACES, counts[competitor].tolist()))
+        result.append(
+            {
+                'index': competitor,
+                'strength': values[competitor],
+                **probabilities,
+                'final': probabilities['first'] + probabilities['second'],
+                'expected_wins': float(wins[competitor] / simulations),
+            }
+        )
+
+    rounds = number_matches + 1 if number_competitors > 2 else 1
+    logger.info('%s tournaments simulated.', simulations)
+    return {
+        'simulations': simulations,
+        'rounds': rounds,
+        'matches': played_matches,
+        'competitors': result,
+    }
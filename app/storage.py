@@ -0,0 +1,534 @@
+import itertools
+import math
+import random
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_read_session, get_session
+from app.models import (
+    DEFAULT_NUMBER_PODS,
+    MIN_NAME_SUFFIXES,
+    STATUS_FINISHED,
+    STATUS_PENDING,
+    Competitor,
+    Match,
+    Tournament,
+    pod_name,
+)
+
+
+class TournamentStorage(ABC):
+    """
+    The tournament operations the routes rely on, independent of where
+    the tournaments are kept. Errors are raised as ValueError with the
+    same messages as the models.
+    """
+
+    @abstractmethod
+    def create_tournament(self, **kwargs):
+        ...
+
+    @abstractmethod
+    def get_tournament(self, tournament_id):
+        ...
+
+    @abstractmethod
+    def register_competitors(self, tournament_id, names):
+        ...
+
+    @abstractmethod
+    def create_match(self, tournament_id):
+        """
+        Creates the next round of the tournament, when it is due.
+        """
+
+    @abstractmethod
+    def list_matches(self, tournament_id, fields=None):
+        """
+        The matches of every round, with only the given fields when there
+        are fields.
+        """
+
+    @abstractmethod
+    def list_changes(self, tournament_id, since):
+        """
+        The matches written after the change sequence since, and the
+        version to ask from next time.
+        """
+
+    @abstractmethod
+    def set_winner(self, tournament_id, match_id, winner):
+        ...
+
+    @abstractmethod
+    def get_topfour(self, tournament_id):
+        ...
+
+
+class SqlAlchemyStorage(TournamentStorage):
+    """
+    Keeps the tournaments in the database through the model methods.
+    The listings and the podium are read from read_session, a replica
+    when there is one; everything else from the primary session.
+    """
+
+    def __init__(self, session, read_session=None):
+        self.session = session
+        self.read_session = read_session or session
+
+    def create_tournament(self, **kwargs):
+        return Tournament.create_tournament(session=self.session, **kwargs)
+
+    def get_tournament(self, tournament_id):
+        return self.session.get(Tournament, tournament_id)
+
+    def register_competitors(self, tournament_id, names):
+        Competitor.create_competitors(
+            names=names, tournament_id=tournament_id, session=self.session
+        )
+
+    def create_match(self, tournament_id):
+        Match.create_match(tournament_id, self.session)
+
+    def list_matches(self, tournament_id, fields=None):
+        return Match.list_matches(tournament_id, self.read_session, fields)
+
+    def list_changes(self, tournament_id, since):
+        return Match.list_changes(tournament_id, self.read_session, since)
+
+    def set_winner(self, tournament_id, match_id, winner):
+        return Match.set_winner(match_id, tournament_id, winner, self.session)
+
+    def get_topfour(self, tournament_id):
+        return Match.get_topfour(tournament_id, self.read_session)
+
+
+def get_storage(
+    session: Session = Depends(get_session),
+    read_session: Session = Depends(get_read_session),
+):
+    return SqlAlchemyStorage(session, read_session)
+
+
+@dataclass
+class TournamentRecord:
+    id: int
+    name: str
+    date_start: object
+    date_end: object
+    number_pods: int = DEFAULT_NUMBER_PODS
+    number_matches: int = None
+    is_active: bool = False
+    is_archived: bool = False
+    number_competitors: int = 0
+    active_competitors: int = 0
+    current_round: int = 0
+    pending_matches: int = 0
+    change_seq: int = 0
+
+
+@dataclass
+class CompetitorRecord:
+    id: int
+    name: str
+    group: str
+    tournament_id: int
+    status: bool = True
+
+
+@dataclass
+class MatchRecord:
+    id: int
+    tournament_id: int
+    round: int
+    state: str
+    competitor_1_id: int
+    competitor_2_id: int = None
+    winner_id: int = None
+    change_seq: int = 0
+
+
+class InMemoryStorage(TournamentStorage):
+    """
+    Keeps the tournaments in dicts and lists, for ephemeral tournaments
+    and tests that need no database. Competitors and matches are kept in
+    arrays indexed by id - 1; every tournament keeps the ids of its own.
+
+    The bracket rules are the ones of the models: the counters of the
+    tournament record drive Match._should_create_consolation and
+    Match._should_create_final_match, and rounds are paired with
+    Match._set_pair.
+    """
+
+    def __init__(self):
+        self._tournaments = {}
+        self._competitors = []
+        self._matches = []
+        self._competitor_ids = {}
+        self._match_ids = {}
+        self._names = {}
+        self._next_tournament_id = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def create_tournament(self, **kwargs):
+        with self._lock:
+            tournament = TournamentRecord(
+                id=next(self._next_tournament_id), **kwargs
+            )
+            self._tournaments[tournament.id] = tournament
+            self._competitor_ids[tournament.id] = []
+            self._match_ids[tournament.id] = []
+            self._names[tournament.id] = {}
+            return tournament
+
+    def get_tournament(self, tournament_id):
+        return self._tournaments.get(tournament_id)
+
+    def close(self):
+        """
+        Drops every tournament.
+        """
+        with self._lock:
+            for records in (
+                self._tournaments,
+                self._competitors,
+                self._matches,
+                self._competitor_ids,
+                self._match_ids,
+                self._names,
+            ):
+                records.clear()
+
+    def register_competitors(self, tournament_id, names):
+        with self._lock:
+            tournament = self._tournaments.get(tournament_id)
+            if tournament is None:
+                raise ValueError(
+                    f'Tournament with ID {tournament_id} not found.'
+                )
+            if tournament.is_active:
+                raise ValueError(
+                    'This championship has already started; adding new competitors is not allowed.'  # noqa
+                )
+            if len(names) < 2:
+                raise ValueError(
+                    'A tournament must have at least 2 competitors.'
+                )
+
+            names = list(names)
+            random.shuffle(names)
+            suffixes = random.sample(
+                range(1, max(len(names), MIN_NAME_SUFFIXES) + 1), len(names)
+            )
+            number_pods = min(
+                tournament.number_pods or DEFAULT_NUMBER_PODS, len(names)
+            )
+            for ind, (name, suffix) in enumerate(zip(names, suffixes)):
+                competitor = CompetitorRecord(
+                    id=len(self._competitors) + 1,
+                    name=f'{name} -{suffix}',
+                    group=pod_name(ind % number_pods),
+                    tournament_id=tournament_id,
+                )
+                self._competitors.append(competitor)
+                self._competitor_ids[tournament_id].append(competitor.id)
+                self._names[tournament_id][competitor.name] = competitor.id
+
+            tournament.number_matches = Competitor._number_of_matches(
+                len(names), number_pods
+            )
+            tournament.number_pods = number_pods
+            tournament.is_active = True
+            tournament.number_competitors = len(names)
+            tournament.active_competitors = len(names)
+
+    def create_match(self, tournament_id):
+        with self._lock:
+            tournament = self._tournaments.get(tournament_id)
+            if tournament is None or not tournament.number_competitors:
+                raise ValueError(
+                    f'Tournament with ID {tournament_id} not found.'
+                )
+
+            if Match._should_create_consolation(tournament):
+                self._create_consolation_match(tournament)
+            elif Match._should_create_final_match(tournament):
+                self._create_final_match(tournament)
+            elif (
+                tournament.current_round < tournament.number_matches + 1
+                and not tournament.pending_matches
+            ):
+                self._create_round(tournament)
+
+    def _create_round(self, tournament):
+        round = tournament.current_round + 1
+        tournament.change_seq += 1
+        pods = {}
+        for competitor in self._active_competitors(tournament.id):
+            pods.setdefault(competitor.group, []).append(competitor.id)
+        pods = [pods[group] for group in sorted(pods)]
+
+        pod_rounds = tournament.number_matches - math.ceil(
+            math.log2(tournament.number_pods or DEFAULT_NUMBER_PODS)
+        )
+        if round > pod_rounds:
+            pods = [[competitor for pod in pods for competitor in pod]]
+
+        pending = 0
+        for pod in pods:
+            for pair in Match._set_pair(pod):
+                if len(pair) == 2:
+                    self._add_match(tournament, round, *pair)
+                    pending += 1
+                else:
+                    self._add_match(
+                        tournament, round, pair[0], winner_id=pair[0]
+                    )
+        tournament.current_round = round
+        tournament.pending_matches += pending
+
+    def _create_final_match(self, tournament):
+        finalists = self._active_competitors(tournament.id)[:2]
+        if len(finalists) != 2:
+            return
+        last_round = tournament.number_matches
+        round = last_round + 1 if last_round else 1
+        tournament.change_seq += 1
+        self._add_match(tournament, round, finalists[0].id, finalists[1].id)
+        tournament.current_round = round
+        tournament.pending_matches += 1
+
+    def _create_consolation_match(self, tournament):
+        last_round = tournament.number_matches
+        if tournament.current_round >= last_round or last_round < 2:
+            return
+
+        losers = [
+            match.competitor_1_id
+            if match.competitor_1_id != match.winner_id
+            else match.competitor_2_id
+            for match in self._tournament_matches(tournament.id)
+            if match.round == last_round - 1
+            and match.competitor_2_id is not None
+        ]
+        tournament.change_seq += 1
+        if len(losers) == 2:
+            self._add_match(tournament, last_round, *losers)
+            tournament.pending_matches += 1
+        else:
+            self._add_match(
+                tournament, last_round, losers[0], winner_id=losers[0]
+            )
+        tournament.current_round = last_round
+
+    def _add_match(
+        self,
+        tournament,
+        round,
+        competitor_1_id,
+        competitor_2_id=None,
+        winner_id=None,
+    ):
+        match = MatchRecord(
+            id=len(self._matches) + 1,
+            tournament_id=tournament.id,
+            round=round,
+            state=STATUS_PENDING if winner_id is None else STATUS_FINISHED,
+            competitor_1_id=competitor_1_id,
+            competitor_2_id=competitor_2_id,
+            winner_id=winner_id,
+            change_seq=tournament.change_seq,
+        )
+        self._matches.append(match)
+        self._match_ids[tournament.id].append(match.id)
+
+    def _active_competitors(self, tournament_id):
+        return [
+            competitor
+            for competitor in map(
+                self._competitor, self._competitor_ids[tournament_id]
+            )
+            if competitor.status
+        ]
+
+    def _tournament_matches(self, tournament_id):
+        return [
+            self._matches[match_id - 1]
+            for match_id in self._match_ids.get(tournament_id, [])
+        ]
+
+    def _competitor(self, competitor_id):
+        if competitor_id is None:
+            return None
+        return self._competitors[competitor_id - 1]
+
+    def list_matches(self, tournament_id, fields=None):
+        if fields is not None:
+            Match._check_fields(fields)
+        with self._lock:
+            matches = sorted(
+                self._tournament_matches(tournament_id),
+                key=lambda match: (-match.round, match.id),
+            )
+            dic = {}
+            for match in matches:
+                dic.setdefault(f'Round {match.round}', []).append(
+                    self._match_dict(match)
+                )
+            if fields is not None:
+                dic = {
+                    round: [
+                        {field: match[field] for field in fields}
+                        for match in matches
+                    ]
+                    for round, matches in dic.items()
+                }
+            return dic
+
+    def _match_dict(self, match):
+        competitor_2 = self._competitor(match.competitor_2_id)
+        winner = self._competitor(match.winner_id)
+        return {
+            'competitor_1_id': match.competitor_1_id,
+            'competitor_2_id': match.competitor_2_id,
+            'winner_id': match.winner_id,
+            'competitor_1': self._competitor(match.competitor_1_id).name,
+            'competitor_2': competitor_2.name if competitor_2 else None,
+            'winner': winner.name if winner else None,
+            'state': match.state,
+            'round': match.round,
+            'id': match.id,
+        }
+
+    def list_changes(self, tournament_id, since):
+        with self._lock:
+            tournament = self._tournaments.get(tournament_id)
+            if tournament is None:
+                raise ValueError(
+                    f'Tournament with ID {tournament_id} not found.'
+                )
+            matches = sorted(
+                (
+                    match
+                    for match in self._tournament_matches(tournament_id)
+                    if match.change_seq > since
+                ),
+                key=lambda match: (match.change_seq, match.id),
+            )
+            return {
+                'version': tournament.change_seq,
+                'matches': [
+                    {**self._match_dict(match), 'change_seq': match.change_seq}
+                    for match in matches
+                ],
+            }
+
+    def set_winner(self, tournament_id, match_id, winner):
+        with self._lock:
+            match = (
+                self._matches[match_id - 1]
+                if 0 < match_id <= len(self._matches)
+                else None
+            )
+            if match is None or match.tournament_id != tournament_id:
+                raise ValueError(f'Match with ID {match_id} not found.')
+
+            winner_id = winner.get('competitor_id')
+            if winner_id is None:
+                name = winner.get('name', '')
+                winner_id = self._names[tournament_id].get(name)
+                if winner_id is None:
+                    raise ValueError(f'Competitor with name {name} not found.')
+
+            if match.competitor_2_id is None or winner_id not in (
+                match.competitor_1_id,
+                match.competitor_2_id,
+            ):
+                raise ValueError('Competitor not found or match is not valid')
+
+            loser_id = (
+                match.competitor_2_id
+                if winner_id == match.competitor_1_id
+                else match.competitor_1_id
+            )
+            self._competitor(loser_id).status = False
+            tournament = self._tournaments[tournament_id]
+            if match.state == STATUS_PENDING:
+                tournament.pending_matches -= 1
+                # the consolation is played by eliminated competitors
+                if match.round != tournament.number_matches:
+                    tournament.active_competitors -= 1
+            tournament.change_seq += 1
+            match.change_seq = tournament.change_seq
+            match.winner_id = winner_id
+            match.state = STATUS_FINISHED
+            return match
+
+    def get_topfour(self, tournament_id):
+        with self._lock:
+            championship = self._tournaments.get(tournament_id)
+            if championship is None:
+                raise ValueError(
+                    f'Tournament with ID {tournament_id} not found.'
+                )
+            if not championship.number_matches:
+                return 'The championship has not had any matches and has not concluded yet.'   # noqa
+            last_round = championship.number_matches + 1
+
+            finals = [
+                match
+                for match in self._tournament_matches(tournament_id)
+                if match.round == last_round
+            ]
+            if not finals or finals[0].winner_id is None:
+                return 'The championship is not over yet.'
+            winner, second = self._winner_and_loser(finals[0])
+
+            if (
+                championship.number_competitors == 2
+                and championship.number_matches == 1
+            ):
+                return {'first': winner.name, 'second': second.name}
+
+            consolation = next(
+                (
+                    match
+                    for match in self._tournament_matches(tournament_id)
+                    if match.round == championship.number_matches
+                ),
+                None,
+            )
+            if consolation is None:
+                return 'The championship is not over yet.'
+            third_place, fourth_place = self._winner_and_loser(consolation)
+            if (
+                championship.number_competitors == 3
+                and championship.number_matches == 2
+            ):
+                return {
+                    'first': winner.name,
+                    'second': second.name,
+                    'third': third_place.name,
+                }
+
+            return {
+                'winner': winner.name,
+                'second_place': second.name,
+                'third_place': third_place.name,
+                'fourth_place': fourth_place.name if fourth_place else None,
+            }
+
+    def _winner_and_loser(self, match):
+        if match.winner_id == match.competitor_1_id:
+            return (
+                self._competitor(match.competitor_1_id),
+                self._competitor(match.competitor_2_id),
+            )
+        return (
+            self._competitor(match.competitor_2_id),
+            self._competitor(match.competitor_1_id),
+        )
@@ -0,0 +1,327 @@
+import functools
+import inspect
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import settings
+
+EXPORTER_MEMORY = 'memory'
+EXPORTER_FILE = 'file'
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = ContextVar('current_span', default=None)
+
+
+def _new_id(bits):
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+class Span:
+    """
+    One timed operation of a trace. Spans of unsampled traces are never
+    exported, and their children are not even created.
+    """
+
+    __slots__ = (
+        'trace_id',
+        'span_id',
+        'parent_id',
+        'name',
+        'sampled',
+        'attributes',
+        'start',
+        'end',
+    )
+
+    def __init__(self, trace_id, parent_id, name, sampled, attributes):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def traceparent(self):
+        flags = '01' if self.sampled else '00'
+        return f'00-{self.trace_id}-{self.span_id}-{flags}'
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': (self.end - self.start) * 1000,
+            'attributes': self.attributes,
+        }
+
+
+class InMemoryExporter:
+    """
+    Keeps the last max_spans finished spans.
+    """
+
+    def __init__(self, max_spans=10_000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span):
+        self.spans.append(span.as_dict())
+
+    def trace(self, trace_id):
+        return [span for span in self.spans if span['trace_id'] == trace_id]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileExporter:
+    """
+    Appends every finished span to a file as a line of JSON.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.as_dict(), default=str) + '\n'
+        with self._lock, open(self.path, 'a') as file:
+            file.write(line)
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate=0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def start_trace(self, name, traceparent=None, **attributes):
+        """
+        Opens the root span of a request. A valid W3C traceparent header
+        continues its trace and keeps its sampling decision; otherwise a
+        new trace is sampled at sample_rate.
+        """
+        parent_id = None
+        match = TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = int(flags, 16) & 1 == 1
+        else:
+            trace_id = _new_id(128)
+            sampled = random.random() < self.sample_rate
+
+        root = Span(trace_id, parent_id, name, sampled, attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        finally:
+            _current_span.reset(token)
+            self._finish(root)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Opens a child of the current span, if the trace is sampled.
+        """
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            yield None
+            return
+
+        span = Span(parent.trace_id, parent.span_id, name, True, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attributes['error'] = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span):
+        span.end = time.time()
+        if span.sampled:
+            self.exporter.export(span)
+
+
+def create_tracer(exporter=EXPORTER_MEMORY, sample_rate=0.0):
+    if exporter == EXPORTER_FILE:
+        return Tracer(FileExporter(settings.TRACE_FILE), sample_rate)
+    if exporter == EXPORTER_MEMORY:
+        return Tracer(InMemoryExporter(settings.TRACE_MAX_SPANS), sample_rate)
+    raise ValueError(f'Unknown trace exporter {exporter}.')
+
+
+tracer = create_tracer(settings.TRACE_EXPORTER, settings.TRACE_SAMPLE_RATE)
+
+
+def _tracing():
+    span = _current_span.get()
+    return span is not None and span.sampled
+
+
+def traced(name):
+    """
+    Runs the decorated function in a span while a sampled trace is open.
+    """
+
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                if not _tracing():
+                    return await function(*args, **kwargs)
+                with tracer.span(name):
+                    return await function(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not _tracing():
+                    return function(*args, **kwargs)
+                with tracer.span(name):
+                    return function(*args, **kwargs)
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    return decorator
+
+
+def instrument_class(cls):
+    """
+    Wraps every method of cls, plain functions as well as classmethods
+    and staticmethods, in a span named Class.method, so nested model
+    calls show up as nested spans. Dunder methods are left as they are.
+    """
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith('__'):
+            continue
+        if isinstance(attribute, (classmethod, staticmethod)):
+            function, wrap = attribute.__func__, type(attribute)
+        elif inspect.isfunction(attribute):
+            function, wrap = attribute, None
+        else:
+            continue
+        if getattr(function, '__traced__', False):
+            continue
+        wrapped = traced(f'{cls.__name__}.{name}')(function)
+        setattr(cls, name, wrap(wrapped) if wrap is not None else wrapped)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return
+    span = Span(
+        parent.trace_id,
+        parent.span_id,
+        'sql',
+        True,
+        {'db.statement': statement, 'db.executemany': executemany},
+    )
+    conn.info.setdefault('trace_spans', []).append(span)
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    spans = conn.info.get('trace_spans')
+    if spans:
+        span = spans.pop()
+        span.attributes['db.rowcount'] = cursor.rowcount
+        tracer._finish(span)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get('trace_spans') if connection else None
+    if spans:
+        span = spans.pop()
+        span.attributes['error'] = repr(exception_context.original_exception)
+        tracer._finish(span)
+
+
+def instrument_engines():
+    """
+    Opens a span per SQL statement on every engine.
+    """
+    if not event.contains(
+        Engine, 'before_cursor_execute', _before_cursor_execute
+    ):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+class TracedRoute(APIRoute):
+    """
+    Runs the endpoint in its own span: the rest of the request span is
+    dependency solving, validation and serialization of the response.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router builds the route again from the wrapped endpoint
+        if not getattr(endpoint, '__traced__', False):
+            endpoint = traced(f'endpoint {endpoint.__name__}')(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens the root span of every request, continues
+    the trace of a traceparent header and returns the traceparent of the
+    request in the response.
+    """
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope['headers'])
+        traceparent = headers.get(b'traceparent', b'').decode('latin-1')
+        with self.tracer.start_trace(
+            f'{scope["method"]} {scope["path"]}',
+            traceparent,
+            **{'http.method': scope['method'], 'http.path': scope['path']},
+        ) as root:
+
+            async def send_with_trace(message):
+                if message['type'] == 'http.response.start':
+                    root.attributes['http.status_code'] = message['status']
+                    message['headers'] = [
+                        *message.get('headers', []),
+                        (b'traceparent', root.traceparent.encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get('route')
+                if route is not None:
+                    root.name = f'{scope["method"]} {route.path}'
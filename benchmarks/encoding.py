@@ -0,0 +1,100 @@
+"""
+Bracket encoding benchmark.
+
+Plays a tournament in memory and encodes its bracket, the payload of
+GET /tournament/{id}/match, as JSON and as MessagePack, in rows and in
+columns. Reports the size of each payload and its encode time.
+
+Usage:
+    python -m benchmarks.encoding --competitors 1024 --repeat 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import msgpack  # noqa: E402
+
+from app.encoding import to_columns  # noqa: E402
+from app.storage import InMemoryStorage  # noqa: E402
+
+ENCODERS = {
+    'json': lambda payload: json.dumps(payload).encode(),
+    'msgpack': msgpack.packb,
+}
+
+
+def play_bracket(number_competitors):
+    """
+    Bracket of a finished tournament: every match won by its first
+    competitor.
+    """
+    storage = InMemoryStorage()
+    tournament = storage.create_tournament(
+        name='Encoding Tournament',
+        date_start=datetime(2024, 1, 29, 12),
+        date_end=datetime(2024, 2, 5, 18),
+    )
+    storage.register_competitors(
+        tournament.id, [f'Competitor{i}' for i in range(number_competitors)]
+    )
+    while not isinstance(storage.get_topfour(tournament.id), dict):
+        storage.create_match(tournament.id)
+        for matches in storage.list_matches(tournament.id).values():
+            for match in matches:
+                if match['state'] == 'pending':
+                    storage.set_winner(
+                        tournament.id,
+                        match['id'],
+                        {'competitor_id': match['competitor_1_id']},
+                    )
+    bracket = storage.list_matches(tournament.id)
+    storage.close()
+    return bracket
+
+
+def run_benchmark(number_competitors=256, repeat=20):
+    bracket = play_bracket(number_competitors)
+    layouts = {'rows': bracket, 'columnar': to_columns(bracket)}
+    results = {}
+    for encoding, encode in ENCODERS.items():
+        for layout, payload in layouts.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                body = encode(payload)
+            results[f'{encoding}_{layout}'] = {
+                'bytes': len(body),
+                'encode_ms': (time.perf_counter() - start) / repeat * 1000,
+            }
+    baseline = results['json_rows']['bytes']
+    for result in results.values():
+        result['size_vs_json'] = result['bytes'] / baseline
+    return {
+        'competitors': number_competitors,
+        'matches': sum(len(matches) for matches in bracket.values()),
+        'encodings': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--competitors', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Write the JSON report here.')
+    args = parser.parse_args(argv)
+
+    output = json.dumps(run_benchmark(args.competitors, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
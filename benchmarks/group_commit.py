@@ -0,0 +1,176 @@
+"""
+Result reporting benchmark, with and without group commit.
+
+Opens the first round of a few tournaments and reports the winner of
+every match from many threads at once, first with one commit per result
+(Match.set_winner) and then through a GroupCommitter, and reports the
+results written per second in each mode.
+
+Usage:
+    python -m benchmarks.group_commit --tournaments 8 --competitors 256
+    python -m benchmarks.group_commit --max-delay 0.002 --max-batch 32
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.group_commit import GroupCommitter  # noqa: E402
+from app.models import (  # noqa: E402
+    STATUS_PENDING,
+    Base,
+    Competitor,
+    Match,
+    Tournament,
+)
+
+TOURNAMENT = {
+    'name': 'Group Commit Tournament',
+    'date_start': datetime(2024, 1, 29, 12),
+    'date_end': datetime(2024, 2, 5, 18),
+}
+
+
+def _open_first_rounds(engine, tournaments, competitors):
+    """
+    Creates the tournaments and their first round. Returns the pending
+    matches as (match id, tournament id, winner id).
+    """
+    with Session(engine) as session:
+        for _ in range(tournaments):
+            tournament = Tournament(**TOURNAMENT)
+            session.add(tournament)
+            session.commit()
+            Competitor.create_competitors(
+                [f'Competitor{i}' for i in range(competitors)],
+                tournament.id,
+                session,
+            )
+            Match.create_match(tournament.id, session)
+        return session.execute(
+            select(Match.id, Match.tournament_id, Match.competitor_1_id).where(
+                Match.state == STATUS_PENDING
+            )
+        ).all()
+
+
+def _report(matches, report, reporters):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(reporters) as pool:
+        list(
+            pool.map(
+                lambda match: report(
+                    match.id, match.tournament_id, match.competitor_1_id
+                ),
+                matches,
+            )
+        )
+    return time.perf_counter() - start
+
+
+def run_benchmark(
+    database_url,
+    tournaments=4,
+    competitors=64,
+    reporters=16,
+    max_delay=0.005,
+    max_batch=64,
+):
+    """
+    Reports every first-round result of fresh tournaments once per mode.
+    """
+    results = {}
+    for mode in ('individual', 'group_commit'):
+        engine = create_engine(database_url)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        matches = _open_first_rounds(engine, tournaments, competitors)
+
+        committer = None
+        if mode == 'group_commit':
+            committer = GroupCommitter(
+                lambda: Session(engine, expire_on_commit=False),
+                max_delay=max_delay,
+                max_batch=max_batch,
+            )
+
+            def report(match_id, tournament_id, winner_id):
+                committer.set_winner(
+                    match_id, tournament_id, {'competitor_id': winner_id}
+                )
+
+        else:
+
+            def report(match_id, tournament_id, winner_id):
+                with Session(engine) as session:
+                    Match.set_winner(
+                        match_id,
+                        tournament_id,
+                        {'competitor_id': winner_id},
+                        session,
+                    )
+
+        elapsed = _report(matches, report, reporters)
+        results[mode] = {
+            'results': len(matches),
+            'seconds': elapsed,
+            'results_per_second': len(matches) / elapsed,
+        }
+        if committer is not None:
+            results[mode].update(committer.metrics())
+            committer.stop()
+        engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tournaments', type=int, default=4)
+    parser.add_argument('--competitors', type=int, default=64)
+    parser.add_argument('--reporters', type=int, default=16)
+    parser.add_argument('--max-delay', type=float, default=0.005)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument(
+        '--database-url',
+        help='Database to write; defaults to a temporary SQLite file.',
+    )
+    parser.add_argument('--output', help='Write the JSON report here.')
+    args = parser.parse_args(argv)
+
+    options = {
+        'tournaments': args.tournaments,
+        'competitors': args.competitors,
+        'reporters': args.reporters,
+        'max_delay': args.max_delay,
+        'max_batch': args.max_batch,
+    }
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or (
+            f'sqlite:///{os.path.join(directory, "group_commit.db")}'
+        )
+        report = run_benchmark(database_url, **options)
+    logging.disable(logging.NOTSET)
+
+    report['options'] = options
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
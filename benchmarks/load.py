@@ -0,0 +1,368 @@
+"""
+Concurrent load generator.
+
+Simulates many tournaments played at the same time: one organizer per
+tournament creates it and registers the competitors, referees poll the
+bracket and report winners, and spectators keep polling the bracket until
+the podium is known. Every request is made by asyncio clients, either
+against the app in-process or against a local uvicorn server, so the run
+needs no network access.
+
+Usage:
+    python -m benchmarks.load --tournaments 20 --competitors 16
+    python -m benchmarks.load --mode uvicorn --output load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.app import app  # noqa: E402
+from app.database import get_session  # noqa: E402
+from app.models import Base  # noqa: E402
+
+TOURNAMENT_PAYLOAD = {
+    'name': 'Load Tournament',
+    'date_start': '2024-01-29T12:00:00',
+    'date_end': '2024-02-05T18:00:00',
+}
+POLL_INTERVAL = 0.01
+SERVER_START_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, rank):
+    """
+    Nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class LoadStats:
+    """
+    Collects latency and errors per endpoint.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.podiums = 0
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            logger.debug('%s failed: %s', endpoint, e)
+            response = None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            total = len(latencies)
+            endpoints[endpoint] = {
+                'requests': total,
+                'errors': self.errors[endpoint],
+                'error_rate': self.errors[endpoint] / total,
+                'throughput': total / elapsed if elapsed else None,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+            }
+        return {
+            'elapsed_seconds': elapsed,
+            'podiums': self.podiums,
+            'endpoints': endpoints,
+        }
+
+
+async def referee(client, stats, tournament_id, index, referees, done):
+    """
+    Polls the bracket and reports the winner of every pending match that
+    belongs to this referee, until the result endpoint gives the podium
+    or the bracket stops growing without one.
+    """
+    number_rounds = None
+    while not done.is_set():
+        response = await stats.request(
+            client,
+            'GET /tournament/{id}/match',
+            'GET',
+            f'/tournament/{tournament_id}/match',
+        )
+        if response is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+
+        rounds = response.json()
+        pending = [
+            match
+            for matches in rounds.values()
+            for match in matches
+            if match['state'] == 'pending'
+        ]
+        if not pending:
+            # a round of byes only has no pending match either: the next
+            # poll creates the round after it
+            result = await stats.request(
+                client,
+                'GET /tournament/{id}/result',
+                'GET',
+                f'/tournament/{tournament_id}/result',
+            )
+            if result is not None and isinstance(result.json(), dict):
+                done.set()
+                return
+            if len(rounds) == number_rounds:
+                logger.warning(
+                    'Tournament %s stopped without a podium.', tournament_id
+                )
+                done.set()
+                return
+            number_rounds = len(rounds)
+            continue
+
+        for match in pending:
+            if match['id'] % referees != index:
+                continue
+            await stats.request(
+                client,
+                'POST /tournament/{id}/match/{id}',
+                'POST',
+                f'/tournament/{tournament_id}/match/{match["id"]}',
+                json={'competitor_id': match['competitor_1_id']},
+            )
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def spectator(client, stats, tournament_id, done):
+    """
+    Keeps polling the bracket until the tournament is over.
+    """
+    while not done.is_set():
+        await stats.request(
+            client,
+            'GET /tournament/{id}/match',
+            'GET',
+            f'/tournament/{tournament_id}/match',
+        )
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def organizer(client, stats, competitors, referees, spectators):
+    """
+    Creates a tournament, registers its competitors and plays it to the
+    end with the given number of referees and spectators.
+    """
+    response = await stats.request(
+        client,
+        'POST /tournament',
+        'POST',
+        '/tournament',
+        json=TOURNAMENT_PAYLOAD,
+    )
+    if response is None:
+        return
+    tournament_id = response.json()['id']
+
+    names = [f'Competitor{i}' for i in range(competitors)]
+    response = await stats.request(
+        client,
+        'POST /tournament/{id}/competitor',
+        'POST',
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': names},
+    )
+    if response is None:
+        return
+
+    done = asyncio.Event()
+    await asyncio.gather(
+        *[
+            referee(client, stats, tournament_id, index, referees, done)
+            for index in range(referees)
+        ],
+        *[
+            spectator(client, stats, tournament_id, done)
+            for _ in range(spectators)
+        ],
+    )
+
+    response = await stats.request(
+        client,
+        'GET /tournament/{id}/result',
+        'GET',
+        f'/tournament/{tournament_id}/result',
+    )
+    if response is None:
+        return
+    if isinstance(response.json(), dict):
+        stats.podiums += 1
+    else:
+        # the bracket ended without a podium
+        stats.errors['GET /tournament/{id}/result'] += 1
+
+
+async def run_load(client, tournaments, competitors, referees=2, spectators=2):
+    """
+    Plays the given number of tournaments concurrently and returns the
+    statistics per endpoint.
+    """
+    stats = LoadStats()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            organizer(client, stats, competitors, referees, spectators)
+            for _ in range(tournaments)
+        ]
+    )
+    return stats.report(time.perf_counter() - start)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('uvicorn exited before accepting requests.')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('uvicorn did not start in time.')
+
+
+async def run_inprocess(database_url, **options):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    try:
+        async with httpx.AsyncClient(
+            app=app, base_url='http://load'
+        ) as client:
+            return await run_load(client, **options)
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+async def run_uvicorn(database_url, workers=1, **options):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            'app.app:app',
+            '--host',
+            '127.0.0.1',
+            '--port',
+            str(port),
+            '--workers',
+            str(workers),
+            '--log-level',
+            'warning',
+        ],
+        env={**os.environ, 'DATABASE_URL': database_url},
+    )
+    try:
+        _wait_for_port(port, process)
+        limits = httpx.Limits(max_connections=None)
+        async with httpx.AsyncClient(
+            base_url=f'http://127.0.0.1:{port}', limits=limits
+        ) as client:
+            return await run_load(client, **options)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--mode', choices=['inprocess', 'uvicorn'], default='inprocess'
+    )
+    parser.add_argument('--tournaments', type=int, default=10)
+    parser.add_argument('--competitors', type=int, default=16)
+    parser.add_argument('--referees', type=int, default=2)
+    parser.add_argument('--spectators', type=int, default=2)
+    parser.add_argument(
+        '--workers', type=int, default=1, help='uvicorn worker processes.'
+    )
+    parser.add_argument(
+        '--database-url',
+        help='Database to load; defaults to a temporary SQLite file.',
+    )
+    parser.add_argument('--output', help='Write the JSON report here.')
+    args = parser.parse_args(argv)
+
+    options = {
+        'tournaments': args.tournaments,
+        'competitors': args.competitors,
+        'referees': args.referees,
+        'spectators': args.spectators,
+    }
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or (
+            f'sqlite:///{os.path.join(directory, "load.db")}'
+        )
+        if args.mode == 'uvicorn':
+            report = asyncio.run(
+                run_uvicorn(database_url, workers=args.workers, **options)
+            )
+        else:
+            report = asyncio.run(run_inprocess(database_url, **options))
+    logging.disable(logging.NOTSET)
+
+    report['options'] = {**options, 'mode': args.mode}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""create match events table
+
+Revision ID: 0a9e4d6c2b58
+Revises: f1c8d5b7a036
+Create Date: 2026-10-19 18:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a9e4d6c2b58'
+down_revision: Union[str, None] = 'f1c8d5b7a036'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('match_events',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('tournament_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('round', sa.Integer(), nullable=False),
+    sa.Column('competitor_1_id', sa.Integer(), nullable=True),
+    sa.Column('competitor_2_id', sa.Integer(), nullable=True),
+    sa.Column('winner_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['tournament_id'], ['tournaments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index('ix_match_events_tournament_id_id', 'match_events', ['tournament_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_match_events_tournament_id_id', table_name='match_events')
+    op.drop_table('match_events')
@@ -0,0 +1,38 @@
+"""match change sequence
+
+Revision ID: 8d2e6a4f1b75
+Revises: 2c7f1e8a4d93
+Create Date: 2026-10-19 21:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e6a4f1b75'
+down_revision: Union[str, None] = '2c7f1e8a4d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tournaments', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('matches', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    # existing matches are version 1, so since=0 still returns them, as
+    # well as the brackets of archived tournaments
+    op.execute('UPDATE matches SET change_seq = 1')
+    op.execute(
+        'UPDATE tournaments SET change_seq = 1 '
+        'WHERE is_archived = true '
+        'OR id IN (SELECT tournament_id FROM matches)'
+    )
+    op.create_index('ix_matches_tournament_id_change_seq', 'matches', ['tournament_id', 'change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_matches_tournament_id_change_seq', table_name='matches')
+    op.drop_column('matches', 'change_seq')
+    op.drop_column('tournaments', 'change_seq')
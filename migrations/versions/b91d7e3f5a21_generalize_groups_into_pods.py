@@ -0,0 +1,39 @@
+"""generalize groups into pods
+
+Revision ID: b91d7e3f5a21
+Revises: 7c4e1a9b2d60
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91d7e3f5a21'
+down_revision: Union[str, None] = '7c4e1a9b2d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('competitors', 'group',
+               existing_type=sa.Enum('group_1', 'group_2', name='competitor_group'),
+               type_=sa.String(length=32),
+               existing_nullable=True,
+               postgresql_using='"group"::text')
+    op.execute('DROP TYPE IF EXISTS competitor_group')
+    op.add_column('tournaments', sa.Column('number_pods', sa.Integer(), nullable=True))
+    op.execute('UPDATE tournaments SET number_pods = 2')
+
+
+def downgrade() -> None:
+    op.drop_column('tournaments', 'number_pods')
+    op.execute("CREATE TYPE competitor_group AS ENUM ('group_1', 'group_2')")
+    op.alter_column('competitors', 'group',
+               existing_type=sa.String(length=32),
+               type_=sa.Enum('group_1', 'group_2', name='competitor_group'),
+               existing_nullable=True,
+               postgresql_using='"group"::competitor_group')
@@ -0,0 +1,44 @@
+"""tournament progress counters
+
+Revision ID: e6b3f0a2c914
+Revises: d4a7c2e9f813
+Create Date: 2026-10-19 17:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3f0a2c914'
+down_revision: Union[str, None] = 'd4a7c2e9f813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tournaments', sa.Column('number_competitors', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('tournaments', sa.Column('current_round', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('tournaments', sa.Column('pending_matches', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE tournaments SET '
+        'number_competitors = (SELECT COUNT(*) FROM competitors '
+        'WHERE competitors.tournament_id = tournaments.id), '
+        'current_round = (SELECT COALESCE(MAX(round), 0) FROM matches '
+        'WHERE matches.tournament_id = tournaments.id), '
+        "pending_matches = (SELECT COUNT(*) FROM matches "
+        "WHERE matches.tournament_id = tournaments.id "
+        "AND matches.state = 'pending')"
+    )
+    op.create_index('ix_tournaments_date_start_id', 'tournaments', ['date_start', 'id'], unique=False)
+    op.create_index('ix_tournaments_is_active_date_start_id', 'tournaments', ['is_active', 'date_start', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tournaments_is_active_date_start_id', table_name='tournaments')
+    op.drop_index('ix_tournaments_date_start_id', table_name='tournaments')
+    op.drop_column('tournaments', 'pending_matches')
+    op.drop_column('tournaments', 'current_round')
+    op.drop_column('tournaments', 'number_competitors')
@@ -0,0 +1,32 @@
+"""tournament active competitors counter
+
+Revision ID: f1c8d5b7a036
+Revises: e6b3f0a2c914
+Create Date: 2026-10-19 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c8d5b7a036'
+down_revision: Union[str, None] = 'e6b3f0a2c914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tournaments', sa.Column('active_competitors', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE tournaments SET '
+        'active_competitors = (SELECT COUNT(*) FROM competitors '
+        'WHERE competitors.tournament_id = tournaments.id '
+        'AND competitors.status = true)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('tournaments', 'active_competitors')
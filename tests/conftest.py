@@ -1,12 +1,16 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.app import app
+from app.coalescing import tournament_stats_cache
 from app.database import get_session
+from app.instrumentation import QueryCounter
+from app.jobs import InMemoryJobBackend, JobQueue, get_job_queue
 from app.models import Base
 from app.settings import Settings
+from app.storage import InMemoryStorage, get_storage
 
 
 @pytest.fixture
@@ -22,12 +26,50 @@ def session():
 
 
 @pytest.fixture
-def client(session):
-    def get_session_override():
-        return session
+def memory_storage():
+    storage = InMemoryStorage()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def client(request):
+    """
+    Client of the app on the test database, or on an InMemoryStorage when
+    a test is parametrized with 'memory' (indirect=True).
+    """
+    if getattr(request, 'param', 'database') == 'memory':
+        storage = request.getfixturevalue('memory_storage')
+        overrides = {get_storage: lambda: storage}
+    else:
+        session = request.getfixturevalue('session')
+        overrides = {get_session: lambda: session}
 
     with TestClient(app) as client:
-        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides.update(overrides)
         yield client
 
     app.dependency_overrides.clear()
+    # every test database numbers its tournaments from 1 again
+    tournament_stats_cache.clear()
+
+
+@pytest.fixture
+def query_counter(session):
+    with QueryCounter(session.get_bind()) as counter:
+        yield counter
+
+
+@pytest.fixture
+def job_queue(session):
+    engine = session.get_bind()
+    queue = JobQueue(
+        InMemoryJobBackend(),
+        lambda: Session(engine),
+        workers=2,
+        poll_interval=0.01,
+    )
+    queue.start()
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    yield queue
+    queue.stop()
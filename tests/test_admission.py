@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.admission import (
+    AdmissionControlMiddleware,
+    ConcurrencyLimiter,
+    route_class,
+)
+from app.database import background_engine, engine
+
+
+def test_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=5)
+        assert await limiter.acquire()
+
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+        # the queue is full: shed at once
+        assert not await limiter.acquire()
+
+        limiter.release()
+        assert await queued
+        limiter.release()
+        return limiter.metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert metrics['active'] == 0
+    assert metrics['admitted'] == 2
+    assert metrics['rejected'] == 1
+    assert metrics['peak_queue_depth'] == 1
+
+
+def test_limiter_rejects_after_queue_timeout():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queue=5, queue_timeout=0.01)
+        await limiter.acquire()
+        admitted = await limiter.acquire()
+        return admitted, limiter.queue_depth
+
+    assert asyncio.run(scenario()) == (False, 0)
+
+
+def test_middleware_answers_503_with_retry_after():
+    release = asyncio.Event()
+    slow_app = FastAPI()
+
+    @slow_app.get('/slow')
+    async def slow():
+        await release.wait()
+        return {}
+
+    limiters = {
+        'read': ConcurrencyLimiter(limit=1, max_queue=0, queue_timeout=1),
+        'write': ConcurrencyLimiter(limit=1, max_queue=0, queue_timeout=1),
+    }
+    slow_app.add_middleware(
+        AdmissionControlMiddleware, limiters=limiters, retry_after=3
+    )
+
+    async def scenario():
+        async with httpx.AsyncClient(
+            app=slow_app, base_url='http://test'
+        ) as client:
+            first = asyncio.create_task(client.get('/slow'))
+            while limiters['read'].active == 0:
+                await asyncio.sleep(0.001)
+            shed = await client.get('/slow')
+            release.set()
+            return await first, shed
+
+    first, shed = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers['retry-after'] == '3'
+    assert limiters['read'].metrics()['rejected'] == 1
+
+
+def test_admission_metrics(client):
+    client.get('/tournaments')
+
+    response = client.get('/metrics/admission')
+
+    assert response.status_code == 201
+    assert set(response.json()) == {'read', 'write'}
+    assert response.json()['read']['admitted'] >= 1
+    assert response.json()['read']['active'] == 0
+
+
+def test_the_match_list_is_a_write():
+    assert route_class('GET', '/tournament/1/match') == 'write'
+    assert route_class('POST', '/tournament/1/match/2') == 'write'
+    assert route_class('GET', '/tournament/1/match/changes') == 'read'
+    assert route_class('GET', '/tournament/1/result') == 'read'
+
+
+def test_background_consumers_have_their_own_pool():
+    assert background_engine.pool is not engine.pool
@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app.affinity import AffinityDispatcher, HashRing, tournament_key
+
+WORKERS = ['http://worker-1', 'http://worker-2', 'http://worker-3']
+
+
+def test_ring_moves_only_the_keys_of_a_leaving_worker():
+    ring = HashRing(WORKERS)
+    before = {key: ring.node_for(key) for key in range(1000)}
+
+    ring.remove(WORKERS[0])
+    after = {key: ring.node_for(key) for key in range(1000)}
+
+    moved = [key for key in before if before[key] != after[key]]
+    assert moved
+    assert all(before[key] == WORKERS[0] for key in moved)
+
+    ring.add(WORKERS[0])
+    assert {key: ring.node_for(key) for key in range(1000)} == before
+
+
+def test_tournament_key():
+    assert tournament_key('/tournament/42/match') == 42
+    assert tournament_key('/tournament/42') == 42
+    assert tournament_key('/tournaments') is None
+
+
+def _worker(name):
+    worker = FastAPI()
+
+    @worker.api_route('/{path:path}', methods=['GET', 'POST'])
+    def echo(path: str):
+        return {'worker': name, 'path': path}
+
+    return worker
+
+
+def test_dispatcher_keeps_tournaments_on_their_worker():
+    async def scenario():
+        mounts = {
+            url: httpx.ASGITransport(app=_worker(url)) for url in WORKERS
+        }
+        dispatcher = AffinityDispatcher(
+            WORKERS, client=httpx.AsyncClient(mounts=mounts)
+        )
+        async with httpx.AsyncClient(
+            app=dispatcher, base_url='http://dispatcher'
+        ) as client:
+            owners = set()
+            for path in ('/tournament/7/match', '/tournament/7/result'):
+                response = await client.get(path)
+                owners.add(response.json()['worker'])
+
+            # the owner stops answering: the tournament moves and stays
+            owner = owners.pop()
+            mounts[owner] = httpx.MockTransport(_refuse)
+            dispatcher.client = httpx.AsyncClient(mounts=mounts)
+            moved = await client.get('/tournament/7/match')
+            again = await client.get('/tournament/7/match')
+            metrics = (await client.get('/metrics/affinity')).json()
+        return owner, moved.json()['worker'], again.json()['worker'], metrics
+
+    owner, moved, again, metrics = asyncio.run(scenario())
+
+    assert moved != owner
+    assert again == moved
+    assert owner not in metrics['ring']
+    assert metrics['requests'][owner] == 2
+
+
+def test_dispatcher_forwards_the_encoded_body_of_the_worker():
+    worker = FastAPI()
+    worker.add_middleware(GZipMiddleware)
+
+    @worker.get('/tournament/{tournament_id}/match')
+    def matches(tournament_id: int):
+        return {'matches': ['match'] * 1000}
+
+    async def scenario():
+        dispatcher = AffinityDispatcher(
+            WORKERS[:1],
+            client=httpx.AsyncClient(
+                mounts={WORKERS[0]: httpx.ASGITransport(app=worker)}
+            ),
+        )
+        async with httpx.AsyncClient(
+            app=dispatcher, base_url='http://dispatcher'
+        ) as client:
+            return await client.get(
+                '/tournament/7/match', headers={'accept-encoding': 'gzip'}
+            )
+
+    response = asyncio.run(scenario())
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert int(response.headers['content-length']) < 1000
+    assert response.json() == {'matches': ['match'] * 1000}
+
+
+def _refuse(request):
+    raise httpx.ConnectError('Connection refused', request=request)
@@ -0,0 +1,110 @@
+import asyncio
+import copy
+
+import pytest
+
+from benchmarks.group_commit import run_benchmark as run_group_commit_benchmark
+from benchmarks.lifecycle import PHASES, compare, run_benchmark
+from benchmarks.load import percentile, run_inprocess
+
+
+def test_lifecycle_benchmark_reports_every_phase():
+    results = run_benchmark([2, 4], track_memory=False)
+
+    assert [entry['size'] for entry in results['results']] == [2, 4]
+    for entry in results['results']:
+        assert entry['backend'] == 'sqlite'
+        assert set(entry['phases']) == set(PHASES)
+        assert all(
+            stats['requests'] > 0 and stats['queries'] > 0
+            for stats in entry['phases'].values()
+        )
+
+
+def test_compare_flags_query_and_latency_regressions():
+    baseline = {
+        'results': [
+            {
+                'backend': 'sqlite',
+                'size': 4,
+                'phases': {
+                    'podium': {'seconds': 0.1, 'queries': 4},
+                    'register': {'seconds': 0.1, 'queries': 3},
+                },
+            }
+        ]
+    }
+    current = copy.deepcopy(baseline)
+    assert compare(current, baseline) == []
+
+    current['results'][0]['phases']['podium']['queries'] = 9
+    current['results'][0]['phases']['register']['seconds'] = 1.0
+
+    regressions = compare(current, baseline)
+
+    assert len(regressions) == 2
+    assert 'podium' in regressions[0]
+    assert 'register' in regressions[1]
+
+
+@pytest.mark.parametrize('competitors', [4, 5])
+def test_load_generator_reports_latency_per_endpoint(tmp_path, competitors):
+    database_url = f'sqlite:///{tmp_path / "load.db"}'
+
+    report = asyncio.run(
+        run_inprocess(
+            database_url,
+            tournaments=2,
+            competitors=competitors,
+            referees=1,
+            spectators=0,
+        )
+    )
+
+    endpoints = report['endpoints']
+    assert endpoints['POST /tournament']['requests'] == 2
+    assert endpoints['GET /tournament/{id}/result']['errors'] == 0
+    assert report['podiums'] == 2
+    for stats in endpoints.values():
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_group_commit_benchmark_reports_both_modes(tmp_path):
+    report = run_group_commit_benchmark(
+        f'sqlite:///{tmp_path / "group_commit.db"}',
+        tournaments=1,
+        competitors=8,
+        reporters=4,
+    )
+
+    assert set(report) == {'individual', 'group_commit'}
+    assert all(mode['results'] == 4 for mode in report.values())
+    assert report['group_commit']['batches'] >= 1
+
+
+def test_encoding_benchmark_compares_against_json():
+    pytest.importorskip('msgpack')
+    from benchmarks.encoding import run_benchmark as run_encoding_benchmark
+
+    report = run_encoding_benchmark(number_competitors=16, repeat=1)
+
+    encodings = report['encodings']
+    assert set(encodings) == {
+        'json_rows',
+        'json_columnar',
+        'msgpack_rows',
+        'msgpack_columnar',
+    }
+    assert encodings['json_rows']['size_vs_json'] == 1
+    assert (
+        encodings['msgpack_columnar']['bytes']
+        < encodings['json_rows']['bytes']
+    )
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.coalescing import SingleFlight, VersionedCache
+
+CALLERS = 8
+
+
+def _run_together(flight, key, function):
+    """
+    Starts CALLERS calls of the same key and waits until every caller but
+    the leader is waiting on it.
+    """
+    pool = ThreadPoolExecutor(CALLERS)
+    futures = [pool.submit(flight.do, key, function) for _ in range(CALLERS)]
+    while flight.coalesced < CALLERS - 1:
+        time.sleep(0.001)
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def list_matches():
+        calls.append(1)
+        release.wait(5)
+        return {'Round 1': []}
+
+    futures = _run_together(flight, (1, (1, 2, 4)), list_matches)
+    release.set()
+    results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.metrics() == {
+        'leaders': 1,
+        'coalesced': CALLERS - 1,
+        'in_flight': 0,
+    }
+
+
+def test_waiters_get_the_error_and_later_calls_run_again():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('Tournament with ID 1 not found.')
+
+    futures = _run_together(flight, (1, None), fail)
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError, match='not found'):
+            future.result()
+
+    assert flight.do((1, None), lambda: 'again') == 'again'
+    assert flight.metrics()['leaders'] == 2
+
+
+def test_coalescing_metrics(client):
+    response = client.get('/metrics/coalescing')
+
+    assert response.status_code == 201
+    assert set(response.json()) == {'leaders', 'coalesced', 'in_flight'}
+
+
+def test_versioned_cache_recomputes_on_a_new_version():
+    cache = VersionedCache(max_entries=2)
+    calls = []
+
+    def stats(value):
+        def compute():
+            calls.append(value)
+            return value
+
+        return compute
+
+    assert cache.get(1, 'v1', stats('a')) == 'a'
+    assert cache.get(1, 'v1', stats('b')) == 'a'
+    assert cache.get(1, 'v2', stats('c')) == 'c'
+    cache.get(2, 'v1', stats('d'))
+    cache.get(3, 'v1', stats('e'))
+
+    # tournament 1 was the least recently used
+    assert cache.get(1, 'v2', stats('f')) == 'f'
+    assert calls == ['a', 'c', 'd', 'e', 'f']
+    assert cache.metrics() == {'hits': 1, 'misses': 5, 'entries': 2}
+
+
+def test_versioned_cache_of_size_zero_keeps_nothing():
+    cache = VersionedCache(max_entries=0)
+
+    assert cache.get(1, 'v1', lambda: 'a') == 'a'
+    assert cache.get(1, 'v1', lambda: 'b') == 'b'
+    assert cache.metrics()['entries'] == 0
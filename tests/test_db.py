@@ -1,11 +1,23 @@
 import logging
+import threading
+import time
 from datetime import datetime
 
 import pytest
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import select
 
-from app.models import Competitor, Tournament
+from app.database import ReplicaRouter, settings
+from app.jobs import DatabaseJobBackend
+from app.models import (
+    Competitor,
+    Match,
+    MatchEvent,
+    Tournament,
+    TournamentArchive,
+)
+from app.replay import verify
 
 logger = logging.getLogger(__name__)
 
@@ -49,3 +61,347 @@ def test_create_competitor_invalid_tournament_id(session: Session):
     logger.info(
         'Competitor creation with invalid tournament ID tested successfully.'
     )
+
+
+def test_archive_finished_tournaments_skips_unfinished(session):
+    tournament = Tournament(
+        name='Unfinished Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        ['Competitor1', 'Competitor2', 'Competitor3', 'Competitor4'],
+        tournament.id,
+        session,
+    )
+
+    archived = TournamentArchive.archive_finished_tournaments(session)
+
+    assert archived == []
+    assert session.get(Tournament, tournament.id).is_archived is not True
+
+
+def test_pods_are_paired_independently():
+    pods = [list(range(0, 5)), list(range(5, 9))]
+
+    pairs = Match._set_pairs_for_pods([list(pod) for pod in pods])
+
+    assert len(pairs) == 2
+    assert sorted(id for pair in pairs[0] for id in pair) == pods[0]
+    assert sorted(id for pair in pairs[1] for id in pair) == pods[1]
+    assert len(pairs[0][0]) == 1
+
+
+def test_database_job_backend_claims_each_job_once(session):
+    engine = session.get_bind()
+    backend = DatabaseJobBackend(lambda: Session(engine))
+    first = backend.enqueue('generate_round', {'tournament_id': 1})
+    second = backend.enqueue('archive_tournament', {'tournament_id': 2})
+
+    claimed = [backend.claim(), backend.claim()]
+    backend.finish(first)
+    backend.fail(second, 'Tournament with ID 2 not found.')
+
+    assert [job['id'] for job in claimed] == [first, second]
+    assert claimed[0]['payload'] == {'tournament_id': 1}
+    assert backend.claim() is None
+    assert backend.get(first)['status'] == 'finished'
+    assert backend.get(second)['status'] == 'failed'
+    assert backend.get(second)['error'] == 'Tournament with ID 2 not found.'
+
+
+def test_replica_router_round_robin_and_health_checks(tmp_path):
+    primary = create_engine(f'sqlite:///{tmp_path / "primary.db"}')
+    replicas = [
+        create_engine(f'sqlite:///{tmp_path / "replica_1.db"}'),
+        create_engine(f'sqlite:///{tmp_path / "missing" / "replica_2.db"}'),
+        create_engine(f'sqlite:///{tmp_path / "replica_3.db"}'),
+    ]
+    router = ReplicaRouter(primary, replicas, read_your_writes_seconds=60)
+
+    picked = [router.engine_for_read(1) for _ in range(4)]
+    router.mark_written(1)
+
+    # the replica that cannot be opened is skipped
+    assert picked == [replicas[0], replicas[2], replicas[0], replicas[2]]
+    assert router.engine_for_read(1) is primary
+    assert router.engine_for_read(2) is not primary
+    assert ReplicaRouter(primary).engine_for_read(1) is primary
+
+
+def test_replica_router_forgets_expired_writes():
+    router = ReplicaRouter(None, read_your_writes_seconds=0.05)
+
+    for tournament_id in range(1000):
+        router.mark_written(tournament_id)
+    time.sleep(0.1)
+    router.mark_written(1000)
+
+    assert list(router._written) == [1000]
+    assert router._recently_written(1000)
+    assert not router._recently_written(1)
+
+
+def test_round_is_created_once_by_concurrent_requests(session):
+    tournament = Tournament(
+        name='Concurrent Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(8)], tournament.id, session
+    )
+
+    with Session(session.get_bind()) as other:
+        # the other request read the tournament before the round existed
+        other.get(Tournament, tournament.id)
+        Match.create_match(tournament.id, session)
+        Match.create_match(tournament.id, other)
+
+    matches = session.scalars(
+        select(Match).where(Match.tournament_id == tournament.id)
+    ).all()
+    assert len(matches) == 4
+    assert session.get(Tournament, tournament.id).current_round == 1
+
+
+def _active_competitors(session, tournament_id):
+    return len(
+        session.scalars(
+            select(Competitor.id).where(
+                Competitor.tournament_id == tournament_id,
+                Competitor.status == True,  # noqa
+            )
+        ).all()
+    )
+
+
+@pytest.mark.parametrize('number_competitors', [4, 6, 7, 8, 12, 16])
+def test_active_competitors_counter_after_a_full_bracket(
+    session, number_competitors
+):
+    tournament = Tournament(
+        name='Counted Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(number_competitors)],
+        tournament.id,
+        session,
+    )
+    while not isinstance(Match.get_topfour(tournament.id, session), dict):
+        Match.create_match(tournament.id, session)
+        for match in session.scalars(
+            select(Match).where(
+                Match.tournament_id == tournament.id,
+                Match.state == 'pending',
+            )
+        ).all():
+            Match.set_winner(
+                match.id,
+                tournament.id,
+                {'competitor_id': match.competitor_1_id},
+                session,
+            )
+            assert tournament.active_competitors == _active_competitors(
+                session, tournament.id
+            )
+
+    assert tournament.active_competitors == 1
+    assert tournament.pending_matches == 0
+
+
+def test_a_result_reported_twice_moves_the_counters_once(session):
+    tournament = Tournament(
+        name='Retried Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(8)], tournament.id, session
+    )
+    Match.create_match(tournament.id, session)
+    match = session.scalars(
+        select(Match).where(Match.tournament_id == tournament.id)
+    ).first()
+    winner = {'competitor_id': match.competitor_1_id}
+
+    with Session(session.get_bind()) as other:
+        # the retry read the match while it was still pending
+        stale = other.get(Match, match.id)
+        Match.set_winner(match.id, tournament.id, winner, session)
+        Match.set_winner(match.id, tournament.id, winner, other)
+
+        assert stale.state == 'finished'
+
+    session.expire_all()
+    tournament = session.get(Tournament, tournament.id)
+    assert tournament.pending_matches == 3
+    assert tournament.active_competitors == 7
+    assert _active_competitors(session, tournament.id) == 7
+
+
+def test_concurrent_reports_of_one_match_keep_the_first_winner(session):
+    tournament = Tournament(
+        name='Contested Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(8)], tournament.id, session
+    )
+    Match.create_match(tournament.id, session)
+    match = session.scalars(
+        select(Match).where(Match.tournament_id == tournament.id)
+    ).first()
+    match_id, tournament_id = match.id, tournament.id
+    competitors = [match.competitor_1_id, match.competitor_2_id]
+    engine = session.get_bind()
+    start = threading.Barrier(2)
+    outcomes = {}
+
+    def report(winner_id):
+        with Session(engine) as reporter:
+            # both reports read the match while it is still pending
+            reporter.get(Match, match_id)
+            start.wait()
+            try:
+                Match.set_winner(
+                    match_id,
+                    tournament_id,
+                    {'competitor_id': winner_id},
+                    reporter,
+                )
+                outcomes[winner_id] = 'set'
+            except ValueError as e:
+                outcomes[winner_id] = str(e)
+
+    threads = [
+        threading.Thread(target=report, args=(competitor,))
+        for competitor in competitors
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [c for c in competitors if outcomes[c] == 'set']
+    assert len(winners) == 1
+    assert f'Match with ID {match_id} was already finished.' in (
+        outcomes.values()
+    )
+    session.expire_all()
+    assert session.get(Match, match_id).winner_id == winners[0]
+    statuses = {c: session.get(Competitor, c).status for c in competitors}
+    assert statuses == {c: c == winners[0] for c in competitors}
+    tournament = session.get(Tournament, tournament_id)
+    assert tournament.pending_matches == 3
+    assert tournament.active_competitors == 7
+    assert _active_competitors(session, tournament_id) == 7
+
+
+def test_replay_rebuilds_the_bracket_from_events(session):
+    tournament = Tournament(
+        name='Replayed Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(6)], tournament.id, session
+    )
+    while True:
+        Match.create_match(tournament.id, session)
+        pending = (
+            session.query(Match)
+            .filter_by(tournament_id=tournament.id, state='pending')
+            .all()
+        )
+        if (
+            not pending
+            and tournament.current_round > tournament.number_matches
+        ):
+            break
+        for match in pending:
+            Match.set_winner(
+                match.id,
+                tournament.id,
+                {'competitor_id': match.competitor_1_id},
+                session,
+            )
+
+    state = MatchEvent.rebuild(tournament.id, session)
+
+    assert verify(tournament.id, session, state) == []
+    assert state['pending_matches'] == 0
+    assert state['current_round'] == tournament.current_round
+    champion = state['standings'][0]
+    assert champion['losses'] == 0
+    assert champion['last_round'] == tournament.number_matches + 1
+
+
+@pytest.mark.parametrize('number_competitors', [5, 8, 11])
+def test_database_pairs_every_round(session, monkeypatch, number_competitors):
+    monkeypatch.setattr(settings, 'ROUND_GENERATION_DATABASE_THRESHOLD', 1)
+    tournament = Tournament(
+        name='Database Paired Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(number_competitors)],
+        tournament.id,
+        session,
+    )
+
+    while tournament.current_round <= tournament.number_matches:
+        active = session.scalars(
+            select(Competitor.id).where(
+                Competitor.tournament_id == tournament.id,
+                Competitor.status == True,  # noqa
+            )
+        ).all()
+        round = tournament.current_round
+        Match.create_match(tournament.id, session)
+        matches = session.scalars(
+            select(Match).where(
+                Match.tournament_id == tournament.id,
+                Match.round == tournament.current_round,
+            )
+        ).all()
+        if round < tournament.number_matches - 1:
+            # every active competitor plays once or gets a bye
+            assert sorted(
+                id
+                for match in matches
+                for id in (match.competitor_1_id, match.competitor_2_id)
+                if id is not None
+            ) == sorted(active)
+        for match in matches:
+            if match.competitor_2_id is None:
+                assert match.winner_id == match.competitor_1_id
+                assert match.state == 'finished'
+            else:
+                Match.set_winner(
+                    match.id,
+                    tournament.id,
+                    {'competitor_id': match.competitor_1_id},
+                    session,
+                )
+
+    assert tournament.pending_matches == 0
+    assert isinstance(Match.get_topfour(tournament.id, session), dict)
@@ -0,0 +1,103 @@
+import pytest
+from starlette.requests import Request
+
+from app.encoding import MSGPACK, to_columns, wants_msgpack
+
+msgpack = pytest.importorskip('msgpack')
+
+
+def _play_first_round(client):
+    tournament_id = client.post(
+        '/tournament',
+        json={
+            'name': 'Packed',
+            'date_start': '2024-01-29T12:00:00',
+            'date_end': '2024-02-05T18:00:00',
+        },
+    ).json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': ['A', 'B', 'C', 'D', 'E']},
+    )
+    return tournament_id
+
+
+def test_to_columns_turns_rows_into_parallel_lists():
+    rows = {
+        'Round 1': [
+            {'id': 1, 'state': 'pending'},
+            {'id': 2, 'state': 'finished'},
+        ]
+    }
+
+    assert to_columns(rows) == {
+        'Round 1': {'id': [1, 2], 'state': ['pending', 'finished']}
+    }
+    assert to_columns('The championship is not over yet.') == (
+        'The championship is not over yet.'
+    )
+
+
+def test_match_list_in_msgpack_and_columns(client):
+    tournament_id = _play_first_round(client)
+    rows = client.get(f'/tournament/{tournament_id}/match').json()
+
+    packed = client.get(
+        f'/tournament/{tournament_id}/match',
+        headers={'accept': MSGPACK},
+    )
+    columns = client.get(
+        f'/tournament/{tournament_id}/match',
+        params={'layout': 'columnar'},
+        headers={'accept': MSGPACK},
+    )
+
+    assert packed.status_code == 201
+    assert packed.headers['content-type'] == MSGPACK
+    assert msgpack.unpackb(packed.content) == rows
+    assert msgpack.unpackb(columns.content) == to_columns(rows)
+    assert len(columns.content) < len(packed.content)
+
+
+def test_listing_and_result_in_msgpack(client):
+    tournament_id = _play_first_round(client)
+
+    listing = client.get('/tournaments', headers={'accept': MSGPACK})
+    result = client.get(
+        f'/tournament/{tournament_id}/result', headers={'accept': MSGPACK}
+    )
+    columns = client.get('/tournaments', params={'layout': 'columnar'})
+
+    page = msgpack.unpackb(listing.content)
+    assert page['tournaments'][0]['id'] == tournament_id
+    assert page['tournaments'][0]['date_start'] == '2024-01-29T12:00:00'
+    assert (
+        msgpack.unpackb(result.content)
+        == client.get(f'/tournament/{tournament_id}/result').json()
+    )
+    assert columns.json()['tournaments']['id'] == [tournament_id]
+
+
+@pytest.mark.parametrize(
+    'accept, expected',
+    [
+        (None, False),
+        ('*/*', False),
+        ('application/*', False),
+        (MSGPACK, True),
+        ('application/x-msgpack', True),
+        ('application/json, application/msgpack', True),
+        ('Application/MsgPack; q=0.8, */*;q=0.1', True),
+        ('application/msgpack;q=0', False),
+        ('application/msgpack;q=0.5, application/json', False),
+        ('application/msgpack;q=0.5, */*', False),
+        ('application/msgpack;q=nope', False),
+    ],
+)
+def test_wants_msgpack_honours_the_quality_of_the_media_ranges(
+    accept, expected
+):
+    headers = [(b'accept', accept.encode())] if accept is not None else []
+    request = Request({'type': 'http', 'headers': headers})
+
+    assert wants_msgpack(request) is expected
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.app import app
+from app.group_commit import GroupCommitter, get_group_committer
+from app.models import STATUS_PENDING, Competitor, Match, Tournament
+
+
+@pytest.fixture
+def committer(session):
+    engine = session.get_bind()
+    committer = GroupCommitter(
+        lambda: Session(engine, expire_on_commit=False),
+        max_delay=0.05,
+        max_batch=64,
+    )
+    yield committer
+    committer.stop()
+
+
+def _first_round(session, number_competitors):
+    tournament = Tournament(
+        name='Group Commit',
+        date_start=datetime(2024, 1, 29, 12),
+        date_end=datetime(2024, 2, 5, 18),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(number_competitors)],
+        tournament.id,
+        session,
+    )
+    Match.create_match(tournament.id, session)
+    matches = session.scalars(
+        select(Match).where(Match.state == STATUS_PENDING)
+    ).all()
+    return tournament.id, matches
+
+
+def test_concurrent_results_share_commits(session, committer):
+    tournament_id, matches = _first_round(session, 16)
+
+    def report(match):
+        return committer.set_winner(
+            match.id, tournament_id, {'competitor_id': match.competitor_1_id}
+        )
+
+    with ThreadPoolExecutor(len(matches)) as pool:
+        reported = list(pool.map(report, matches))
+
+    assert [match.winner_id for match in reported] == [
+        match.competitor_1_id for match in matches
+    ]
+    assert committer.metrics()['batches'] < len(matches)
+    session.expire_all()
+    tournament = session.get(Tournament, tournament_id)
+    assert tournament.pending_matches == 0
+    assert tournament.active_competitors == 8
+
+
+def test_invalid_result_fails_alone(session, committer):
+    tournament_id, matches = _first_round(session, 4)
+
+    with ThreadPoolExecutor(2) as pool:
+        valid = pool.submit(
+            committer.set_winner,
+            matches[0].id,
+            tournament_id,
+            {'competitor_id': matches[0].competitor_2_id},
+        )
+        invalid = pool.submit(
+            committer.set_winner,
+            matches[1].id,
+            tournament_id,
+            {'competitor_id': matches[0].competitor_1_id},
+        )
+
+    assert valid.result().winner_id == matches[0].competitor_2_id
+    with pytest.raises(ValueError, match='match is not valid'):
+        invalid.result()
+
+
+def test_route_reports_through_the_committer(client, session, committer):
+    tournament_id, matches = _first_round(session, 2)
+    app.dependency_overrides[get_group_committer] = lambda: committer
+
+    response = client.post(
+        f'/tournament/{tournament_id}/match/{matches[0].id}',
+        json={'competitor_id': matches[0].competitor_1_id},
+    )
+
+    assert response.status_code == 201
+    assert committer.metrics()['results'] == 1
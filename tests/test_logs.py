@@ -0,0 +1,63 @@
+import json
+import logging
+import queue
+import subprocess
+import sys
+
+from app.logs import JsonFormatter, LazyQueueHandler, SamplingFilter
+
+
+def _record(level=logging.INFO, msg='Round %s created.', args=(3,), **extra):
+    record = logging.LogRecord(
+        'app.models', level, __file__, 1, msg, args, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_outputs_message_and_extra_fields():
+    entry = json.loads(JsonFormatter().format(_record(tournament_id=7)))
+
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'app.models'
+    assert entry['message'] == 'Round 3 created.'
+    assert entry['tournament_id'] == 7
+
+
+def test_sampling_filter_only_samples_debug_records():
+    sampler = SamplingFilter(rate=0)
+
+    assert not sampler.filter(_record(level=logging.DEBUG))
+    assert sampler.filter(_record(level=logging.INFO))
+    assert SamplingFilter(rate=1).filter(_record(level=logging.DEBUG))
+
+
+def test_queue_handler_leaves_formatting_to_the_listener():
+    records = queue.SimpleQueue()
+    handler = LazyQueueHandler(records)
+
+    handler.handle(_record())
+    record = records.get_nowait()
+
+    assert record.msg == 'Round %s created.'
+    assert record.args == (3,)
+
+
+def test_logging_is_configured_by_the_app_not_on_import():
+    # a fresh interpreter, the test session has started the app already
+    script = """
+import logging
+from fastapi.testclient import TestClient
+from app.app import app
+from app.logs import LazyQueueHandler
+
+def queued():
+    return any(
+        isinstance(h, LazyQueueHandler) for h in logging.getLogger().handlers
+    )
+
+assert not queued()
+with TestClient(app):
+    assert queued()
+"""
+    subprocess.run([sys.executable, '-c', script], check=True)
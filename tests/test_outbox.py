@@ -0,0 +1,141 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.database import settings
+from app.models import Competitor, Match, OutboxMessage, Tournament
+from app.outbox import OutboxDispatcher
+
+
+class StubWebhook(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server.received.append(json.loads(body))
+        status = 500 if server.failures > 0 else 204
+        server.failures -= 1
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWebhook)
+    server.received = []
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_port}/hook'
+    monkeypatch.setattr(settings, 'WEBHOOK_URLS', [url])
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def play_first_round(session):
+    tournament = Tournament(
+        name='Notified Tournament',
+        date_start=datetime.now(),
+        date_end=datetime.now(),
+    )
+    session.add(tournament)
+    session.commit()
+    Competitor.create_competitors(
+        [f'Competitor{i}' for i in range(4)], tournament.id, session
+    )
+    Match.create_match(tournament.id, session)
+    for match in session.query(Match).filter_by(tournament_id=tournament.id):
+        Match.set_winner(
+            match.id,
+            tournament.id,
+            {'competitor_id': match.competitor_1_id},
+            session,
+        )
+    return tournament
+
+
+def dispatcher_for(session, url, **options):
+    engine = session.get_bind()
+    return OutboxDispatcher(
+        lambda: Session(engine), [url], backoff_seconds=0, **options
+    )
+
+
+def test_outbox_is_written_with_the_results(session, webhook):
+    tournament = play_first_round(session)
+
+    messages = (
+        session.query(OutboxMessage)
+        .filter_by(tournament_id=tournament.id)
+        .order_by(OutboxMessage.id)
+        .all()
+    )
+
+    assert [message.event_type for message in messages] == [
+        'round_created',
+        'match_finished',
+        'match_finished',
+    ]
+    assert all(message.status == 'pending' for message in messages)
+
+
+def test_dispatcher_delivers_a_batch(session, webhook):
+    server, url = webhook
+    play_first_round(session)
+
+    delivered = asyncio.run(dispatcher_for(session, url).dispatch_once())
+
+    assert delivered == 3
+    (batch,) = server.received
+    assert [m['event_type'] for m in batch['messages']] == [
+        'round_created',
+        'match_finished',
+        'match_finished',
+    ]
+    session.expire_all()
+    assert {m.status for m in session.query(OutboxMessage)} == {'delivered'}
+
+
+def test_dispatcher_retries_with_backoff_then_gives_up(session, webhook):
+    server, url = webhook
+    server.failures = 1
+    play_first_round(session)
+    dispatcher = dispatcher_for(session, url, max_attempts=2)
+
+    async def deliver_twice():
+        try:
+            return [
+                await dispatcher.dispatch_once(),
+                await dispatcher.dispatch_once(),
+            ]
+        finally:
+            await dispatcher.close()
+
+    assert asyncio.run(deliver_twice()) == [0, 3]
+    assert len(server.received) == 2
+    session.expire_all()
+    assert {m.attempts for m in session.query(OutboxMessage)} == {2}
+
+    server.failures = 10
+    message = session.query(OutboxMessage).first()
+    message.status = 'pending'
+    message.next_attempt_at = datetime.now()
+    session.commit()
+    asyncio.run(dispatcher.dispatch_once())
+    session.expire_all()
+    assert session.get(OutboxMessage, message.id).status == 'failed'
+
+
+def test_no_outbox_without_webhooks(session):
+    play_first_round(session)
+
+    assert session.query(OutboxMessage).count() == 0
@@ -0,0 +1,258 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app.instrumentation import strict_relationship_loading
+from app.models import Match, Tournament
+
+# Maximum number of SQL statements each route may send per request.
+# The budgets must not depend on the number of competitors.
+QUERY_BUDGETS = {
+    'create_tournament': 2,
+    'register_competitors': 3,
+    'get_match_list': 7,
+    # match, loser status, counters, match state, event
+    'put_winner_for_match': 5,
+    'get_topfour': 3,
+}
+
+TOURNAMENT_PAYLOAD = {
+    'name': 'Budget Tournament',
+    'date_start': '2024-01-29T12:00:00',
+    'date_end': '2024-02-05T18:00:00',
+}
+
+
+def play_tournament(client, query_counter, number_competitors):
+    """
+    Plays a full tournament through the API and returns the highest
+    number of statements seen for each route.
+    """
+    counts = {}
+
+    def measure(route, request):
+        query_counter.reset()
+        response = request()
+        counts[route] = max(counts.get(route, 0), query_counter.count)
+        return response
+
+    tournament_id = measure(
+        'create_tournament',
+        lambda: client.post('/tournament', json=TOURNAMENT_PAYLOAD),
+    ).json()['id']
+
+    names = [f'Competitor{i}' for i in range(number_competitors)]
+    measure(
+        'register_competitors',
+        lambda: client.post(
+            f'/tournament/{tournament_id}/competitor', json={'names': names}
+        ),
+    )
+
+    while True:
+        response = measure(
+            'get_match_list',
+            lambda: client.get(f'/tournament/{tournament_id}/match'),
+        )
+        assert response.status_code == 201
+        pending = [
+            match
+            for matches in response.json().values()
+            for match in matches
+            if match['state'] == 'pending'
+        ]
+        if not pending:
+            break
+        for match in pending:
+            response = measure(
+                'put_winner_for_match',
+                lambda match=match: client.post(
+                    f'/tournament/{tournament_id}/match/{match["id"]}',
+                    json={'competitor_id': match['competitor_1_id']},
+                ),
+            )
+            assert response.status_code == 201
+
+    response = measure(
+        'get_topfour',
+        lambda: client.get(f'/tournament/{tournament_id}/result'),
+    )
+    assert response.status_code == 201
+    return counts
+
+
+@pytest.mark.parametrize('number_competitors', [4, 8, 16, 32])
+def test_routes_stay_within_query_budget(
+    client, session, query_counter, number_competitors
+):
+    with strict_relationship_loading(session):
+        counts = play_tournament(client, query_counter, number_competitors)
+
+    for route, budget in QUERY_BUDGETS.items():
+        assert counts[route] <= budget, (route, query_counter.statements)
+
+
+def test_query_count_does_not_grow_with_tournament_size(
+    client, session, query_counter
+):
+    small = play_tournament(client, query_counter, 4)
+    large = play_tournament(client, query_counter, 32)
+
+    assert small == large
+
+
+def test_strict_mode_raises_on_lazy_match_competitor(client, session):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+    tournament_id = response.json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': ['Competitor1', 'Competitor2']},
+    )
+    client.get(f'/tournament/{tournament_id}/match')
+    session.expunge_all()
+
+    match = session.query(Match).filter_by(tournament_id=tournament_id).first()
+
+    with strict_relationship_loading(session):
+        with pytest.raises(InvalidRequestError, match='strict'):
+            match.competitor_1
+
+
+def test_round_decisions_read_only_the_tournament_row(
+    client, session, query_counter
+):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+    tournament_id = response.json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': [f'Competitor{i}' for i in range(32)]},
+    )
+    client.get(f'/tournament/{tournament_id}/match')
+    session.expire_all()
+
+    query_counter.reset()
+    Match.create_match(tournament_id, session)
+
+    # the round is pending: nothing to create, decided from one row
+    assert query_counter.count == 1
+    assert 'FROM tournaments' in query_counter.statements[0]
+    assert session.get(Tournament, tournament_id).pending_matches == 16
+
+
+def test_match_changes_read_only_the_changed_matches(
+    client, session, query_counter
+):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+    tournament_id = response.json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': [f'Competitor{i}' for i in range(32)]},
+    )
+    match = client.get(f'/tournament/{tournament_id}/match').json()['Round 1'][
+        0
+    ]
+    version = client.get(f'/tournament/{tournament_id}/match/changes').json()[
+        'version'
+    ]
+    client.post(
+        f'/tournament/{tournament_id}/match/{match["id"]}',
+        json={'competitor_id': match['competitor_1_id']},
+    )
+
+    query_counter.reset()
+    changes = client.get(
+        f'/tournament/{tournament_id}/match/changes',
+        params={'since': version},
+    ).json()
+
+    # the tournament row and the changed matches
+    assert query_counter.count == 2
+    assert [m['id'] for m in changes['matches']] == [match['id']]
+
+
+def test_stats_are_one_aggregate_cached_per_version(
+    client, session, query_counter
+):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+    tournament_id = response.json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': [f'Competitor{i}' for i in range(32)]},
+    )
+    match = client.get(f'/tournament/{tournament_id}/match').json()['Round 1'][
+        0
+    ]
+
+    query_counter.reset()
+    before = client.get(f'/tournament/{tournament_id}/stats').json()
+    # the tournament row and the aggregate
+    assert query_counter.count == 2
+    assert 'GROUP BY' in query_counter.statements[1]
+
+    query_counter.reset()
+    assert client.get(f'/tournament/{tournament_id}/stats').json() == before
+    assert query_counter.count == 1
+
+    client.post(
+        f'/tournament/{tournament_id}/match/{match["id"]}',
+        json={'competitor_id': match['competitor_1_id']},
+    )
+    query_counter.reset()
+    after = client.get(f'/tournament/{tournament_id}/stats').json()
+
+    assert query_counter.count == 2
+    assert after['pending_matches'] == before['pending_matches'] - 1
+
+
+def test_sparse_fields_skip_the_competitor_joins(
+    client, session, query_counter
+):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+    tournament_id = response.json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': [f'Competitor{i}' for i in range(8)]},
+    )
+    full = client.get(f'/tournament/{tournament_id}/match').json()
+
+    query_counter.reset()
+    sparse = client.get(
+        f'/tournament/{tournament_id}/match',
+        params={'fields': 'id,round,state'},
+    ).json()
+
+    listing = [
+        statement
+        for statement in query_counter.statements
+        if 'FROM matches' in statement
+    ]
+    assert len(listing) == 1
+    assert 'JOIN' not in listing[0]
+    assert 'competitors' not in listing[0]
+    assert sparse == {
+        round: [
+            {field: match[field] for field in ('id', 'round', 'state')}
+            for match in matches
+        ]
+        for round, matches in full.items()
+    }
+
+    named = client.get(
+        f'/tournament/{tournament_id}/match', params={'fields': 'id,winner'}
+    ).json()
+    assert all(
+        set(match) == {'id', 'winner'}
+        for matches in named.values()
+        for match in matches
+    )
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.post('/tournament', json=TOURNAMENT_PAYLOAD)
+
+    response = client.get(
+        f'/tournament/{response.json()["id"]}/match',
+        params={'fields': 'id,password'},
+    )
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Unknown fields: password.'
@@ -1,5 +1,17 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from app.app import app
+from app.database import ReplicaRouter, get_replica_router
 from app.models import Competitor, Match, Tournament
 
+# the bracket tests run on the database and on the in-memory storage
+both_storages = pytest.mark.parametrize(
+    'client', ['database', 'memory'], indirect=True
+)
+
 
 def create_test_tournament(client):
     payload = {
@@ -45,6 +57,7 @@ def test_create_tournament_failure_invalid_dates(client):
     assert response.status_code == 422
 
 
+@both_storages
 def test_register_competitor_after_tournament_start(client):
     """
     Test registering competitors for a tournament after it has started.
@@ -68,6 +81,7 @@ def test_register_competitor_after_tournament_start(client):
     assert response.status_code == 404
 
 
+@both_storages
 def test_register_competitors_tournament_not_found(client):
     """
     Test registering competitors for a nonexistent tournament.
@@ -88,6 +102,7 @@ def test_register_competitors_tournament_not_found(client):
     assert 'Tournament with ID' in response.json()['detail']
 
 
+@both_storages
 def test_register_competitors_single_name_failure(client):
     """
     Test registering a single competitor for a tournament (failure).
@@ -117,6 +132,7 @@ def test_register_competitors_single_name_failure(client):
     )
 
 
+@both_storages
 def test_register_competitors_success(client):
     """
     Test successfully registering competitors for a tournament.
@@ -142,6 +158,7 @@ def test_register_competitors_success(client):
     assert response.json() is None
 
 
+@both_storages
 def test_get_match_list_with_two_competitors(client):
     """
     Test getting the match list for a tournament with two competitors.
@@ -241,7 +258,8 @@ def test_create_match_with_odd_number_of_competitors(client, session):
     assert matches_response.status_code == 201
 
 
-def test_get_match_list_for_nonexistent_tournament(client, session):
+@both_storages
+def test_get_match_list_for_nonexistent_tournament(client):
     """
     Test getting the match list for a nonexistent tournament.
 
@@ -256,7 +274,8 @@ def test_get_match_list_for_nonexistent_tournament(client, session):
     assert response.json() == {'detail': 'Tournament with ID 999 not found.'}
 
 
-def test_set_winner_for_nonexistent_tournament(client, session):
+@both_storages
+def test_set_winner_for_nonexistent_tournament(client):
     """
     Test setting a winner for a match in a nonexistent tournament.
 
@@ -432,6 +451,7 @@ def test_create_consolation_match(client, session):
     assert response.status_code == 201
 
 
+@both_storages
 def test_get_to_generate_the_final_list_and_not_create_unnecessary(client):
     """
     This test is to check if will create the final list
@@ -525,6 +545,7 @@ def get_matches(client, tournament_id):
     return response.json()
 
 
+@both_storages
 def test_get_topfour(client):
 
     tournament_name = 'Example Tournament'
@@ -572,6 +593,7 @@ def test_get_topfour(client):
     )
 
 
+@both_storages
 def test_get_topfour_with_two_competitor(client):
     """
     Test the retrieval of the top 4 competitors
@@ -634,6 +656,7 @@ def test_get_topfour_with_two_competitor(client):
     assert response_get_tournament_result.status_code == 201
 
 
+@both_storages
 def test_get_topfour_with_three_competitor(client):
     """
     Test the retrieval of the top 4 competitors
@@ -711,6 +734,7 @@ def test_get_topfour_with_three_competitor(client):
     assert response_get_tournament_result.status_code == 201
 
 
+@both_storages
 def test_take_result_but_the_tournament_is_not_end(client):
     # Step 1: Create Tournament
     tournament_name = 'Example Tournament'
@@ -732,3 +756,621 @@ def test_take_result_but_the_tournament_is_not_end(client):
         'The championship has not had any matches and has not concluded yet.'
     )
     assert response == expected_response
+
+
+def play_until_finished(client, tournament_id):
+    while True:
+        matches = get_matches(client, tournament_id)
+        pending = [
+            match
+            for round_matches in matches.values()
+            for match in round_matches
+            if match['state'] == 'pending'
+        ]
+        if not pending:
+            return matches
+        for match in pending:
+            create_match(
+                client, tournament_id, match['id'], match['competitor_1']
+            )
+
+
+def test_archive_finished_tournament(client, session):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {
+            'names': [
+                'Competitor1',
+                'Competitor2',
+                'Competitor3',
+                'Competitor4',
+            ]
+        },
+    )
+    bracket = play_until_finished(client, tournament_id)
+    podium = client.get(f'/tournament/{tournament_id}/result').json()
+
+    response = client.post(f'/tournament/{tournament_id}/archive')
+
+    assert response.status_code == 201
+    assert (
+        session.query(Match).filter_by(tournament_id=tournament_id).count()
+        == 0
+    )
+    assert (
+        session.query(Competitor)
+        .filter_by(tournament_id=tournament_id)
+        .count()
+        == 0
+    )
+    assert get_matches(client, tournament_id) == bracket
+    assert client.get(f'/tournament/{tournament_id}/result').json() == podium
+
+
+def test_archive_unfinished_tournament(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {
+            'names': [
+                'Competitor1',
+                'Competitor2',
+                'Competitor3',
+                'Competitor4',
+            ]
+        },
+    )
+    get_matches(client, tournament_id)
+
+    response = client.post(f'/tournament/{tournament_id}/archive')
+
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'The championship is not over yet.'}
+
+
+def test_set_winner_by_competitor_id(client, session):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client, tournament_id, {'names': ['Competitor1', 'Competitor2']}
+    )
+    match = get_matches(client, tournament_id)['Round 2'][0]
+
+    response = client.post(
+        f'/tournament/{tournament_id}/match/{match["id"]}',
+        json={'competitor_id': match['competitor_2_id']},
+    )
+
+    assert response.status_code == 201
+    finished = get_matches(client, tournament_id)['Round 2'][0]
+    assert finished['winner_id'] == match['competitor_2_id']
+    assert session.get(Competitor, match['competitor_1_id']).status is False
+
+
+@both_storages
+def test_set_winner_with_competitor_outside_the_match(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client, tournament_id, {'names': ['Competitor1', 'Competitor2']}
+    )
+    match = get_matches(client, tournament_id)['Round 2'][0]
+
+    response = client.post(
+        f'/tournament/{tournament_id}/match/{match["id"]}',
+        json={'competitor_id': 999},
+    )
+
+    assert response.status_code == 404
+    assert response.json() == {
+        'detail': 'Competitor not found or match is not valid'
+    }
+
+
+def test_register_duplicated_names_get_unique_display_names(client, session):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(client, tournament_id, {'names': ['Competitor'] * 150})
+
+    names = [
+        competitor.name
+        for competitor in session.query(Competitor).filter_by(
+            tournament_id=tournament_id
+        )
+    ]
+
+    assert len(names) == 150
+    assert len(set(names)) == 150
+
+
+def test_tournament_with_four_pods(client, session):
+    response = client.post(
+        '/tournament',
+        json={
+            'name': 'Example Tournament',
+            'date_start': '2024-01-29T12:00:00',
+            'date_end': '2024-02-05T18:00:00',
+            'number_pods': 4,
+        },
+    )
+    tournament_id = response.json()['id']
+    assert response.json()['number_pods'] == 4
+
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(16)]},
+    )
+    groups = {
+        competitor.id: competitor.group
+        for competitor in session.query(Competitor).filter_by(
+            tournament_id=tournament_id
+        )
+    }
+    assert sorted(set(groups.values())) == [
+        'group_1',
+        'group_2',
+        'group_3',
+        'group_4',
+    ]
+
+    first_round = get_matches(client, tournament_id)['Round 1']
+    assert len(first_round) == 8
+    for match in first_round:
+        assert (
+            groups[match['competitor_1_id']]
+            == groups[match['competitor_2_id']]
+        )
+
+    bracket = play_until_finished(client, tournament_id)
+    response = client.get(f'/tournament/{tournament_id}/result')
+
+    assert list(bracket) == [f'Round {i}' for i in range(5, 0, -1)]
+    assert response.status_code == 201
+    assert set(response.json()) == {
+        'winner',
+        'second_place',
+        'third_place',
+        'fourth_place',
+    }
+
+
+def test_tournament_with_less_than_two_pods(client):
+    response = client.post(
+        '/tournament',
+        json={
+            'name': 'Example Tournament',
+            'date_start': '2024-01-29T12:00:00',
+            'date_end': '2024-02-05T18:00:00',
+            'number_pods': 1,
+        },
+    )
+
+    assert response.status_code == 422
+
+
+def wait_for_job(client, job_queue, job_id):
+    assert job_queue.join(timeout=10)
+    response = client.get(f'/job/{job_id}')
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_background_jobs_register_generate_and_archive(
+    client, session, job_queue
+):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    names = ['Competitor1', 'Competitor2', 'Competitor3', 'Competitor4']
+
+    response = client.post(
+        f'/tournament/{tournament_id}/competitor?background=true',
+        json={'names': names},
+    )
+    assert response.status_code == 202
+    job = wait_for_job(client, job_queue, response.json()['job_id'])
+    assert job['kind'] == 'register_competitors'
+    assert job['status'] == 'finished'
+
+    response = client.post(f'/tournament/{tournament_id}/round')
+    assert response.status_code == 202
+    job = wait_for_job(client, job_queue, response.json()['job_id'])
+    assert job['status'] == 'finished'
+
+    session.expire_all()
+    assert (
+        session.scalar(
+            select(func.count(Match.id)).where(
+                Match.tournament_id == tournament_id, Match.round == 1
+            )
+        )
+        == 2
+    )
+
+    play_until_finished(client, tournament_id)
+    response = client.post(
+        f'/tournament/{tournament_id}/archive?background=true'
+    )
+    assert response.status_code == 202
+    job = wait_for_job(client, job_queue, response.json()['job_id'])
+    assert job['status'] == 'finished'
+
+    session.expire_all()
+    assert session.get(Tournament, tournament_id).is_archived is True
+    assert job_queue._tournament_locks == {}
+
+
+def test_background_job_failure_is_reported(client, job_queue):
+    response = client.post('/tournament/999/round')
+
+    job = wait_for_job(client, job_queue, response.json()['job_id'])
+
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Tournament with ID 999 not found.'
+
+
+def test_job_refused_by_the_backend_is_not_waited_for(job_queue):
+    def refuse(kind, payload):
+        raise RuntimeError('Backend unavailable.')
+
+    job_queue.backend.enqueue = refuse
+
+    with pytest.raises(RuntimeError):
+        job_queue.enqueue('generate_round', tournament_id=1)
+    assert job_queue.join(timeout=1)
+
+
+def test_get_unknown_job(client, job_queue):
+    response = client.get('/job/unknown')
+
+    assert response.status_code == 404
+
+
+def test_read_endpoints_are_routed_to_the_replica(client, session, tmp_path):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': ['Competitor1', 'Competitor2']},
+    )
+    play_until_finished(client, tournament_id)
+    podium = client.get(f'/tournament/{tournament_id}/result').json()
+
+    # the replica is a copy of the primary taken now
+    primary = session.get_bind()
+    replica_path = tmp_path / 'replica.db'
+    with sqlite3.connect(primary.url.database) as source:
+        with sqlite3.connect(replica_path) as target:
+            source.backup(target)
+    replica = create_engine(f'sqlite:///{replica_path}')
+    router = ReplicaRouter(primary, [replica])
+    app.dependency_overrides[get_replica_router] = lambda: router
+
+    # a change the replica has not seen yet
+    session.query(Competitor).filter_by(tournament_id=tournament_id).update(
+        {'name': Competitor.name + ' Renamed'}
+    )
+    session.commit()
+
+    assert client.get(f'/tournament/{tournament_id}/result').json() == podium
+    assert 'Renamed' not in str(get_matches(client, tournament_id))
+
+    router.mark_written(tournament_id)
+
+    assert client.get(f'/tournament/{tournament_id}/result').json() != podium
+    assert 'Renamed' in str(get_matches(client, tournament_id))
+    replica.dispose()
+
+
+def test_list_tournaments_keyset_pages(client):
+    for day in (3, 1, 2):
+        create_tournament_get_id(
+            client,
+            f'Tournament {day}',
+            f'2024-01-0{day}T12:00:00',
+            '2024-02-05T18:00:00',
+        )
+
+    pages = []
+    cursor = None
+    while True:
+        params = {'order_by': 'date_start', 'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/tournaments', params=params)
+        assert response.status_code == 201
+        pages.append([t['name'] for t in response.json()['tournaments']])
+        cursor = response.json()['next_cursor']
+        if cursor is None:
+            break
+
+    assert pages == [['Tournament 1', 'Tournament 2'], ['Tournament 3']]
+
+    response = client.get(
+        '/tournaments',
+        params={
+            'date_from': '2024-01-02T00:00:00',
+            'date_to': '2024-01-02T23:59:59',
+        },
+    )
+    assert [t['name'] for t in response.json()['tournaments']] == [
+        'Tournament 2'
+    ]
+    assert client.get('/tournaments?cursor=invalid').status_code == 400
+
+
+def test_list_tournaments_progress_counters(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(5)]},
+    )
+
+    def progress():
+        response = client.get('/tournaments', params={'is_active': True})
+        (tournament,) = response.json()['tournaments']
+        return (
+            tournament['number_competitors'],
+            tournament['current_round'],
+            tournament['pending_matches'],
+        )
+
+    assert progress() == (5, 0, 0)
+
+    matches = get_matches(client, tournament_id)
+    pending = [m for m in matches['Round 1'] if m['state'] == 'pending']
+    assert progress() == (5, 1, len(pending))
+
+    create_match(
+        client, tournament_id, pending[0]['id'], pending[0]['competitor_1']
+    )
+    assert progress() == (5, 1, len(pending) - 1)
+
+    matches = play_until_finished(client, tournament_id)
+    assert progress() == (5, len(matches), 0)
+    assert client.get('/tournaments', params={'is_active': False}).json() == {
+        'tournaments': [],
+        'next_cursor': None,
+    }
+
+
+@both_storages
+def test_two_competitors_get_a_single_final(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client, tournament_id, {'names': ['Competitor1', 'Competitor2']}
+    )
+
+    get_matches(client, tournament_id)
+    matches = get_matches(client, tournament_id)
+
+    assert [len(round) for round in matches.values()] == [1]
+
+
+def test_events_can_be_tailed_since_a_sequence(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(4)]},
+    )
+    get_matches(client, tournament_id)
+
+    response = client.get(f'/tournament/{tournament_id}/events')
+    assert response.status_code == 201
+    first_page = response.json()
+    assert [event['kind'] for event in first_page['events']] == [
+        'match_created',
+        'match_created',
+    ]
+
+    play_until_finished(client, tournament_id)
+    response = client.get(
+        f'/tournament/{tournament_id}/events',
+        params={'since': first_page['last_sequence']},
+    )
+    events = response.json()['events']
+
+    assert events[0]['sequence'] > first_page['last_sequence']
+    # 4 results, the consolation and the final
+    assert sorted(event['kind'] for event in events) == (
+        ['match_created'] * 2 + ['winner_set'] * 4
+    )
+
+
+@both_storages
+def test_match_changes_since_a_version(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(4)]},
+    )
+    first_round = get_matches(client, tournament_id)['Round 1']
+
+    response = client.get(f'/tournament/{tournament_id}/match/changes')
+    assert response.status_code == 201
+    changes = response.json()
+    assert sorted(match['id'] for match in changes['matches']) == sorted(
+        match['id'] for match in first_round
+    )
+
+    match = first_round[0]
+    create_match(client, tournament_id, match['id'], match['competitor_1'])
+    delta = client.get(
+        f'/tournament/{tournament_id}/match/changes',
+        params={'since': changes['version']},
+    ).json()
+
+    assert delta['version'] > changes['version']
+    assert [(m['id'], m['winner']) for m in delta['matches']] == [
+        (match['id'], match['competitor_1'])
+    ]
+    assert delta['matches'][0]['change_seq'] == delta['version']
+    assert client.get(
+        f'/tournament/{tournament_id}/match/changes',
+        params={'since': delta['version']},
+    ).json() == {'version': delta['version'], 'matches': []}
+
+
+def test_match_changes_of_an_archived_tournament(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(4)]},
+    )
+    matches = play_until_finished(client, tournament_id)
+    version = client.get(f'/tournament/{tournament_id}/match/changes').json()[
+        'version'
+    ]
+    client.post(f'/tournament/{tournament_id}/archive')
+
+    behind = client.get(
+        f'/tournament/{tournament_id}/match/changes',
+        params={'since': version - 1},
+    ).json()
+    assert behind['version'] == version
+    assert len(behind['matches']) == sum(map(len, matches.values()))
+    assert client.get(
+        f'/tournament/{tournament_id}/match/changes',
+        params={'since': version},
+    ).json() == {'version': version, 'matches': []}
+
+
+def test_stats_aggregate_the_bracket(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(7)]},
+    )
+    first_round = get_matches(client, tournament_id)['Round 1']
+    played = next(m for m in first_round if m['state'] == 'pending')
+    create_match(client, tournament_id, played['id'], played['competitor_1'])
+
+    response = client.get(f'/tournament/{tournament_id}/stats')
+    assert response.status_code == 201
+    stats = response.json()
+
+    byes = sum(match['competitor_2_id'] is None for match in first_round)
+    finished = byes + 1
+    assert stats['rounds'] == [
+        {
+            'round': 1,
+            'matches': len(first_round),
+            'finished': finished,
+            'pending': len(first_round) - finished,
+            'byes': byes,
+            'completion_rate': finished / len(first_round),
+        }
+    ]
+    assert stats['pending_matches'] == len(first_round) - finished
+    assert stats['byes'] == byes
+    assert set(stats['pods']) == {'group_1', 'group_2'}
+    assert sum(pod['competitors'] for pod in stats['pods'].values()) == 7
+    assert sum(pod['survivors'] for pod in stats['pods'].values()) == 6
+
+
+def test_stats_of_an_archived_tournament(client):
+    tournament_id = create_tournament_get_id(
+        client,
+        'Example Tournament',
+        '2024-01-29T12:00:00',
+        '2024-02-05T18:00:00',
+    )
+    create_competitors(
+        client,
+        tournament_id,
+        {'names': [f'Competitor{i}' for i in range(4)]},
+    )
+    play_until_finished(client, tournament_id)
+    played = client.get(f'/tournament/{tournament_id}/stats').json()
+
+    client.post(f'/tournament/{tournament_id}/archive')
+    archived = client.get(f'/tournament/{tournament_id}/stats').json()
+
+    assert archived == played
+    assert archived['pending_matches'] == 0
+    assert [round['completion_rate'] for round in archived['rounds']] == [
+        1.0,
+        1.0,
+        1.0,
+    ]
+
+
+def test_stats_of_unknown_tournament(client):
+    response = client.get('/tournament/999/stats')
+
+    assert response.status_code == 404
+
+
+def test_match_changes_of_unknown_tournament(client):
+    response = client.get('/tournament/999/match/changes')
+
+    assert response.status_code == 400
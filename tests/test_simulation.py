@@ -0,0 +1,85 @@
+import pytest
+
+from app.simulation import PLACES, simulate_tournament
+
+
+@pytest.mark.parametrize('number_competitors', [2, 3, 4, 5, 8, 13])
+def test_every_place_is_given_once(number_competitors):
+    result = simulate_tournament(
+        [1.0] * number_competitors, simulations=2_000, seed=1
+    )
+
+    totals = {
+        place: sum(c[place] for c in result['competitors']) for place in PLACES
+    }
+    assert totals['first'] == pytest.approx(1)
+    assert totals['second'] == pytest.approx(1)
+    if number_competitors > 2:
+        assert totals['third'] == pytest.approx(1)
+
+
+def test_two_competitors_follow_their_strength():
+    result = simulate_tournament([1.0, 3.0], simulations=100_000, seed=1)
+
+    first, second = result['competitors']
+    assert result['rounds'] == 1
+    assert result['matches'] == 1
+    assert first['first'] == pytest.approx(0.25, abs=0.01)
+    assert second['first'] == pytest.approx(0.75, abs=0.01)
+
+
+def test_stronger_competitor_reaches_the_final_more_often():
+    result = simulate_tournament([1, 1, 1, 1, 1, 1, 1, 10], seed=1)
+
+    competitors = result['competitors']
+    assert result['rounds'] == 4
+    assert result['matches'] == 8
+    assert competitors[7]['final'] > 2 * competitors[0]['final']
+
+
+def test_simulation_requires_two_competitors():
+    with pytest.raises(ValueError):
+        simulate_tournament([1.0])
+
+
+def test_simulation_route(client):
+    response = client.post(
+        '/simulation',
+        json={'strengths': [1, 2, 3, 4], 'simulations': 1_000, 'seed': 1},
+    )
+
+    assert response.status_code == 201
+    assert response.json()['simulations'] == 1_000
+    assert len(response.json()['competitors']) == 4
+
+
+def test_simulation_route_with_non_positive_strength(client):
+    response = client.post('/simulation', json={'strengths': [1, 0]})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    'payload',
+    [
+        {'strengths': [1]},
+        {'strengths': [1] * 4097},
+        {'strengths': [1] * 101, 'simulations': 100_000},
+        {'strengths': [1, 2], 'number_pods': 1},
+    ],
+)
+def test_simulation_route_limits(client, payload):
+    response = client.post('/simulation', json=payload)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize('number_pods', [3, 4, 8])
+def test_simulation_with_pods(number_pods):
+    result = simulate_tournament(
+        [1.0] * 13, simulations=2_000, seed=1, number_pods=number_pods
+    )
+
+    for place in PLACES[:3]:
+        total = sum(c[place] for c in result['competitors'])
+        assert total == pytest.approx(1)
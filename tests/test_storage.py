@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+
+from app.storage import InMemoryStorage, SqlAlchemyStorage, TournamentStorage
+
+TOURNAMENT = {
+    'name': 'Quick Tournament',
+    'date_start': datetime(2024, 1, 29, 12),
+    'date_end': datetime(2024, 2, 5, 18),
+}
+
+
+@pytest.fixture(params=['memory', 'database'])
+def storage(request):
+    if request.param == 'memory':
+        return request.getfixturevalue('memory_storage')
+    return SqlAlchemyStorage(request.getfixturevalue('session'))
+
+
+@pytest.fixture
+def reference_storage():
+    storage = InMemoryStorage()
+    yield storage
+    storage.close()
+
+
+def _play(storage, number_competitors):
+    """
+    Plays a tournament to the end like the referees of the API: every
+    round is created by a match list and every pending match is won by
+    its first competitor, until the podium is known. Returns the number
+    of matches per round and the podium.
+    """
+    tournament = storage.create_tournament(**TOURNAMENT)
+    storage.register_competitors(
+        tournament.id, [f'Competitor{i}' for i in range(number_competitors)]
+    )
+    topfour = None
+    while not isinstance(topfour, dict):
+        storage.create_match(tournament.id)
+        rounds = storage.list_matches(tournament.id)
+        for match in [
+            match
+            for matches in rounds.values()
+            for match in matches
+            if match['state'] == 'pending'
+        ]:
+            storage.set_winner(
+                tournament.id,
+                match['id'],
+                {'competitor_id': match['competitor_1_id']},
+            )
+        topfour = storage.get_topfour(tournament.id)
+    matches_per_round = {
+        round: len(matches) for round, matches in rounds.items()
+    }
+    return matches_per_round, topfour
+
+
+@pytest.mark.parametrize(
+    'number_competitors, podium',
+    [
+        (2, {'first', 'second'}),
+        (3, {'first', 'second', 'third'}),
+        (5, {'winner', 'second_place', 'third_place', 'fourth_place'}),
+        (8, {'winner', 'second_place', 'third_place', 'fourth_place'}),
+        (13, {'winner', 'second_place', 'third_place', 'fourth_place'}),
+    ],
+)
+def test_storages_play_the_same_bracket(
+    storage, reference_storage, number_competitors, podium
+):
+    matches_per_round, topfour = _play(storage, number_competitors)
+
+    assert matches_per_round == _play(reference_storage, number_competitors)[0]
+    assert set(topfour) == podium
+
+
+def test_storage_errors_match_the_models(storage):
+    tournament = storage.create_tournament(**TOURNAMENT)
+
+    with pytest.raises(ValueError, match='at least 2 competitors'):
+        storage.register_competitors(tournament.id, ['Alone'])
+
+    storage.register_competitors(tournament.id, ['A', 'B', 'C', 'D'])
+    with pytest.raises(ValueError, match='already started'):
+        storage.register_competitors(tournament.id, ['E', 'F'])
+
+    storage.create_match(tournament.id)
+    match = storage.list_matches(tournament.id)['Round 1'][0]
+    with pytest.raises(ValueError, match='match is not valid'):
+        storage.set_winner(tournament.id, match['id'], {'competitor_id': -1})
+    with pytest.raises(ValueError, match='not found'):
+        storage.register_competitors(tournament.id + 1, ['A', 'B'])
+
+
+def test_storage_changes_follow_the_writes(storage):
+    tournament = storage.create_tournament(**TOURNAMENT)
+    storage.register_competitors(tournament.id, ['A', 'B', 'C', 'D'])
+    storage.create_match(tournament.id)
+
+    changes = storage.list_changes(tournament.id, 0)
+    assert len(changes['matches']) == 2
+    assert {match['change_seq'] for match in changes['matches']} == {
+        changes['version']
+    }
+
+    match = changes['matches'][0]
+    storage.set_winner(
+        tournament.id, match['id'], {'competitor_id': match['competitor_1_id']}
+    )
+    delta = storage.list_changes(tournament.id, changes['version'])
+
+    assert delta['version'] == changes['version'] + 1
+    assert [m['id'] for m in delta['matches']] == [match['id']]
+    assert delta['matches'][0]['winner_id'] == match['competitor_1_id']
+
+
+def test_storage_interface_is_abstract():
+    with pytest.raises(TypeError):
+        TournamentStorage()
+
+
+def test_memory_storage_podium_of_unknown_tournament(memory_storage):
+    with pytest.raises(ValueError, match='not found'):
+        memory_storage.get_topfour(1)
@@ -0,0 +1,98 @@
+import pytest
+
+from app.tracing import InMemoryExporter, Tracer, instrument_class, tracer
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, 'exporter', exporter)
+    return exporter
+
+
+def _play_first_round(client, traceparent):
+    tournament_id = client.post(
+        '/tournament',
+        json={
+            'name': 'Traced',
+            'date_start': '2024-01-29T12:00:00',
+            'date_end': '2024-02-05T18:00:00',
+        },
+    ).json()['id']
+    client.post(
+        f'/tournament/{tournament_id}/competitor',
+        json={'names': ['A', 'B', 'C', 'D']},
+    )
+    return client.get(
+        f'/tournament/{tournament_id}/match',
+        headers={'traceparent': traceparent},
+    )
+
+
+def test_sampled_request_exports_model_and_sql_spans(client, exporter):
+    response = _play_first_round(client, f'00-{TRACE_ID}-{PARENT_ID}-01')
+
+    assert response.status_code == 201
+    assert response.headers['traceparent'].startswith(f'00-{TRACE_ID}-')
+
+    spans = {span['name']: span for span in exporter.trace(TRACE_ID)}
+    root = spans['GET /tournament/{tournament_id}/match']
+    endpoint = spans['endpoint get_match_list']
+    create_match = spans['Match.create_match']
+
+    assert root['parent_id'] == PARENT_ID
+    assert root['attributes']['http.status_code'] == 201
+    assert endpoint['parent_id'] == root['span_id']
+    assert create_match['parent_id'] == endpoint['span_id']
+    assert spans['Match.list_matches']['parent_id'] == endpoint['span_id']
+    assert (
+        spans['Match._create_matches_for_group']['parent_id']
+        == create_match['span_id']
+    )
+    assert any(
+        span['name'] == 'sql' and span['attributes']['db.statement']
+        for span in exporter.trace(TRACE_ID)
+    )
+
+
+def test_unsampled_request_exports_nothing(client, exporter):
+    response = _play_first_round(client, f'00-{TRACE_ID}-{PARENT_ID}-00')
+
+    assert response.headers['traceparent'].endswith('-00')
+    assert not exporter.spans
+
+
+def test_tracer_samples_new_traces_at_its_rate():
+    exporter = InMemoryExporter()
+
+    with Tracer(exporter, sample_rate=0).start_trace('skipped') as root:
+        assert not root.sampled
+    with Tracer(exporter, sample_rate=1).start_trace('kept') as root:
+        with Tracer(exporter, sample_rate=1).span('child'):
+            pass
+
+    assert [span['name'] for span in exporter.spans] == ['child', 'kept']
+
+
+def test_instrument_class_wraps_plain_functions_but_not_dunders():
+    class Model:
+        def __init__(self):
+            self.created = True
+
+        def _helper(value):
+            return value * 2
+
+        @staticmethod
+        def build(value):
+            return Model._helper(value)
+
+    init = Model.__init__
+    instrument_class(Model)
+
+    assert Model.__init__ is init
+    assert Model._helper.__traced__
+    assert Model.build.__traced__
+    assert Model.build(3) == 6